@@ -0,0 +1,66 @@
+import * as React from "react"
+
+interface CursorPaginationOptions {
+  onError?: (error: unknown) => void
+}
+
+// Зарежда по една страница от списъчно API с keyset страниране. Курсорите на отворените страници
+// се пазят в стек, за да може да се върне назад; смяната на url-а (напр. сортирането) връща на първа страница.
+export function useCursorPagination<T = any>(url: string, options: CursorPaginationOptions = {}) {
+  const [pages, setPages] = React.useState<{ url: string; cursors: (string | null)[] }>({ url, cursors: [null] })
+  const [items, setItems] = React.useState<T[]>([])
+  const [nextCursor, setNextCursor] = React.useState<string | null>(null)
+  const [isLoading, setIsLoading] = React.useState(true)
+  const [reloadCount, setReloadCount] = React.useState(0)
+  const onErrorRef = React.useRef(options.onError)
+  onErrorRef.current = options.onError
+
+  const cursors = pages.url === url ? pages.cursors : [null]
+  const cursor = cursors[cursors.length - 1]
+
+  React.useEffect(() => {
+    let cancelled = false
+    const separator = url.includes("?") ? "&" : "?"
+    const pageUrl = cursor ? `${url}${separator}cursor=${encodeURIComponent(cursor)}` : url
+    setIsLoading(true)
+    fetch(pageUrl, { credentials: "include" })
+      .then(async (res) => {
+        if (!res.ok) {
+          throw new Error(`Request failed with status ${res.status}`)
+        }
+        const data = await res.json()
+        if (!cancelled) {
+          setItems(data)
+          setNextCursor(res.headers.get("X-Next-Cursor"))
+        }
+      })
+      .catch((error) => {
+        if (!cancelled) {
+          onErrorRef.current?.(error)
+        }
+      })
+      .finally(() => {
+        if (!cancelled) {
+          setIsLoading(false)
+        }
+      })
+    return () => {
+      cancelled = true
+    }
+  }, [url, cursor, reloadCount])
+
+  return {
+    items,
+    isLoading,
+    page: cursors.length,
+    hasNext: nextCursor !== null,
+    hasPrevious: cursors.length > 1,
+    next: () => {
+      if (nextCursor) {
+        setPages({ url, cursors: [...cursors, nextCursor] })
+      }
+    },
+    previous: () => setPages({ url, cursors: cursors.slice(0, -1) }),
+    reload: () => setReloadCount((count) => count + 1),
+  }
+}
@@ -4,3 +4,20 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs: ClassValue[]) {
   return twMerge(clsx(inputs))
 }
+
+// Списъчните API-та връщат по една страница; курсорът за следващата е в хедъра X-Next-Cursor.
+export async function fetchAllPages<T = any>(url: string, init?: RequestInit): Promise<T[]> {
+  const items: T[] = []
+  let cursor: string | null = null
+  do {
+    const separator = url.includes("?") ? "&" : "?"
+    const pageUrl = cursor ? `${url}${separator}cursor=${encodeURIComponent(cursor)}` : url
+    const res = await fetch(pageUrl, init)
+    if (!res.ok) {
+      throw new Error(`Request failed with status ${res.status}`)
+    }
+    items.push(...(await res.json()))
+    cursor = res.headers.get("X-Next-Cursor")
+  } while (cursor)
+  return items
+}
@@ -7,6 +7,7 @@ import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from '@
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { Tooltip, TooltipContent, TooltipProvider, TooltipTrigger } from '@/components/ui/tooltip';
 import { useToast } from '@/hooks/use-toast';
+import { useCursorPagination } from '@/hooks/use-cursor-pagination';
 import { Users, Package, MessageSquare, TrendingUp, Trash2, Eye, Star, MessageCircle, ShoppingBag } from 'lucide-react';
 
 interface DashboardData {
@@ -16,6 +17,8 @@ interface DashboardData {
     comments: number;
     recommendations: number;
   };
+  roles: Record<string, number>;
+  sellers_with_clothes: number;
   recent: {
     users: any[];
     clothes: any[];
@@ -62,61 +65,62 @@ interface Recommendation {
 
 const API_URL = 'http://localhost:5001/api';
 
+const PaginationControls = ({ pagination }: { pagination: ReturnType<typeof useCursorPagination> }) => (
+  <div className="flex items-center justify-end space-x-2 mt-4">
+    <Button
+      variant="outline"
+      size="sm"
+      onClick={pagination.previous}
+      disabled={!pagination.hasPrevious || pagination.isLoading}
+    >
+      Предишна
+    </Button>
+    <span className="text-sm text-gray-600">Страница {pagination.page}</span>
+    <Button
+      variant="outline"
+      size="sm"
+      onClick={pagination.next}
+      disabled={!pagination.hasNext || pagination.isLoading}
+    >
+      Следваща
+    </Button>
+  </div>
+);
+
 const AdminDashboard = () => {
   const [dashboardData, setDashboardData] = useState<DashboardData | null>(null);
-  const [users, setUsers] = useState<User[]>([]);
-  const [clothes, setClothes] = useState<Clothing[]>([]);
-  const [comments, setComments] = useState<Comment[]>([]);
-  const [recommendations, setRecommendations] = useState<Recommendation[]>([]);
   const [isLoading, setIsLoading] = useState(true);
   const [sortBy, setSortBy] = useState<string>('username');
   const [sortOrder, setSortOrder] = useState<'asc' | 'desc'>('asc');
   const { toast } = useToast();
 
+  const showLoadError = () => {
+    toast({
+      title: "Грешка",
+      description: "Неуспешно зареждане на данните",
+      variant: "destructive",
+    });
+  };
+
+  // Таблиците се зареждат по страници; сортирането на потребителите е на сървъра
+  const usersPage = useCursorPagination<User>(`${API_URL}/admin/users?sort=${sortBy}&order=${sortOrder}`, { onError: showLoadError });
+  const clothesPage = useCursorPagination<Clothing>(`${API_URL}/admin/clothes`, { onError: showLoadError });
+  const commentsPage = useCursorPagination<Comment>(`${API_URL}/admin/comments`, { onError: showLoadError });
+  const recommendationsPage = useCursorPagination<Recommendation>(`${API_URL}/admin/recommendations`, { onError: showLoadError });
+
   useEffect(() => {
     fetchDashboardData();
   }, []);
 
   const fetchDashboardData = async () => {
     try {
-      const [dashboardRes, usersRes, clothesRes, commentsRes, recommendationsRes] = await Promise.all([
-        fetch(`${API_URL}/admin/dashboard`, { credentials: 'include' }),
-        fetch(`${API_URL}/admin/users`, { credentials: 'include' }),
-        fetch(`${API_URL}/admin/clothes`, { credentials: 'include' }),
-        fetch(`${API_URL}/admin/comments`, { credentials: 'include' }),
-        fetch(`${API_URL}/admin/recommendations`, { credentials: 'include' })
-      ]);
-
-      if (dashboardRes.ok) {
-        const dashboardData = await dashboardRes.json();
-        setDashboardData(dashboardData);
-      }
-
-      if (usersRes.ok) {
-        const usersData = await usersRes.json();
-        setUsers(usersData);
-      }
-
-      if (clothesRes.ok) {
-        const clothesData = await clothesRes.json();
-        setClothes(clothesData);
-      }
-
-      if (commentsRes.ok) {
-        const commentsData = await commentsRes.json();
-        setComments(commentsData);
-      }
-
-      if (recommendationsRes.ok) {
-        const recommendationsData = await recommendationsRes.json();
-        setRecommendations(recommendationsData);
+      const dashboardRes = await fetch(`${API_URL}/admin/dashboard`, { credentials: 'include' });
+      if (!dashboardRes.ok) {
+        throw new Error('Failed to load dashboard');
       }
+      setDashboardData(await dashboardRes.json());
     } catch (error) {
-      toast({
-        title: "Грешка",
-        description: "Неуспешно зареждане на данните",
-        variant: "destructive",
-      });
+      showLoadError();
     } finally {
       setIsLoading(false);
     }
@@ -137,6 +141,11 @@ const AdminDashboard = () => {
           description: "Потребителят е изтрит",
         });
         fetchDashboardData();
+        // Заедно с потребителя се изтриват и дрехите, коментарите и препоръките му
+        usersPage.reload();
+        clothesPage.reload();
+        commentsPage.reload();
+        recommendationsPage.reload();
       } else {
         throw new Error('Failed to delete user');
       }
@@ -164,6 +173,8 @@ const AdminDashboard = () => {
           description: "Дрехата е изтрита",
         });
         fetchDashboardData();
+        clothesPage.reload();
+        commentsPage.reload();
       } else {
         throw new Error('Failed to delete clothing');
       }
@@ -191,6 +202,7 @@ const AdminDashboard = () => {
           description: "Коментарът е изтрит",
         });
         fetchDashboardData();
+        commentsPage.reload();
       } else {
         throw new Error('Failed to delete comment');
       }
@@ -229,24 +241,10 @@ const AdminDashboard = () => {
     return labels[type as keyof typeof labels] || type;
   };
 
-  const getSortedUsers = () => {
-    return [...users].sort((a, b) => {
-      let aValue: any = a[sortBy as keyof User];
-      let bValue: any = b[sortBy as keyof User];
-      
-      // Handle string comparison
-      if (typeof aValue === 'string' && typeof bValue === 'string') {
-        aValue = aValue.toLowerCase();
-        bValue = bValue.toLowerCase();
-      }
-      
-      if (sortOrder === 'asc') {
-        return aValue > bValue ? 1 : -1;
-      } else {
-        return aValue < bValue ? 1 : -1;
-      }
-    });
-  };
+  // Общите числа са от /admin/dashboard, а не от заредената страница с потребители
+  const counts = dashboardData?.counts ?? { users: 0, clothes: 0, comments: 0, recommendations: 0 };
+  const roles = dashboardData?.roles ?? {};
+  const perUser = (total: number) => (counts.users > 0 ? Math.round(total / counts.users) : 0);
 
   const isActiveUser = (user: User) => {
     const totalActivity = user.recommendation_count + user.comment_count + user.clothing_count;
@@ -292,9 +290,9 @@ const AdminDashboard = () => {
                 <Users className="h-4 w-4 text-blue-600" />
               </CardHeader>
               <CardContent>
-                <div className="text-2xl font-bold">{users.length}</div>
+                <div className="text-2xl font-bold">{counts.users}</div>
                 <p className="text-xs text-gray-600">
-                  {users.filter(u => u.role === 'admin').length} админи, {users.filter(u => u.role === 'seller').length} търговци, {users.filter(u => u.role === 'user').length} потребители
+                  {roles.admin ?? 0} админи, {roles.seller ?? 0} търговци, {roles.user ?? 0} потребители
                 </p>
               </CardContent>
             </Card>
@@ -306,10 +304,10 @@ const AdminDashboard = () => {
               </CardHeader>
               <CardContent>
                 <div className="text-2xl font-bold">
-                  {users.reduce((sum, user) => sum + user.recommendation_count, 0)}
+                  {counts.recommendations}
                 </div>
                 <p className="text-xs text-gray-600">
-                  Средно {Math.round(users.reduce((sum, user) => sum + user.recommendation_count, 0) / users.length)} на потребител
+                  Средно {perUser(counts.recommendations)} на потребител
                 </p>
               </CardContent>
             </Card>
@@ -321,10 +319,10 @@ const AdminDashboard = () => {
               </CardHeader>
               <CardContent>
                 <div className="text-2xl font-bold">
-                  {users.reduce((sum, user) => sum + user.comment_count, 0)}
+                  {counts.comments}
                 </div>
                 <p className="text-xs text-gray-600">
-                  Средно {Math.round(users.reduce((sum, user) => sum + user.comment_count, 0) / users.length)} на потребител
+                  Средно {perUser(counts.comments)} на потребител
                 </p>
               </CardContent>
             </Card>
@@ -336,10 +334,10 @@ const AdminDashboard = () => {
               </CardHeader>
               <CardContent>
                 <div className="text-2xl font-bold">
-                  {users.reduce((sum, user) => sum + user.clothing_count, 0)}
+                  {counts.clothes}
                 </div>
                 <p className="text-xs text-gray-600">
-                  От {users.filter(u => u.clothing_count > 0).length} търговци
+                  От {dashboardData?.sellers_with_clothes ?? 0} търговци
                 </p>
               </CardContent>
             </Card>
@@ -390,7 +388,7 @@ const AdminDashboard = () => {
                   </TableRow>
                 </TableHeader>
                 <TableBody>
-                  {getSortedUsers().map((user) => (
+                  {usersPage.items.map((user) => (
                     <TableRow key={user.id}>
                       <TableCell>{user.id}</TableCell>
                       <TableCell>
@@ -463,6 +461,7 @@ const AdminDashboard = () => {
                   ))}
                 </TableBody>
               </Table>
+              <PaginationControls pagination={usersPage} />
             </CardContent>
           </Card>
         </TabsContent>
@@ -486,7 +485,7 @@ const AdminDashboard = () => {
                   </TableRow>
                 </TableHeader>
                 <TableBody>
-                  {clothes.map((clothing) => (
+                  {clothesPage.items.map((clothing) => (
                     <TableRow key={clothing.id}>
                       <TableCell>{clothing.id}</TableCell>
                       <TableCell>{clothing.name}</TableCell>
@@ -508,6 +507,7 @@ const AdminDashboard = () => {
                   ))}
                 </TableBody>
               </Table>
+              <PaginationControls pagination={clothesPage} />
             </CardContent>
           </Card>
         </TabsContent>
@@ -529,12 +529,12 @@ const AdminDashboard = () => {
                   </TableRow>
                 </TableHeader>
                 <TableBody>
-                  {comments.length === 0 && (
+                  {commentsPage.items.length === 0 && (
                     <TableRow>
                       <TableCell colSpan={5} className="text-center text-gray-400">Няма коментари.</TableCell>
                     </TableRow>
                   )}
-                  {comments.map((comment) => (
+                  {commentsPage.items.map((comment) => (
                     <TableRow key={comment.id}>
                       <TableCell>{comment.id}</TableCell>
                       <TableCell className="max-w-xs truncate">{comment.content}</TableCell>
@@ -554,6 +554,7 @@ const AdminDashboard = () => {
                   ))}
                 </TableBody>
               </Table>
+              <PaginationControls pagination={commentsPage} />
             </CardContent>
           </Card>
         </TabsContent>
@@ -562,6 +563,7 @@ const AdminDashboard = () => {
           <Card className="glass-card">
             <CardHeader>
               <CardTitle>Всички Препоръки</CardTitle>
+              <p className="text-sm text-gray-600">Архивираните (стари) препоръки не са в този списък, но са в експорта.</p>
             </CardHeader>
             <CardContent>
               <Table>
@@ -575,7 +577,7 @@ const AdminDashboard = () => {
                   </TableRow>
                 </TableHeader>
                 <TableBody>
-                  {recommendations.map((recommendation) => (
+                  {recommendationsPage.items.map((recommendation) => (
                     <TableRow key={recommendation.id}>
                       <TableCell>{recommendation.id}</TableCell>
                       <TableCell>{getClothingTypeLabel(recommendation.clothingType)}</TableCell>
@@ -586,6 +588,7 @@ const AdminDashboard = () => {
                   ))}
                 </TableBody>
               </Table>
+              <PaginationControls pagination={recommendationsPage} />
             </CardContent>
           </Card>
         </TabsContent>
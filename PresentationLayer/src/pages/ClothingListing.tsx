@@ -12,6 +12,7 @@ import { Textarea } from '@/components/ui/textarea';
 import { useAuthStore } from '@/store/authStore';
 import { useToast } from '@/hooks/use-toast';
 import { Button } from '@/components/ui/button';
+import { fetchAllPages } from '@/lib/utils';
 
 const ClothingListing = () => {
   const [searchTerm, setSearchTerm] = useState('');
@@ -61,8 +62,7 @@ const ClothingListing = () => {
     setSelectedItem(item);
     // Fetch comments
     try {
-      const res = await fetch(`/api/clothing/${item.id}/comments`);
-      const data = await res.json();
+      const data = await fetchAllPages(`/api/clothing/${item.id}/comments`);
       setComments(data);
     } catch {
       setComments([]);
@@ -70,8 +70,7 @@ const ClothingListing = () => {
     // Check if user has recommendation for this clothing
     if (user) {
       try {
-        const recRes = await fetch('/api/user/recommendations', { credentials: 'include' });
-        const recs = await recRes.json();
+        const recs = await fetchAllPages('/api/user/recommendations', { credentials: 'include' });
         console.log('User recommendations:', recs);
         console.log('Current clothing id:', String(item.id));
         setHasRecommendation(recs.some((r: any) => String(r.item_identifier) === String(item.id)));
@@ -102,8 +101,7 @@ const ClothingListing = () => {
         setCommentText('');
         toast({ title: 'Успех', description: data.message });
         // Reload comments from backend
-        const commentsRes = await fetch(`/api/clothing/${selectedItem.id}/comments`);
-        const commentsData = await commentsRes.json();
+        const commentsData = await fetchAllPages(`/api/clothing/${selectedItem.id}/comments`);
         setComments(commentsData);
       } else {
         toast({ title: 'Грешка', description: data.error ? String(data.error) : 'Възникна грешка', variant: 'destructive' });
@@ -1,3 +1,5 @@
+import { fetchAllPages } from '@/lib/utils';
+
 const API_URL = 'http://localhost:5001/api';
 
 export interface LoginData {
@@ -92,14 +94,13 @@ export const authService = {
 
     async getUserRecommendations() {
         try {
-            const response = await fetch(`${API_URL}/user/recommendations`, {
+            return await fetchAllPages(`${API_URL}/user/recommendations`, {
                 method: 'GET',
                 headers: {
                     'Accept': 'application/json',
                 },
                 credentials: 'include',
             });
-            return handleResponse(response);
         } catch (error) {
             console.error('Get recommendations error:', error);
             throw error;
@@ -2,22 +2,89 @@ import os
 from dotenv import load_dotenv
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
 from flask_sqlalchemy import SQLAlchemy
-from flask import Flask
+from flask import Flask, jsonify
 from flask_mail import Mail
+from flask_cors import CORS
+from flask_login import LoginManager
+from flask_migrate import Migrate
 
 
 db = SQLAlchemy()
 mail = Mail()
+migrate = Migrate()
+login_manager = LoginManager()
 
-def create_app():
+# Resolved from the package, so the CLI works from any working directory
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+CORS_ORIGINS = ["http://localhost:8080", "http://localhost:3000", "http://192.168.0.128:8080"]
+
+def create_app(config_overrides=None):
     """
-    Създава и конфигурира Flask приложението, инициализира разширенията и регистрира всички blueprints.
+    Създава и конфигурира Flask приложението: логване, CORS, разширенията, потребителската
+    сесия, blueprints и CLI командите. Използва се както от app.py, така и от wsgi.py.
+    :param config_overrides: Речник с настройки, които заместват app.config.Config (по избор)
     :return: Инициализирано Flask приложение
     """
+    from app.logging_config import setup_logging, log_error
+
     app = Flask(__name__)
     app.config.from_object('app.config.Config')
+    if config_overrides:
+        app.config.update(config_overrides)
+        if 'SQLALCHEMY_DATABASE_URI' in config_overrides and 'SQLALCHEMY_ENGINE_OPTIONS' not in config_overrides:
+            from app.config import engine_options
+            app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    os.makedirs(app.instance_path, exist_ok=True)
+
+    # Настройване на логването
+    logger = setup_logging(app)
+
+    CORS(app,
+         resources={r"/api/*": {"origins": CORS_ORIGINS}},
+         supports_credentials=True,
+         allow_headers=["Content-Type", "Authorization", "Accept"],
+         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+         expose_headers=["X-Next-Cursor"])
+
     db.init_app(app)
+    from app.database import apply_sqlite_pragmas
+    with app.app_context():
+        apply_sqlite_pragmas(db.engine, app.config)
     mail.init_app(app)
+    migrate.init_app(app, db, directory=MIGRATIONS_DIR, render_as_batch=True)
+    login_manager.init_app(app)
+
+    # Registers the after_insert/after_delete listeners that maintain the dashboard counters
+    from app import counters  # noqa: F401
+    from app.user_cache import init_user_cache, load_cached_user
+    init_user_cache(app)
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        try:
+            # Served from the short-lived user cache with the measurements already loaded
+            return load_cached_user(int(user_id))
+        except Exception as e:
+            log_error(e, f"Error loading user with ID: {user_id}")
+            return None
+
+    # Root route for API information
+    @app.route('/')
+    def index():
+        logger.info("API root endpoint accessed")
+        return jsonify({
+            'name': 'SmartFit API',
+            'version': '1.0',
+            'endpoints': {
+                'register': '/api/register',
+                'login': '/api/login',
+                'logout': '/api/logout',
+                'user': '/api/user',
+                'predict-size': '/api/predict-size'
+            }
+        })
+
     from app.routes.auth_routes import auth_bp
     from app.routes.user_routes import user_bp
     from app.routes.admin_routes import admin_bp
@@ -28,4 +95,8 @@ def create_app():
     app.register_blueprint(admin_bp, url_prefix='/api')
     app.register_blueprint(clothing_bp, url_prefix='/api')
     app.register_blueprint(comment_bp, url_prefix='/api')
-    return app 
\ No newline at end of file
+    logger.info("Registered blueprints: auth, user, admin, clothing, comment")
+
+    from app.commands import register_commands
+    register_commands(app)
+    return app
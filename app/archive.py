@@ -0,0 +1,286 @@
+import json
+import zlib
+from collections import defaultdict
+from itertools import groupby
+from datetime import datetime, time, timedelta
+from flask import current_app, request
+from sqlalchemy import func, select, delete, insert, true, and_, or_
+from sqlalchemy.orm import defer
+from app.models import (db, User, RecommendationHistory, RecommendationArchive, RecommendationArchiveItem,
+                        BODY_TYPES_BY_CODE)
+from app.pagination import keyset_paginate, page_size, encode_cursor, decode_cursor
+
+# Ids or pairs per query when reading archive chunks
+IN_BATCH_SIZE = 500
+
+
+def _compress(rows):
+    payload = [{key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()}
+               for row in rows]
+    return zlib.compress(json.dumps(payload, separators=(',', ':')).encode())
+
+
+def _decompress(data):
+    rows = json.loads(zlib.decompress(data))
+    for row in rows:
+        row['date'] = datetime.fromisoformat(row['date'])
+    return rows
+
+
+def _to_instance(row):
+    """
+    RecommendationHistory извън сесията от ред на архива. Стойностите се записват направо в
+    __dict__, както при зареждане от базата: конструкторът минава през събитията на всеки атрибут
+    и е няколко пъти по-бавен, а редовете от архива могат да са хиляди.
+    """
+    recommendation = RecommendationHistory.__mapper__.class_manager.new_instance()
+    recommendation.__dict__.update(row)
+    return recommendation
+
+
+def archive_cutoff(older_than_days):
+    """
+    Началото на деня преди older_than_days дни: архивират се само цели дни, така че всеки ден е
+    изцяло в основната таблица или изцяло в архива (на това разчита и rollup_daily_stats).
+    """
+    return datetime.combine((datetime.utcnow() - timedelta(days=older_than_days)).date(), time.min)
+
+
+def _index_items(groups):
+    """
+    Добавя дрехите от новите записи на архива в RecommendationArchiveItem. Месец на потребител
+    може вече да има запис (от предишна партида или предишно архивиране), затова съществуващите
+    двойки за месеците на партидата се пропускат.
+    :param groups: Речник (user_id, month) -> редове на новия запис
+    """
+    items = {(user_id, row['item_identifier'], month)
+             for (user_id, month), group in groups.items() for row in group if row['item_identifier']}
+    if not items:
+        return
+    user_ids = [user_id for user_id, _, _ in items]
+    items -= {tuple(row) for row in db.session.execute(
+        select(RecommendationArchiveItem.user_id, RecommendationArchiveItem.item_identifier,
+               RecommendationArchiveItem.month)
+        .where(RecommendationArchiveItem.user_id.between(min(user_ids), max(user_ids)),
+               RecommendationArchiveItem.month.in_({month for _, _, month in items})))}
+    if items:
+        db.session.execute(insert(RecommendationArchiveItem), [
+            {'user_id': user_id, 'item_identifier': item, 'month': month} for user_id, item, month in items])
+
+
+def _item_months(keys):
+    """
+    Месеците от архива с препоръки за двойките (user_id, item_identifier), по индекса RecommendationArchiveItem.
+    :param keys: Двойки (user_id, item_identifier)
+    :return: Множество от двойки (user_id, month)
+    """
+    keys = sorted(keys)
+    months = set()
+    for start in range(0, len(keys), IN_BATCH_SIZE):
+        # OR of pairs rather than a row-value IN, which SQLite does not look up by the index
+        pairs = [and_(RecommendationArchiveItem.user_id == user_id, RecommendationArchiveItem.item_identifier == item)
+                 for user_id, item in keys[start:start + IN_BATCH_SIZE]]
+        months.update(db.session.execute(
+            select(RecommendationArchiveItem.user_id, RecommendationArchiveItem.month).where(or_(*pairs))).tuples())
+    return months
+
+
+def archive_recommendations(older_than_days=None, batch_size=None, log=None):
+    """
+    Премества препоръките, по-стари от older_than_days дни, от RecommendationHistory в
+    RecommendationArchive. Редовете се обработват на партиди по (user_id, date) с индекса по
+    потребител, като всяка партида се записва като по един компресиран запис за потребител и месец
+    (и дрехите му в RecommendationArchiveItem) и се изтрива от основната таблица в една кратка транзакция.
+    Броячът на препоръките не се променя, защото архивираните препоръки продължават да се показват.
+    :param older_than_days: Възраст в дни (по подразбиране RECOMMENDATION_ARCHIVE_DAYS)
+    :param batch_size: Редове на партида (по подразбиране ARCHIVE_BATCH_SIZE)
+    :param log: Функция за съобщения за напредъка (по избор)
+    :return: Брой архивирани редове
+    """
+    if older_than_days is None:
+        older_than_days = current_app.config['RECOMMENDATION_ARCHIVE_DAYS']
+    batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+    cutoff = archive_cutoff(older_than_days)
+    table = RecommendationHistory.__table__
+    archived = 0
+    last_user_id = 0
+    while True:
+        # Keyset on user_id, so every batch seeks past the users that are already done
+        rows = db.session.execute(
+            select(table)
+            .where(table.c.user_id >= last_user_id, table.c.date < cutoff)
+            .order_by(table.c.user_id, table.c.date, table.c.id)
+            .limit(batch_size)
+        ).mappings().all()
+        if not rows:
+            break
+        groups = defaultdict(list)
+        for row in rows:
+            groups[(row['user_id'], row['date'].date().replace(day=1))].append(row)
+        db.session.execute(insert(RecommendationArchive), [{
+            'user_id': user_id,
+            'month': month,
+            'first_date': group[0]['date'],
+            'last_date': group[-1]['date'],
+            'row_count': len(group),
+            'data': _compress(group)
+        } for (user_id, month), group in groups.items()])
+        _index_items(groups)
+        db.session.execute(delete(table).where(table.c.id.in_([row['id'] for row in rows])))
+        db.session.commit()
+        archived += len(rows)
+        last_user_id = rows[-1]['user_id']
+        if log:
+            log(f"Archived {archived} recommendations")
+    return archived
+
+
+def archived_recommendations(user_id, before=None, limit=100):
+    """
+    Архивираните препоръки на потребителя, подредени по (date, id) низходящо, преди ключа before.
+    Разархивират се само записите (месеците), нужни за страницата.
+    :param user_id: ID на потребителя
+    :param before: (date, id) на последния показан ред или None
+    :param limit: Максимален брой редове
+    :return: Списък с RecommendationHistory обекти извън сесията
+    """
+    query = (RecommendationArchive.query
+             .options(defer(RecommendationArchive.data))
+             .filter(RecommendationArchive.user_id == user_id))
+    if before is not None:
+        query = query.filter(RecommendationArchive.first_date <= before[0])
+    query = query.order_by(RecommendationArchive.last_date.desc(), RecommendationArchive.id.desc())
+
+    rows = []
+    for chunk in query:
+        # Chunks are ordered by their newest row, so once the page is full an older chunk cannot add to it
+        if len(rows) >= limit and chunk.last_date < rows[limit - 1]['date']:
+            break
+        rows.extend(row for row in _decompress(chunk.data)
+                    if before is None or (row['date'], row['id']) < tuple(before))
+        rows.sort(key=lambda row: (row['date'], row['id']), reverse=True)
+    return [_to_instance(row) for row in rows[:limit]]
+
+
+def paginate_user_recommendations(query, user_id):
+    """
+    keyset_paginate за историята на потребителя, която продължава в архива: когато основната
+    таблица свърши на текущата страница, страницата се допълва от архива със същия курсор
+    (date, id), така че за клиента страницирането е едно и също. Архивът се чете само тогава.
+    :param query: Заявка към RecommendationHistory за потребителя
+    :param user_id: ID на потребителя
+    :return: (редове, курсор за следващата страница или None)
+    """
+    order_columns = [RecommendationHistory.date, RecommendationHistory.id]
+    rows, next_cursor = keyset_paginate(query, order_columns)
+    if next_cursor is not None:
+        return rows, next_cursor
+    limit = page_size()
+    if rows:
+        before = (rows[-1].date, rows[-1].id)
+    elif request.args.get('cursor'):
+        before = tuple(decode_cursor(request.args['cursor'], len(order_columns)))
+    else:
+        before = None
+    archived = archived_recommendations(user_id, before, limit - len(rows) + 1)
+    rows = rows + archived
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([rows[-1].date, rows[-1].id])
+
+
+def has_archived_recommendation(user_id, item_identifier):
+    """
+    Проверява дали потребителят има архивирана препоръка за дрехата (по RecommendationArchiveItem,
+    без да разархивира записи).
+    """
+    return db.session.query(
+        RecommendationArchiveItem.query.filter_by(user_id=user_id, item_identifier=item_identifier).exists()
+    ).scalar()
+
+
+def archived_item_recommendations(keys):
+    """
+    Архивираните препоръки за двойките (user_id, item_identifier), напр. свързаните препоръки на
+    страница от историята. Разархивират се само записите за месеците, в които RecommendationArchiveItem
+    има двойката, а не целият архив на потребителите.
+    :param keys: Множество от двойки (user_id, item_identifier)
+    :return: Речник двойка -> списък с RecommendationHistory обекти извън сесията, подредени по (date, id) низходящо
+    """
+    groups = defaultdict(list)
+    months = sorted(_item_months(keys))
+    for start in range(0, len(months), IN_BATCH_SIZE):
+        pairs = [and_(RecommendationArchive.user_id == user_id, RecommendationArchive.month == month)
+                 for user_id, month in months[start:start + IN_BATCH_SIZE]]
+        for data, in db.session.execute(select(RecommendationArchive.data).where(or_(*pairs))):
+            for row in _decompress(data):
+                key = (row['user_id'], row['item_identifier'])
+                if key in keys:
+                    groups[key].append(_to_instance(row))
+    for group in groups.values():
+        group.sort(key=lambda rec: (rec.date, rec.id), reverse=True)
+    return groups
+
+
+def archived_export_rows(start=None, end=None):
+    """
+    Архивираните препоръки за експорта със същите колони като recommendations_export_query,
+    подредени по (date, id). Архивът се чете месец по месец, затова в паметта е най-много един
+    месец от него; всички архивирани редове са по-стари от тези в основната таблица.
+    :param start: Начало на периода включително или None
+    :param end: Край на периода изключително или None
+    :return: Генератор от списъци с речници (по един списък за месец)
+    """
+    chunks = select(RecommendationArchive.id, RecommendationArchive.month)
+    if start is not None:
+        chunks = chunks.where(RecommendationArchive.last_date >= start)
+    if end is not None:
+        chunks = chunks.where(RecommendationArchive.first_date < end)
+    chunks = db.session.execute(chunks.order_by(RecommendationArchive.month, RecommendationArchive.id)).all()
+    for _, month_chunks in groupby(chunks, key=lambda chunk: chunk.month):
+        ids = [chunk.id for chunk in month_chunks]
+        rows = []
+        for batch_start in range(0, len(ids), IN_BATCH_SIZE):
+            for data, username in db.session.execute(
+                    select(RecommendationArchive.data, User.username)
+                    .join(User, User.id == RecommendationArchive.user_id)
+                    .where(RecommendationArchive.id.in_(ids[batch_start:batch_start + IN_BATCH_SIZE]))):
+                for row in _decompress(data):
+                    if (start is None or row['date'] >= start) and (end is None or row['date'] < end):
+                        row['username'] = username
+                        row['body_type'] = BODY_TYPES_BY_CODE.get(row['body_type_code'])
+                        rows.append(row)
+        rows.sort(key=lambda row: (row['date'], row['id']))
+        yield rows
+
+
+def delete_user_archive(user_id):
+    """
+    Изтрива архива на потребителя.
+    :return: Брой изтрити архивирани препоръки
+    """
+    count = (db.session.query(func.coalesce(func.sum(RecommendationArchive.row_count), 0))
+             .filter(RecommendationArchive.user_id == user_id).scalar())
+    RecommendationArchiveItem.query.filter_by(user_id=user_id).delete()
+    RecommendationArchive.query.filter_by(user_id=user_id).delete()
+    return count
+
+
+def recommendations_version(user_id):
+    """
+    Маркер за версията на историята на потребителя с една заявка: общ брой препоръки (основна
+    таблица и архив), най-голям id и най-новата дата. Историята само се допълва, а изтриването
+    намалява броя, така че всяка промяна сменя маркера; архивирането не го сменя.
+    :param user_id: ID на потребителя
+    :return: ((брой, max id, последна дата), последна дата или None)
+    """
+    hot = select(func.count(RecommendationHistory.id), func.max(RecommendationHistory.id),
+                 func.max(RecommendationHistory.date)).where(RecommendationHistory.user_id == user_id).subquery()
+    archived = select(func.coalesce(func.sum(RecommendationArchive.row_count), 0).label('count'),
+                      func.max(RecommendationArchive.last_date).label('last_date')
+                      ).where(RecommendationArchive.user_id == user_id).subquery()
+    count, max_id, hot_last, archived_count, archived_last = db.session.execute(
+        select(*hot.c, *archived.c).select_from(hot.join(archived, true()))).one()
+    last_date = max((value for value in (hot_last, archived_last) if value is not None), default=None)
+    return (count + archived_count, max_id, last_date), last_date
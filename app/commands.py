@@ -0,0 +1,93 @@
+import os
+import click
+from flask import current_app
+from sqlalchemy import inspect
+from app.models import db
+
+# Migration that matches the schema db.create_all() produced before migrations were added
+BASELINE_REVISION = '0001'
+
+
+def register_commands(app):
+    """
+    Регистрира CLI командите на приложението (init-db, seed-db, gen-fixtures, reconcile-counters,
+    rollup-stats, archive-recommendations).
+    Схемата и началните данни се създават само чрез тях, а не при стартиране на процеса.
+    :param app: Flask приложението
+    """
+
+    @app.cli.command('init-db')
+    def init_db():
+        """Създава базата или я обновява до последната миграция."""
+        from flask_migrate import stamp, upgrade
+        # Checked first, so a missing directory does not leave tables without an alembic stamp
+        directory = current_app.extensions['migrate'].directory
+        if not os.path.isfile(os.path.join(directory, 'env.py')):
+            raise click.ClickException(f"Migrations directory not found: {directory}")
+        tables = set(inspect(db.engine).get_table_names())
+        if 'alembic_version' in tables:
+            upgrade()
+            click.echo("Database upgraded to the latest migration")
+        elif tables:
+            # Created by db.create_all() before migrations existed, which matches the baseline
+            stamp(revision=BASELINE_REVISION)
+            upgrade()
+            click.echo("Existing database stamped and upgraded to the latest migration")
+        else:
+            from app.counters import reconcile_counters
+            db.create_all()
+            stamp()
+            reconcile_counters()
+            click.echo("Database tables created")
+
+    @app.cli.command('seed-db')
+    @click.option('--batch-size', default=500, show_default=True, help='Rows per INSERT batch')
+    def seed_db(batch_size):
+        """Зарежда началните данни. Може да се изпълнява многократно."""
+        from app.seed import seed_database
+        created = seed_database(batch_size=batch_size)
+        click.echo(f"Created {created['users']} users, {created['clothes']} clothes, "
+                   f"{created['comments']} comments")
+
+    @app.cli.command('gen-fixtures')
+    @click.option('--users', default=10000, show_default=True)
+    @click.option('--sellers', default=200, show_default=True)
+    @click.option('--clothes', default=20000, show_default=True)
+    @click.option('--comments', default=200000, show_default=True)
+    @click.option('--recommendations', default=1000000, show_default=True)
+    @click.option('--batch-size', default=10000, show_default=True, help='Rows per INSERT batch')
+    @click.option('--seed', default=42, show_default=True, help='Random seed')
+    def gen_fixtures(users, sellers, clothes, comments, recommendations, batch_size, seed):
+        """Генерира голям обем тестови данни за натоварващи тестове."""
+        from app.fixtures import generate_fixtures
+        counts = generate_fixtures(users=users, sellers=sellers, clothes=clothes, comments=comments,
+                                   recommendations=recommendations, batch_size=batch_size, seed=seed,
+                                   log=click.echo)
+        click.echo(f"Generated fixtures: {counts}")
+
+    @app.cli.command('reconcile-counters')
+    def reconcile_counters_command():
+        """Преизчислява броячите на таблото с COUNT(*). Пуска се периодично, напр. от cron."""
+        from app.counters import reconcile_counters
+        corrections = reconcile_counters()
+        for name, (old, new) in corrections.items():
+            click.echo(f"{name}: {old} -> {new}")
+        click.echo(f"Counters reconciled, {len(corrections)} corrected")
+
+    @app.cli.command('rollup-stats')
+    @click.option('--full', is_flag=True, help='Recompute all days, e.g. after importing past data')
+    def rollup_stats(full):
+        """Обновява дневните агрегати за статистиките. Пуска се периодично, напр. от cron."""
+        from app.stats import rollup_daily_stats
+        first_day, written = rollup_daily_stats(full=full)
+        click.echo(f"Rolled up {written} daily stats from {first_day or 'the beginning'}")
+
+    @app.cli.command('archive-recommendations')
+    @click.option('--older-than-days', type=int, default=None,
+                  help='Archive recommendations older than this (default: RECOMMENDATION_ARCHIVE_DAYS)')
+    @click.option('--batch-size', type=int, default=None, help='Rows per batch (default: ARCHIVE_BATCH_SIZE)')
+    def archive_recommendations_command(older_than_days, batch_size):
+        """Премества старите препоръки в компресирания архив. Пуска се периодично, напр. от cron."""
+        from app.archive import archive_recommendations
+        archived = archive_recommendations(older_than_days=older_than_days, batch_size=batch_size)
+        click.echo(f"Archived {archived} recommendations")
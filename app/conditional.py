@@ -0,0 +1,38 @@
+import hashlib
+from flask import request, make_response
+
+
+def make_etag(*markers):
+    """
+    ETag от евтини маркери за версията на ресурса (напр. max(updated_at), брой редове, max(id))
+    вместо хеш на цялото тяло. Пътят и параметрите на заявката са част от ETag-а, така че
+    различните страници и потребители не споделят стойност.
+    :param markers: Стойности, които се променят при всяка промяна на отговора
+    :return: ETag без кавичките
+    """
+    key = repr((request.path, request.query_string, markers)).encode()
+    return hashlib.sha1(key).hexdigest()
+
+
+def with_validators(response, etag, last_modified=None):
+    """
+    Добавя ETag (weak, защото не е хеш на тялото) и Last-Modified към отговора. Cache-Control:
+    no-cache кара браузъра да проверява с If-None-Match при всяко използване вместо да пази
+    отговора по Last-Modified.
+    """
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def not_modified(etag, last_modified=None):
+    """
+    Отговор 304 Not Modified, ако If-None-Match на заявката съдържа etag, иначе None.
+    If-Modified-Since не се проверява: изтриванията не променят Last-Modified на списъците.
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    return with_validators(make_response('', 304), etag, last_modified)
@@ -1,12 +1,51 @@
 import os
 
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ['true', '1', 'yes']
+
+def engine_options(database_uri):
+    """
+    Настройки на SQLAlchemy engine според базата. Размерът на pool-а важи за файлова SQLite и за
+    PostgreSQL; SQLite в паметта използва един споделен connection и не приема тези настройки.
+    :param database_uri: URL на базата
+    :return: Речник за SQLALCHEMY_ENGINE_OPTIONS
+    """
+    options = {
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    }
+    in_memory = database_uri.startswith('sqlite') and (':memory:' in database_uri or database_uri in ['sqlite://', 'sqlite:///'])
+    if not in_memory:
+        options['pool_size'] = int(os.environ.get('DB_POOL_SIZE', 5))
+        options['max_overflow'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+        options['pool_timeout'] = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    return options
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key')
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///instance/smartfit.db')
+    # A relative SQLite path is resolved inside the instance folder (instance/SmartFit.db)
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///SmartFit.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    # Applied to every new SQLite connection (see app/database.py)
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 65536))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    # Keyset pagination of the list endpoints (see app/pagination.py)
+    PAGE_SIZE_DEFAULT = int(os.environ.get('PAGE_SIZE_DEFAULT', 100))
+    PAGE_SIZE_MAX = int(os.environ.get('PAGE_SIZE_MAX', 1000))
+    # Rows fetched from the cursor per chunk of the streaming exports (see app/exports.py)
+    EXPORT_YIELD_PER = int(os.environ.get('EXPORT_YIELD_PER', 1000))
+    # Recommendations older than this many days are moved to the archive (see app/archive.py)
+    RECOMMENDATION_ARCHIVE_DAYS = int(os.environ.get('RECOMMENDATION_ARCHIVE_DAYS', 365))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 5000))
+    # Users loaded by login_manager.user_loader are cached for this many seconds (0 disables, see app/user_cache.py)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 30))
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
     MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
     MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'true').lower() in ['true', '1', 'yes']
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
-    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER', MAIL_USERNAME) 
\ No newline at end of file
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER', MAIL_USERNAME)
@@ -0,0 +1,83 @@
+from sqlalchemy import event, func, select, update, insert
+from app.models import db, User, Clothing, Comment, RecommendationHistory, RecommendationArchive, EntityCounter
+
+# Counter name -> counted model; the names are the keys of the dashboard counts
+COUNTED_MODELS = {
+    'users': User,
+    'clothes': Clothing,
+    'comments': Comment,
+    'recommendations': RecommendationHistory
+}
+_COUNTER_NAMES = {model: name for name, model in COUNTED_MODELS.items()}
+
+
+def adjust_counter(connection, model, delta):
+    """
+    Променя брояча на модела с delta в текущата транзакция. Използва се от събитията за единични
+    записи и изрично след bulk INSERT/DELETE, които не извикват after_insert/after_delete.
+    Модели без брояч се пропускат.
+    :param connection: Connection на текущата транзакция (напр. db.session.connection())
+    :param model: Класът на модела
+    :param delta: Брой добавени (положителен) или изтрити (отрицателен) редове
+    """
+    name = _COUNTER_NAMES.get(model)
+    if name is None or not delta:
+        return
+    table = EntityCounter.__table__
+    connection.execute(update(table).where(table.c.name == name).values(count=table.c.count + delta))
+
+
+def _after_insert(mapper, connection, target):
+    adjust_counter(connection, mapper.class_, 1)
+
+
+def _after_delete(mapper, connection, target):
+    adjust_counter(connection, mapper.class_, -1)
+
+
+for _model in COUNTED_MODELS.values():
+    event.listen(_model, 'after_insert', _after_insert)
+    event.listen(_model, 'after_delete', _after_delete)
+
+
+def _count_query(name, model):
+    count = select(func.count()).select_from(model.__table__).scalar_subquery()
+    if name == 'recommendations':
+        # Archived recommendations are still shown to their users, so they stay in the total
+        count = count + select(func.coalesce(func.sum(RecommendationArchive.row_count), 0)).scalar_subquery()
+    return count
+
+
+def reconcile_counters():
+    """
+    Преизчислява броячите с COUNT(*) и създава липсващите. Всеки брояч се обновява с една заявка
+    (count = (SELECT count(*) ...)), така че записите, направени междувременно, не се губят.
+    Пуска се периодично (reconcile-counters) за да поправи разминавания от записи извън приложението.
+    :return: Речник име -> (стара стойност, нова стойност) за поправените броячи
+    """
+    table = EntityCounter.__table__
+    before = dict(db.session.execute(select(table.c.name, table.c.count)).all())
+    for name, model in COUNTED_MODELS.items():
+        actual = _count_query(name, model)
+        if name in before:
+            db.session.execute(update(table).where(table.c.name == name).values(count=actual))
+        else:
+            db.session.execute(insert(table).values(name=name, count=actual))
+    after = dict(db.session.execute(select(table.c.name, table.c.count)).all())
+    db.session.commit()
+    return {name: (before.get(name), count) for name, count in after.items()
+            if name in COUNTED_MODELS and before.get(name) != count}
+
+
+def get_counts():
+    """
+    Връща броя на редовете по таблица от броячите с една заявка по първичен ключ.
+    Ако някой брояч липсва (напр. база отпреди броячите), първо ги преизчислява.
+    :return: Речник име -> брой
+    """
+    table = EntityCounter.__table__
+    counts = dict(db.session.execute(select(table.c.name, table.c.count)).all())
+    if not all(name in counts for name in COUNTED_MODELS):
+        reconcile_counters()
+        counts = dict(db.session.execute(select(table.c.name, table.c.count)).all())
+    return {name: counts[name] for name in COUNTED_MODELS}
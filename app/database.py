@@ -0,0 +1,26 @@
+from sqlalchemy import event
+
+
+def apply_sqlite_pragmas(engine, config):
+    """
+    Задава PRAGMA настройките на всеки нов SQLite connection: WAL позволява четене по време на запис,
+    synchronous=NORMAL е безопасно с WAL и намалява fsync, а busy_timeout кара конкурентните записи
+    да изчакат заключването вместо веднага да върнат "database is locked". За други бази не прави нищо.
+    :param engine: SQLAlchemy engine
+    :param config: Конфигурацията на приложението
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # journal_mode is persistent and cannot be changed for an in-memory database
+        if engine.url.database not in (None, '', ':memory:'):
+            cursor.execute(f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}")
+        cursor.execute(f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}")
+        # A negative cache_size is in KiB rather than in pages
+        cursor.execute(f"PRAGMA cache_size=-{int(config['SQLITE_CACHE_SIZE_KB'])}")
+        cursor.execute(f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
@@ -0,0 +1,141 @@
+import io
+import csv
+import json
+from datetime import datetime, timedelta
+from flask import Response, current_app, request, stream_with_context
+from sqlalchemy import select
+from app.models import db, User, Clothing, Comment, RecommendationHistory
+from app.logging_config import log_error
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+
+class InvalidExportRequest(ValueError):
+    """
+    Невалиден формат или период в заявката за експорт.
+    """
+
+
+def export_format():
+    """
+    Форматът от параметъра format (ndjson по подразбиране или csv).
+    """
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in EXPORT_FORMATS:
+        raise InvalidExportRequest(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    return fmt
+
+
+def _parse_datetime(name):
+    value = request.args.get(name)
+    if not value:
+        return None, False
+    try:
+        return datetime.fromisoformat(value), len(value) == len('YYYY-MM-DD')
+    except ValueError:
+        raise InvalidExportRequest(f'{name} must be an ISO date or datetime')
+
+
+def date_range():
+    """
+    Периодът от параметрите from и to (ISO дата или дата и час). Ако to е само дата, денят се включва.
+    :return: (начало включително или None, край изключително или None)
+    """
+    start, _ = _parse_datetime('from')
+    end, date_only = _parse_datetime('to')
+    if end is not None and date_only:
+        end += timedelta(days=1)
+    if start is not None and end is not None and start >= end:
+        raise InvalidExportRequest('from must be before to')
+    return start, end
+
+
+def _in_range(statement, column, start, end):
+    if start is not None:
+        statement = statement.where(column >= start)
+    if end is not None:
+        statement = statement.where(column < end)
+    return statement
+
+
+def recommendations_export_query(start=None, end=None):
+    """
+    Плоска заявка за експорта на препоръките: само колони, без ORM обекти и без свързаните препоръки.
+    Подрежда се по (date, id), което индексът по date връща без сортиране. Заявката е само към
+    основната таблица; архивираните препоръки идват от archived_export_rows в app/archive.py.
+    """
+    statement = (select(RecommendationHistory.id, RecommendationHistory.user_id, User.username,
+                        RecommendationHistory.date, RecommendationHistory.clothing_type,
+                        RecommendationHistory.recommended_size, RecommendationHistory.height_cm,
+                        RecommendationHistory.weight_kg, RecommendationHistory.chest_cm,
+                        RecommendationHistory.waist_cm, RecommendationHistory.body_type.label('body_type'),
+                        RecommendationHistory.item_identifier)
+                 .join(User, User.id == RecommendationHistory.user_id))
+    statement = _in_range(statement, RecommendationHistory.date, start, end)
+    return statement.order_by(RecommendationHistory.date, RecommendationHistory.id)
+
+
+def comments_export_query(start=None, end=None):
+    """
+    Плоска заявка за експорта на коментарите с потребителя и дрехата, подредена по (created_at, id).
+    """
+    statement = (select(Comment.id, Comment.user_id, User.username.label('user_name'), Comment.clothing_id,
+                        Clothing.name.label('clothing_name'), Comment.rating, Comment.content,
+                        Comment.created_at, Comment.updated_at)
+                 .join(User, User.id == Comment.user_id)
+                 .join(Clothing, Clothing.id == Comment.clothing_id))
+    statement = _in_range(statement, Comment.created_at, start, end)
+    return statement.order_by(Comment.created_at, Comment.id)
+
+
+def _text(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _ndjson_chunk(keys, rows):
+    return ''.join(json.dumps(dict(zip(keys, map(_text, row))), ensure_ascii=False) + '\n' for row in rows)
+
+
+def _csv_chunk(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_text(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+def stream_export(statement, fmt, name, leading_rows=None):
+    """
+    Стриймва резултата от заявката като NDJSON или CSV. Редовете се четат от курсора на порции от
+    EXPORT_YIELD_PER (yield_per) и всяка порция се изпраща веднага като chunk, така че паметта
+    не зависи от размера на експорта.
+    :param statement: SQLAlchemy select с колоните за експорта
+    :param fmt: 'ndjson' или 'csv'
+    :param name: Име на файла без разширение
+    :param leading_rows: Списъци с редове-речници (ключовете са колоните на statement), които се
+        изпращат преди резултата на заявката, напр. архивираните препоръки (по избор)
+    :return: Flask Response с генератор
+    """
+    yield_per = current_app.config['EXPORT_YIELD_PER']
+
+    def generate():
+        try:
+            result = db.session.execute(statement.execution_options(yield_per=yield_per))
+            keys = list(result.keys())
+            if fmt == 'csv':
+                yield _csv_chunk([keys])
+            for dicts in leading_rows or ():
+                for offset in range(0, len(dicts), yield_per):
+                    rows = [[row[key] for key in keys] for row in dicts[offset:offset + yield_per]]
+                    yield _ndjson_chunk(keys, rows) if fmt == 'ndjson' else _csv_chunk(rows)
+            for rows in result.partitions():
+                yield _ndjson_chunk(keys, rows) if fmt == 'ndjson' else _csv_chunk(rows)
+        except Exception as e:
+            # The status line is already sent; aborting the stream tells the client the export is incomplete
+            log_error(e, f"Export {name} error")
+            raise
+
+    return Response(stream_with_context(generate()),
+                    mimetype=EXPORT_FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={name}.{fmt}'})
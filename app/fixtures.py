@@ -0,0 +1,283 @@
+import time
+import random
+import bisect
+import itertools
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, cast, text
+from sqlalchemy.dialects.postgresql import REGCLASS
+from werkzeug.security import generate_password_hash
+from app.models import db, User, BodyMeasurements, Clothing, Comment, RecommendationHistory, BODY_TYPE_CODES
+from app.counters import adjust_counter
+
+FIXTURE_EMAIL_DOMAIN = 'fixtures.smartfit.test'
+
+CLOTHING_TYPES = ['shirt', 'pants', 'dress', 'jacket', 'skirt', 'sweater']
+CLOTHING_TYPE_WEIGHTS = [30, 25, 12, 10, 8, 15]
+MATERIALS = ['elastic', 'non-elastic', 'semi-elastic']
+MATERIAL_WEIGHTS = [35, 40, 25]
+SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL']
+SIZE_WEIGHTS = [6, 20, 32, 25, 12, 5]
+RATINGS = [1, 2, 3, 4, 5]
+RATING_WEIGHTS = [7, 8, 15, 30, 40]
+
+# Garment width (cm) by size; other measurements scale from it
+SIZE_WIDTHS = {'XS': 44, 'S': 47, 'M': 50, 'L': 53, 'XL': 56, 'XXL': 60}
+CHEST_SIZE_LIMITS = [84, 90, 98, 106, 114]
+
+COMMENT_TEXTS = [
+    'Отлично качество, размерът е точен.',
+    'Леко тесен в раменете, но удобен.',
+    'Материята е приятна, препоръчвам!',
+    'Размерът е по-голям от очакваното.',
+    'Добра цена за качеството.',
+    'Не отговаря на снимката.',
+    'Перфектен размер, ще поръчам отново.'
+]
+
+
+def _size_for_chest(chest):
+    return SIZES[bisect.bisect(CHEST_SIZE_LIMITS, chest)]
+
+
+def _zipf_cum_weights(n, exponent=1.1):
+    """
+    Кумулативни тегла за избор по популярност: малко дрехи събират голяма част от активността.
+    """
+    return list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, n + 1)))
+
+
+def _last_issued_id(model):
+    """
+    Последното ID, раздадено от sequence-а на таблицата (sqlite_sequence при AUTOINCREMENT), или 0.
+    """
+    connection = db.session.connection()
+    table = model.__table__
+    if connection.dialect.name == 'sqlite' and table.dialect_options['sqlite']['autoincrement']:
+        return connection.execute(text('SELECT seq FROM sqlite_sequence WHERE name = :name'),
+                                  {'name': table.name}).scalar() or 0
+    if connection.dialect.name == 'postgresql':
+        table_name = connection.dialect.identifier_preparer.format_table(table)
+        sequence = cast(func.pg_get_serial_sequence(table_name, table.c.id.name), REGCLASS)
+        return connection.execute(select(func.pg_sequence_last_value(sequence))).scalar() or 0
+    return 0
+
+
+def _next_id(model):
+    """
+    Първото свободно ID: след най-голямото в таблицата и след последното раздадено, за да не се
+    използват отново ID-тата на изтрити или архивирани редове.
+    """
+    return max(db.session.query(func.max(model.id)).scalar() or 0, _last_issued_id(model)) + 1
+
+
+def _sync_id_sequence(model):
+    """
+    Премества sequence-а на първичния ключ след най-голямото ID. В PostgreSQL явно зададените ID-та
+    не го придвижват и следващият обикновен INSERT би получил вече заето ID; в SQLite AUTOINCREMENT
+    обновява sqlite_sequence сам.
+    """
+    connection = db.session.connection()
+    if connection.dialect.name != 'postgresql':
+        return
+    table = model.__table__
+    table_name = connection.dialect.identifier_preparer.format_table(table)
+    connection.execute(select(func.setval(func.pg_get_serial_sequence(table_name, table.c.id.name),
+                                          select(func.max(table.c.id)).scalar_subquery())))
+
+
+def _insert_rows(model, rows, batch_size):
+    """
+    Вмъква редовете от генератор на партиди с Core INSERT (executemany) в една транзакция.
+    :return: Брой вмъкнати редове
+    """
+    table = model.__table__
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(table.insert(), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+        count += len(batch)
+    # Core inserts skip the after_insert events
+    adjust_counter(db.session.connection(), model, count)
+    if count:
+        _sync_id_sequence(model)
+    db.session.commit()
+    return count
+
+
+def _random_body(rng):
+    """
+    Генерира правдоподобни телесни мерки: ръст по пол, тегло около нормален BMI,
+    гръдна обиколка и талия според теглото.
+    """
+    gender = 'female' if rng.random() < 0.52 else 'male'
+    height = rng.gauss(165, 7) if gender == 'female' else rng.gauss(178, 7)
+    bmi = min(max(rng.gauss(24, 3.5), 16), 40)
+    weight = bmi * (height / 100) ** 2
+    chest = rng.gauss(0.52 * height + 0.45 * weight - (8 if gender == 'female' else 2), 3)
+    waist = rng.gauss(0.35 * height + 0.6 * weight - (5 if gender == 'female' else 0), 3)
+    body_type = 'slim' if bmi < 21 else 'large' if bmi > 27 else 'medium'
+    return {
+        'height': round(height, 1),
+        'weight': round(weight, 1),
+        'gender': gender,
+        'chest': round(chest, 1),
+        'waist': round(waist, 1),
+        'body_type': body_type
+    }
+
+
+def generate_fixtures(users=10000, sellers=200, clothes=20000, comments=200000, recommendations=1000000,
+                      batch_size=10000, seed=42, password='password123', log=print):
+    """
+    Генерира голям обем тестови данни за натоварващи тестове: потребители с мерки, продавачи, дрехи,
+    коментари и история на препоръките. Данните се добавят към съществуващите, с явни последователни
+    ID-та, така че връзките между таблиците са валидни без допълнителни заявки. Редовете се вмъкват на
+    партиди, по една транзакция за таблица, а паролата се хешира веднъж за всички потребители.
+    :param users: Брой обикновени потребители (всеки с телесни мерки)
+    :param sellers: Брой продавачи
+    :param clothes: Брой дрехи
+    :param comments: Брой коментари
+    :param recommendations: Брой записи в историята на препоръките
+    :param batch_size: Брой редове в една INSERT партида
+    :param seed: Seed за възпроизводимост
+    :param password: Парола на всички генерирани потребители
+    :param log: Функция за съобщения за напредъка
+    :return: Речник с броя вмъкнати редове по таблица
+    """
+    if users < 1 or sellers < 1 or clothes < 1:
+        raise ValueError("users, sellers and clothes must be at least 1")
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    password_hash = generate_password_hash(password)
+    counts = {}
+
+    # Users: sellers first, then regular users, with one shared password hash
+    first_user_id = _next_id(User)
+    seller_ids = list(range(first_user_id, first_user_id + sellers))
+    user_ids = list(range(first_user_id + sellers, first_user_id + sellers + users))
+
+    def user_rows():
+        for user_id in seller_ids + user_ids:
+            role = 'seller' if user_id < first_user_id + sellers else 'user'
+            yield {
+                'id': user_id,
+                'username': f'fixture_{role}_{user_id}',
+                'email': f'{role}{user_id}@{FIXTURE_EMAIL_DOMAIN}',
+                'password_hash': password_hash,
+                'role': role,
+                'created_at': now - timedelta(days=rng.uniform(0, 730))
+            }
+
+    start = time.monotonic()
+    counts['users'] = _insert_rows(User, user_rows(), batch_size)
+    log(f"Inserted {counts['users']} users in {time.monotonic() - start:.1f}s")
+
+    # Body measurements: one row per regular user, kept in memory for the recommendations
+    bodies = [_random_body(rng) for _ in user_ids]
+    first_measurement_id = _next_id(BodyMeasurements)
+
+    def measurement_rows():
+        for i, (user_id, body) in enumerate(zip(user_ids, bodies)):
+            created = now - timedelta(days=rng.uniform(0, 730))
+            yield dict(body, id=first_measurement_id + i, user_id=user_id, age=rng.randint(16, 70),
+                       created_at=created, updated_at=created)
+
+    start = time.monotonic()
+    counts['body_measurements'] = _insert_rows(BodyMeasurements, measurement_rows(), batch_size)
+    log(f"Inserted {counts['body_measurements']} body measurements in {time.monotonic() - start:.1f}s")
+
+    # Clothes: sellers with Zipf-like catalogue sizes
+    first_clothing_id = _next_id(Clothing)
+    clothing_ids = list(range(first_clothing_id, first_clothing_id + clothes))
+    clothing_types = rng.choices(CLOTHING_TYPES, weights=CLOTHING_TYPE_WEIGHTS, k=clothes)
+    seller_weights = _zipf_cum_weights(sellers, exponent=0.8)
+
+    def clothing_rows():
+        for clothing_id, clothing_type in zip(clothing_ids, clothing_types):
+            size = rng.choices(SIZES, weights=SIZE_WEIGHTS)[0]
+            width = SIZE_WIDTHS[size] + rng.uniform(-1.5, 1.5)
+            if clothing_type in ('pants', 'skirt'):
+                width -= 10
+            created = now - timedelta(days=rng.uniform(0, 730))
+            yield {
+                'id': clothing_id,
+                'name': f'{clothing_type.capitalize()} #{clothing_id}',
+                'type': clothing_type,
+                'material': rng.choices(MATERIALS, weights=MATERIAL_WEIGHTS)[0],
+                'size': size,
+                'width': round(width, 1),
+                'length': round(rng.uniform(95, 110) if clothing_type == 'pants' else rng.uniform(60, 100), 1),
+                'sleeves': round(rng.uniform(20, 68), 1) if clothing_type in ('shirt', 'jacket', 'sweater') else None,
+                'price': round(rng.lognormvariate(4.2, 0.5), 2),
+                'description': f'Генерирана дреха за тестове ({clothing_type}, {size})',
+                'image_url': None,
+                'seller_id': rng.choices(seller_ids, cum_weights=seller_weights)[0],
+                'created_at': created,
+                'updated_at': created
+            }
+
+    start = time.monotonic()
+    counts['clothes'] = _insert_rows(Clothing, clothing_rows(), batch_size)
+    log(f"Inserted {counts['clothes']} clothes in {time.monotonic() - start:.1f}s")
+
+    # Popular clothes get most of the comments and recommendations
+    clothing_weights = _zipf_cum_weights(clothes)
+    popularity = clothing_ids[:]
+    rng.shuffle(popularity)
+    clothing_type_by_id = dict(zip(clothing_ids, clothing_types))
+
+    first_comment_id = _next_id(Comment)
+
+    def comment_rows():
+        for i in range(comments):
+            created = now - timedelta(days=rng.uniform(0, 365))
+            yield {
+                'id': first_comment_id + i,
+                'content': rng.choice(COMMENT_TEXTS),
+                'rating': rng.choices(RATINGS, weights=RATING_WEIGHTS)[0],
+                'user_id': rng.choice(user_ids),
+                'clothing_id': rng.choices(popularity, cum_weights=clothing_weights)[0],
+                'created_at': created,
+                'updated_at': created
+            }
+
+    start = time.monotonic()
+    counts['comments'] = _insert_rows(Comment, comment_rows(), batch_size)
+    log(f"Inserted {counts['comments']} comments in {time.monotonic() - start:.1f}s")
+
+    # Recommendations: a minority of very active users, sizes derived from the body measurements
+    user_weights = _zipf_cum_weights(users, exponent=0.7)
+    first_recommendation_id = _next_id(RecommendationHistory)
+
+    def recommendation_rows():
+        for i in range(recommendations):
+            index = bisect.bisect(user_weights, rng.random() * user_weights[-1])
+            body = bodies[min(index, users - 1)]
+            clothing_id = rng.choices(popularity, cum_weights=clothing_weights)[0]
+            size_index = SIZES.index(_size_for_chest(body['chest']))
+            # Some noise, as the model does not always agree with the chest size
+            size_index = min(max(size_index + rng.choices([-1, 0, 1], weights=[1, 8, 1])[0], 0), len(SIZES) - 1)
+            yield {
+                'id': first_recommendation_id + i,
+                'user_id': user_ids[min(index, users - 1)],
+                'date': now - timedelta(seconds=rng.uniform(0, 365 * 24 * 3600)),
+                'clothing_type': clothing_type_by_id[clothing_id],
+                'recommended_size': SIZES[size_index],
+                'height_cm': body['height'],
+                'weight_kg': body['weight'],
+                'chest_cm': body['chest'],
+                'waist_cm': body['waist'],
+                'body_type_code': BODY_TYPE_CODES[body['body_type']],
+                'item_identifier': str(clothing_id)
+            }
+
+    start = time.monotonic()
+    counts['recommendations'] = _insert_rows(RecommendationHistory, recommendation_rows(), batch_size)
+    log(f"Inserted {counts['recommendations']} recommendations in {time.monotonic() - start:.1f}s")
+    return counts
@@ -2,21 +2,145 @@ import pandas as pd
 import numpy as np
 import joblib
 from sklearn.metrics import classification_report, accuracy_score, confusion_matrix
-import seaborn as sns
-import matplotlib.pyplot as plt
 import os
+import sys
+import time
+import argparse
+from joblib import Parallel, delayed
 
-def evaluate_model():
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from app.ml.feature_store import load_feature_set
+
+def _plot_confusion_matrix(conf_matrix, classes, plot_path):
+    """
+    Записва визуализация на confusion matrix. Seaborn и matplotlib се зареждат само тук,
+    така че оценката без графика не плаща цената на импорта им.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.figure(figsize=(10, 8))
+    sns.heatmap(conf_matrix, annot=True, fmt='d', cmap='Blues',
+               xticklabels=classes,
+               yticklabels=classes)
+    plt.title('Confusion Matrix')
+    plt.ylabel('True Label')
+    plt.xlabel('Predicted Label')
+    plt.tight_layout()
+    plt.savefig(plot_path)
+    plt.close()
+
+def evaluation_labels(model_classes, y):
+    """
+    Етикетите за метриките: класовете на модела, последвани от размерите в данните, които моделът
+    не познава (за тях recall е 0, вместо да се пропускат или да предизвикат грешка).
+    :return: (списък с етикети, списък с непознатите етикети)
+    """
+    unknown = sorted(set(np.unique(y)) - set(model_classes))
+    return list(model_classes) + unknown, unknown
+
+def _label_indices(labels, class_index):
+    unknown = set(labels) - class_index.keys()
+    if unknown:
+        raise ValueError(f"Labels missing from the evaluation classes: {sorted(unknown)}")
+    return np.array([class_index[label] for label in labels])
+
+def _predict_in_chunks(model, X, y, classes, chunk_size):
+    """
+    Прогнозира на части и натрупва confusion matrix, без да държи всички прогнози в паметта.
+    classes трябва да съдържа всички етикети в y (вж. evaluation_labels).
+    """
+    class_index = {label: i for i, label in enumerate(classes)}
+    conf_matrix = np.zeros((len(classes), len(classes)), dtype=np.int64)
+    for start in range(0, len(y), chunk_size):
+        y_chunk = y[start:start + chunk_size]
+        y_pred = model.predict(np.asarray(X[start:start + chunk_size]))
+        np.add.at(conf_matrix, (_label_indices(y_chunk, class_index), _label_indices(y_pred, class_index)), 1)
+    return conf_matrix
+
+def _report_from_confusion(conf_matrix, classes):
+    """
+    Съставя classification report (precision, recall, f1, support) от натрупаната confusion matrix.
+    """
+    true_positives = np.diag(conf_matrix).astype(float)
+    support = conf_matrix.sum(axis=1)
+    predicted = conf_matrix.sum(axis=0)
+    precision = np.divide(true_positives, predicted, out=np.zeros_like(true_positives), where=predicted > 0)
+    recall = np.divide(true_positives, support, out=np.zeros_like(true_positives), where=support > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall,
+                   out=np.zeros_like(true_positives), where=(precision + recall) > 0)
+    total = support.sum()
+
+    width = max(len(str(c)) for c in list(classes) + ['weighted avg'])
+    lines = [f"{'':>{width}} {'precision':>9} {'recall':>9} {'f1-score':>9} {'support':>9}", '']
+    for i, label in enumerate(classes):
+        lines.append(f"{str(label):>{width}} {precision[i]:9.2f} {recall[i]:9.2f} {f1[i]:9.2f} {support[i]:9d}")
+    lines.append('')
+    lines.append(f"{'accuracy':>{width}} {'':>9} {'':>9} {true_positives.sum() / total:9.2f} {total:9d}")
+    lines.append(f"{'macro avg':>{width}} {precision.mean():9.2f} {recall.mean():9.2f} {f1.mean():9.2f} {total:9d}")
+    weights = support / total
+    lines.append(f"{'weighted avg':>{width}} {np.dot(precision, weights):9.2f} {np.dot(recall, weights):9.2f} "
+                 f"{np.dot(f1, weights):9.2f} {total:9d}")
+    return '\n'.join(lines) + '\n'
+
+def _permuted_score(model, X, y, feature, repeat, random_state, chunk_size):
+    """
+    Точност на модела след разбъркване на една колона (една задача от permutation importance).
+    Копира се само разбърканата колона и текущата част от редовете, а не цялата матрица.
+    """
+    rng = np.random.RandomState(random_state + repeat)
+    permuted_column = np.asarray(X[:, feature])[rng.permutation(len(y))]
+    correct = 0
+    for start in range(0, len(y), chunk_size):
+        X_chunk = np.array(X[start:start + chunk_size], copy=True)
+        X_chunk[:, feature] = permuted_column[start:start + chunk_size]
+        correct += int(np.sum(model.predict(X_chunk) == y[start:start + chunk_size]))
+    return feature, correct / len(y)
+
+def parallel_permutation_importance(model, X, y, baseline_score, n_repeats=10, n_jobs=-1, random_state=42,
+                                    chunk_size=50000):
+    """
+    Permutation importance, паралелизирана по признаци и повторения едновременно. Базовата точност
+    се подава отвън, за да се преизползва вече направеното предсказване върху всички данни.
+    :return: Масив със средното намаление на точността за всеки признак
+    """
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_permuted_score)(model, X, y, feature, repeat, random_state, chunk_size)
+        for feature in range(X.shape[1])
+        for repeat in range(n_repeats)
+    )
+    drops = np.zeros(X.shape[1])
+    for feature, score in results:
+        drops[feature] += baseline_score - score
+    return drops / n_repeats
+
+def evaluate_model(fast=False, plot=True, chunk_size=50000, n_jobs=-1, n_repeats=10):
     """
     Оценява обучен ML модел, изчислява метрики, confusion matrix и feature importance, и ги записва във файл.
+    :param fast: Бърз режим: прогнози на части и паралелна permutation importance с една базова прогноза
+    :param plot: Дали да се запише графика на confusion matrix
+    :param chunk_size: Брой редове в част при бързия режим
+    :param n_jobs: Брой паралелни процеси за permutation importance в бързия режим
+    :param n_repeats: Брой повторения за permutation importance
     """
     try:
-        # Зареждане на данните
-        dataset_path = os.path.join(os.path.dirname(__file__), 'training_data.csv')
-        df = pd.read_csv(dataset_path)
+        timings = []
+        stage_start = time.perf_counter()
+
+        def mark(stage):
+            nonlocal stage_start
+            now = time.perf_counter()
+            timings.append((stage, now - stage_start))
+            stage_start = now
+
+        # Зареждане на кодираните данни от feature store
+        feature_set = load_feature_set()
+        y = feature_set.target_labels()
         print("📊 Dataset loaded successfully!")
-        print(f"Dataset shape: {df.shape}")
-        print(f"Size distribution:\n{df['size'].value_counts()}\n")
+        print(f"Dataset rows: {len(feature_set)}")
+        print(f"Size distribution:\n{pd.Series(y).value_counts()}\n")
 
         # Зареждане на модела и препроцесорите
         model_path = os.path.join(os.path.dirname(__file__), 'model.pkl')
@@ -27,78 +151,99 @@ def evaluate_model():
         numerical_features = model_data['numerical_features']
         categorical_features = model_data['categorical_features']
 
-        # Подготовка на данните
-        X_numerical = df[numerical_features]
-        X_numerical_scaled = scaler.transform(X_numerical)
-
-        X_categorical = pd.DataFrame()
-        for feature in categorical_features:
-            X_categorical[feature] = label_encoders[feature].transform(df[feature])
+        # Подготовка на данните със скалера и енкодерите на модела
+        X = feature_set.encoded_matrix(scaler, label_encoders)
+        mark('load')
 
-        X = np.column_stack([X_numerical_scaled, X_categorical])
-        y = df['size']
+        # Размери в данните, които моделът не познава, се отчитат отделно
+        labels, unknown_labels = evaluation_labels(model.classes_, y)
+        if unknown_labels:
+            print(f"⚠️ Sizes not known to the model (always mispredicted): {unknown_labels}")
 
-        # Прогноза
-        y_pred = model.predict(X)
+        # Прогноза и изчисляване на метрики
+        if fast:
+            conf_matrix = _predict_in_chunks(model, X, y, labels, chunk_size)
+            accuracy = np.trace(conf_matrix) / conf_matrix.sum()
+            report = _report_from_confusion(conf_matrix, labels)
+        else:
+            y_pred = model.predict(X)
+            accuracy = accuracy_score(y, y_pred)
+            report = classification_report(y, y_pred, labels=labels, zero_division=0)
+            conf_matrix = confusion_matrix(y, y_pred, labels=labels)
+        mark('predict_and_metrics')
 
-        # Изчисляване на метрики
-        accuracy = accuracy_score(y, y_pred)
-        report = classification_report(y, y_pred)
-        conf_matrix = confusion_matrix(y, y_pred, labels=model.classes_)
+        # Изчисляване на importance чрез permutation importance
+        if fast:
+            importances = parallel_permutation_importance(model, X, y, accuracy, n_repeats=n_repeats,
+                                                          n_jobs=n_jobs, random_state=42, chunk_size=chunk_size)
+        else:
+            from sklearn.inspection import permutation_importance
+            importances = permutation_importance(model, X, y, n_repeats=n_repeats, random_state=42).importances_mean
+        feature_importance = pd.DataFrame({
+            'feature': numerical_features + categorical_features,
+            'importance': importances
+        })
+        # Сортиране по importance
+        feature_importance = feature_importance.sort_values('importance', ascending=False)
+        mark('permutation_importance')
 
         # Запис на резултатите във файл
         results_path = os.path.join(os.path.dirname(__file__), 'model_metrics.txt')
         with open(results_path, 'w') as f:
             f.write("🎯 Model Evaluation Metrics\n")
             f.write("=" * 50 + "\n\n")
-            
+
             f.write(f"📊 Overall Accuracy: {accuracy:.2%}\n\n")
-            
+
             f.write("📋 Classification Report:\n")
             f.write(report + "\n")
-            
+
             f.write("📈 Confusion Matrix:\n")
             f.write(str(conf_matrix) + "\n\n")
-            
+
             f.write("🏷️ Class Labels:\n")
-            f.write(str(list(model.classes_)) + "\n\n")
-            
-            # Изчисляване на feature importance от вероятностите
-            feature_importance = pd.DataFrame({
-                'feature': numerical_features + categorical_features,
-                'importance': np.zeros(len(numerical_features + categorical_features))
-            })
-            
-            # Изчисляване на importance чрез permutation importance
-            from sklearn.inspection import permutation_importance
-            r = permutation_importance(model, X, y, n_repeats=10, random_state=42)
-            feature_importance['importance'] = r.importances_mean
-            
-            # Сортиране по importance
-            feature_importance = feature_importance.sort_values('importance', ascending=False)
+            f.write(str(labels) + "\n\n")
+            if unknown_labels:
+                f.write(f"⚠️ Sizes not known to the model: {unknown_labels}\n\n")
+
             f.write("📊 Feature Importance:\n")
             f.write(feature_importance.to_string(index=False))
+        mark('write_metrics')
 
         # Създаване на визуализация на confusion matrix
-        plt.figure(figsize=(10, 8))
-        sns.heatmap(conf_matrix, annot=True, fmt='d', cmap='Blues',
-                   xticklabels=model.classes_,
-                   yticklabels=model.classes_)
-        plt.title('Confusion Matrix')
-        plt.ylabel('True Label')
-        plt.xlabel('Predicted Label')
-        plt.tight_layout()
-        
-        # Запазване на графиката
         plot_path = os.path.join(os.path.dirname(__file__), 'confusion_matrix.png')
-        plt.savefig(plot_path)
-        plt.close()
+        if plot:
+            _plot_confusion_matrix(conf_matrix, labels, plot_path)
+            mark('plot')
+
+        # Запис на времената по етапи до model_timings.txt
+        timings_path = os.path.join(os.path.dirname(__file__), 'model_timings.txt')
+        with open(timings_path, 'w') as f:
+            f.write(f"mode: {'fast' if fast else 'full'}\n")
+            for stage, duration in timings:
+                f.write(f"{stage}: {duration:.3f}s\n")
+            f.write(f"total: {sum(duration for _, duration in timings):.3f}s\n")
 
         print(f"✅ Evaluation complete! Results saved to {results_path}")
-        print(f"📊 Confusion matrix plot saved to {plot_path}")
+        print(f"⏱️ Stage timings saved to {timings_path}")
+        if plot:
+            print(f"📊 Confusion matrix plot saved to {plot_path}")
 
     except Exception as e:
         print(f"❌ Error during evaluation: {str(e)}")
 
 if __name__ == '__main__':
-    evaluate_model() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Evaluate the SmartFit size recommendation model')
+    parser.add_argument('--fast', action='store_true',
+                        help='Chunked predictions and parallel permutation importance')
+    parser.add_argument('--no-plot', action='store_true',
+                        help='Do not render confusion_matrix.png')
+    parser.add_argument('--chunk-size', type=int, default=50000,
+                        help='Rows per prediction chunk in fast mode')
+    parser.add_argument('--n-jobs', type=int, default=-1,
+                        help='Parallel workers for permutation importance in fast mode')
+    parser.add_argument('--repeats', type=int, default=10,
+                        help='Permutation importance repeats')
+    args = parser.parse_args()
+    evaluate_model(fast=args.fast, plot=not args.no_plot, chunk_size=args.chunk_size,
+                   n_jobs=args.n_jobs, n_repeats=args.repeats)
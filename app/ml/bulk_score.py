@@ -0,0 +1,176 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_COLUMNS = ['size', 'confidence', 'alternative_size', 'alternative_confidence', 'error']
+
+_ml_model = None
+
+
+def _init_worker():
+    """
+    Зарежда модела веднъж за всеки процес от пула.
+    """
+    global _ml_model
+    from app.ml import ml_model
+    ml_model.load_model()
+    _ml_model = ml_model
+
+
+def _score_chunk(start_row, frame, id_column):
+    """
+    Оценява една част от входа в процес от пула.
+    :param start_row: Номер на първия ред от частта във входния файл
+    :param frame: DataFrame с входните редове
+    :param id_column: Колона, която да се пренесе в изхода (по избор)
+    :return: DataFrame с резултатите в реда на входа
+    """
+    result = _ml_model.predict_batch(frame)
+    output = pd.DataFrame({'row': range(start_row, start_row + len(frame))})
+    if id_column:
+        output[id_column] = frame[id_column].to_numpy()
+    for column in OUTPUT_COLUMNS:
+        output[column] = result[column]
+    return output
+
+
+def _progress_path(output_path):
+    return output_path + '.progress'
+
+
+def _load_progress(output_path, input_path):
+    """
+    Чете докъде е стигнала предишна обработка. Изходният файл се отрязва до последната
+    потвърдена част, за да няма дублирани или непълни редове.
+    """
+    path = _progress_path(output_path)
+    if not os.path.exists(path) or not os.path.exists(output_path):
+        return None
+    with open(path) as f:
+        progress = json.load(f)
+    if progress.get('input') != os.path.abspath(input_path):
+        raise ValueError(f"{path} belongs to a different input file: {progress.get('input')}")
+    with open(output_path, 'r+b') as f:
+        f.truncate(progress['output_bytes'])
+    return progress
+
+
+def _save_progress(output_path, input_path, rows_done, output_bytes):
+    path = _progress_path(output_path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'input': os.path.abspath(input_path), 'rows_done': rows_done,
+                   'output_bytes': output_bytes}, f)
+    os.replace(tmp_path, path)
+
+
+def _skip_records(reader, count):
+    """
+    Пропуска първите count записа от частите на CSV reader-а. Брои се по прочетени записи, а не по
+    редове във файла, защото поле в кавички може да съдържа нов ред.
+    """
+    for frame in reader:
+        if count >= len(frame):
+            count -= len(frame)
+            continue
+        yield frame.iloc[count:] if count else frame
+        count = 0
+
+
+def _write_chunk(out, output, fmt, write_header):
+    if fmt == 'csv':
+        output.to_csv(out, header=write_header, index=False)
+    else:
+        output = output.astype(object).where(output.notna(), None)
+        for record in output.to_dict(orient='records'):
+            out.write(json.dumps(record, default=str, ensure_ascii=False) + '\n')
+
+
+def bulk_score(input_path, output_path, fmt=None, chunk_size=10000, workers=None, resume=False,
+               id_column=None):
+    """
+    Оценява CSV файл с клиенти: чете го на части, разпределя частите към пул от процеси и записва
+    резултатите (размер, доверие, алтернативен размер) в реда на входа като CSV или JSON lines.
+    :param input_path: Входен CSV файл
+    :param output_path: Изходен файл
+    :param fmt: 'csv' или 'jsonl' (по подразбиране според разширението на изхода)
+    :param chunk_size: Брой редове в една част
+    :param workers: Брой процеси (по подразбиране броят ядра)
+    :param resume: Продължава прекъсната обработка вместо да започне отначало
+    :param id_column: Колона от входа, която да се пренесе в изхода (по избор)
+    :return: Брой обработени редове
+    """
+    if fmt is None:
+        fmt = 'jsonl' if output_path.endswith(('.jsonl', '.ndjson')) else 'csv'
+    workers = workers or os.cpu_count() or 1
+
+    progress = _load_progress(output_path, input_path) if resume else None
+    rows_done = progress['rows_done'] if progress else 0
+    if progress:
+        logger.info(f"Resuming after {rows_done} rows")
+    elif os.path.exists(_progress_path(output_path)):
+        os.remove(_progress_path(output_path))
+
+    reader = _skip_records(pd.read_csv(input_path, chunksize=chunk_size, dtype=str, keep_default_na=False),
+                           rows_done)
+    start_time = time.monotonic()
+    rows_scored = 0
+    with open(output_path, 'a' if progress else 'w', newline='', encoding='utf-8') as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        write_header = not progress
+        pending = deque()
+        next_row = rows_done
+
+        def write_next():
+            nonlocal write_header, rows_scored, rows_done
+            output = pending.popleft().result()
+            _write_chunk(out, output, fmt, write_header)
+            write_header = False
+            out.flush()
+            os.fsync(out.fileno())
+            rows_done += len(output)
+            rows_scored += len(output)
+            _save_progress(output_path, input_path, rows_done, out.tell())
+            elapsed = time.monotonic() - start_time
+            logger.info(f"Scored {rows_done} rows ({rows_scored / elapsed:.0f} rows/s)")
+
+        for frame in reader:
+            pending.append(executor.submit(_score_chunk, next_row, frame, id_column))
+            next_row += len(frame)
+            # Keep a bounded number of chunks in flight, so memory does not grow with the input
+            while len(pending) >= 2 * workers:
+                write_next()
+        while pending:
+            write_next()
+
+    elapsed = time.monotonic() - start_time
+    rate = rows_scored / elapsed if elapsed > 0 else 0.0
+    print(f"Scored {rows_scored} rows in {elapsed:.1f}s ({rate:.0f} rows/s), output: {output_path}")
+    if os.path.exists(_progress_path(output_path)):
+        os.remove(_progress_path(output_path))
+    return rows_scored
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Bulk size predictions for a customer CSV')
+    parser.add_argument('input', help='Input CSV with measurement and garment columns')
+    parser.add_argument('output', help='Output .csv or .jsonl file')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default=None)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--resume', action='store_true', help='Continue an interrupted run')
+    parser.add_argument('--id-column', default=None, help='Input column copied to the output')
+    args = parser.parse_args()
+    bulk_score(args.input, args.output, fmt=args.format, chunk_size=args.chunk_size, workers=args.workers,
+               resume=args.resume, id_column=args.id_column)
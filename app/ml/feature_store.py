@@ -0,0 +1,198 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import shutil
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+from sklearn.model_selection import train_test_split
+
+logger = logging.getLogger(__name__)
+
+NUMERICAL_FEATURES = ['height', 'weight', 'waist', 'chest']
+CATEGORICAL_FEATURES = ['gender', 'body_type', 'material', 'garment_type']
+TARGET = 'size'
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(__file__), 'training_data.csv')
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(__file__), '.feature_store')
+
+STORE_FORMAT_VERSION = 1
+
+# Held-out test split of train_model; retraining replays only the training side of it
+TEST_SIZE = 0.2
+SPLIT_RANDOM_STATE = 42
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """
+    Изчислява sha256 на съдържанието на файла на части, без да го зарежда целия в паметта.
+    :param path: Път до файла
+    :param chunk_size: Размер на частите в байтове
+    :return: Шестнайсетичен низ с хеша
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FeatureSet:
+    """
+    Кодирани тренировъчни данни, заредени memory-mapped от колонен формат на диска.
+    Числовите признаци са float32, категориалните и целевата колона са кодове (int16)
+    в реда на сортираните категории, както ги дава LabelEncoder.
+    """
+
+    def __init__(self, path, meta, numerical, categorical, target):
+        self.path = path
+        self.content_hash = meta['content_hash']
+        self.numerical_features = meta['numerical_features']
+        self.categorical_features = meta['categorical_features']
+        self.categories = meta['categories']
+        self.target_classes = meta['target_classes']
+        self.numerical = numerical
+        self.categorical = categorical
+        self.target = target
+
+    def __len__(self):
+        return len(self.target)
+
+    @property
+    def feature_names(self):
+        return self.numerical_features + self.categorical_features
+
+    def label_encoders(self):
+        """
+        Връща LabelEncoder за всеки категориален признак, съвместим с кодовете в хранилището.
+        """
+        encoders = {}
+        for feature in self.categorical_features:
+            encoder = LabelEncoder()
+            encoder.classes_ = np.asarray(self.categories[feature], dtype=object)
+            encoders[feature] = encoder
+        return encoders
+
+    def target_labels(self):
+        """
+        Връща целевите стойности като етикети (напр. 'M'), а не като кодове.
+        """
+        return np.asarray(self.target_classes, dtype=object)[self.target]
+
+    def categorical_codes(self, label_encoders):
+        """
+        Връща категориалните кодове спрямо подадените енкодери (напр. тези от model.pkl).
+        Ако категориите съвпадат, кодовете се използват директно без копиране по колони.
+        :param label_encoders: Речник признак -> LabelEncoder
+        :return: Матрица с кодове (int16)
+        """
+        columns = []
+        for i, feature in enumerate(self.categorical_features):
+            classes = list(label_encoders[feature].classes_)
+            if classes == self.categories[feature]:
+                columns.append(self.categorical[:, i])
+            else:
+                mapping = label_encoders[feature].transform(self.categories[feature]).astype(np.int16)
+                columns.append(mapping[self.categorical[:, i]])
+        return np.column_stack(columns)
+
+    def encoded_matrix(self, scaler, label_encoders=None):
+        """
+        Сглобява матрицата за модела: скалирани числови признаци, последвани от категориалните кодове.
+        :param scaler: Обучен StandardScaler
+        :param label_encoders: Енкодери на модела (по избор, по подразбиране кодовете от хранилището)
+        :return: Матрица float32
+        """
+        codes = self.categorical if label_encoders is None else self.categorical_codes(label_encoders)
+        scaled = scaler.transform(self.numerical).astype(np.float32, copy=False)
+        return np.column_stack([scaled, codes.astype(np.float32)])
+
+
+def train_test_indices(labels, test_size=TEST_SIZE, random_state=SPLIT_RANDOM_STATE):
+    """
+    Индексите на тренировъчните и тестовите редове при стратифицираното разделяне на train_model.
+    Зависят само от етикетите и seed-а, така че същото разделяне може да се възстанови по-късно.
+    :param labels: Целевите стойности на всички редове
+    :return: (тренировъчни индекси, тестови индекси)
+    """
+    return train_test_split(np.arange(len(labels)), test_size=test_size, random_state=random_state,
+                            stratify=labels)
+
+
+def _build_store(csv_path, target_dir, content_hash):
+    """
+    Преобразува CSV файла веднъж в колонни .npy файлове и meta.json.
+    """
+    df = pd.read_csv(csv_path)
+    categories = {}
+    codes = []
+    for feature in CATEGORICAL_FEATURES:
+        values = pd.Categorical(df[feature].astype(str))
+        categories[feature] = [str(c) for c in values.categories]
+        codes.append(values.codes.astype(np.int16))
+    target = pd.Categorical(df[TARGET].astype(str))
+
+    tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(target_dir), prefix='.building-')
+    try:
+        # Fortran order keeps each feature contiguous on disk (columnar layout)
+        np.save(os.path.join(tmp_dir, 'numerical.npy'),
+                np.asfortranarray(df[NUMERICAL_FEATURES].to_numpy(dtype=np.float32)))
+        np.save(os.path.join(tmp_dir, 'categorical.npy'), np.asfortranarray(np.column_stack(codes)))
+        np.save(os.path.join(tmp_dir, 'target.npy'), target.codes.astype(np.int16))
+        meta = {
+            'format_version': STORE_FORMAT_VERSION,
+            'content_hash': content_hash,
+            'source': os.path.abspath(csv_path),
+            'rows': len(df),
+            'numerical_features': NUMERICAL_FEATURES,
+            'categorical_features': CATEGORICAL_FEATURES,
+            'categories': categories,
+            'target_classes': [str(c) for c in target.categories]
+        }
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_dir, target_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    logger.info(f"Built feature store for {csv_path} ({len(df)} rows) in {target_dir}")
+
+
+def load_feature_set(csv_path=DEFAULT_DATASET, store_dir=DEFAULT_STORE_DIR):
+    """
+    Зарежда кодираните данни за CSV файла. При първо извикване за дадено съдържание ги
+    преобразува и записва, а при следващите ги отваря memory-mapped без повторно парсване.
+    :param csv_path: Път до CSV файла с тренировъчни данни
+    :param store_dir: Директория на хранилището
+    :return: FeatureSet
+    """
+    content_hash = file_hash(csv_path)
+    target_dir = os.path.join(store_dir, f"v{STORE_FORMAT_VERSION}-{content_hash[:32]}")
+    os.makedirs(store_dir, exist_ok=True)
+    if not os.path.exists(os.path.join(target_dir, 'meta.json')):
+        try:
+            _build_store(csv_path, target_dir, content_hash)
+        except OSError:
+            # Another process finished building the same content first
+            if not os.path.exists(os.path.join(target_dir, 'meta.json')):
+                raise
+
+    with open(os.path.join(target_dir, 'meta.json')) as f:
+        meta = json.load(f)
+    return FeatureSet(
+        target_dir,
+        meta,
+        np.load(os.path.join(target_dir, 'numerical.npy'), mmap_mode='r'),
+        np.load(os.path.join(target_dir, 'categorical.npy'), mmap_mode='r'),
+        np.load(os.path.join(target_dir, 'target.npy'), mmap_mode='r')
+    )
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    feature_set = load_feature_set()
+    print(f"Feature store: {feature_set.path}")
+    print(f"Rows: {len(feature_set)} | Features: {feature_set.feature_names}")
+    print(f"Target classes: {feature_set.target_classes}")
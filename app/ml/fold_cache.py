@@ -0,0 +1,94 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import joblib
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), '.cache')
+
+
+def data_fingerprint(X, y):
+    """
+    Изчислява отпечатък (sha256) на данните, за да се разпознава кога фолдовете са върху същите примери.
+    :param X: Матрица с признаци
+    :param y: Целеви стойности
+    :return: Шестнайсетичен низ с хеша
+    """
+    digest = hashlib.sha256()
+    for array in (np.asarray(X), np.asarray(y)):
+        array = np.ascontiguousarray(array)
+        digest.update(str(array.dtype).encode())
+        digest.update(str(array.shape).encode())
+        if array.dtype == object:
+            digest.update('\x1f'.join(map(str, array.ravel())).encode())
+        else:
+            digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+class FoldCache:
+    """
+    Content-addressed кеш на диска за резултати от обучение (точности по фолдове и калибрирани модели).
+    Ключът е хеш от параметрите, номера на фолда и отпечатъка на данните, така че повторно
+    или разширено търсене преизползва вече изчислените резултати.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts):
+        """
+        Създава ключ от произволни JSON-сериализируеми части.
+        """
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.joblib')
+
+    def get(self, key):
+        """
+        Връща записаната стойност за ключа или None, ако липсва.
+        """
+        path = self._path(key)
+        if os.path.exists(path):
+            try:
+                value = joblib.load(path)
+                self.hits += 1
+                return value
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """
+        Записва стойността атомарно, за да не остават повредени файлове при прекъсване.
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        os.close(fd)
+        try:
+            joblib.dump(value, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def summary(self):
+        """
+        Връща кратко описание колко от търсените резултати са преизползвани.
+        """
+        total = self.hits + self.misses
+        ratio = self.hits / total if total else 0.0
+        return f"reused {self.hits}/{total} cached results ({ratio:.0%})"
@@ -1,30 +1,61 @@
-from sklearn.ensemble import RandomForestClassifier
-import joblib
-import numpy as np
 import os
 import logging
 import traceback
-import pickle
-from sklearn.preprocessing import LabelEncoder, StandardScaler
+import queue
+import random
+import threading
+import time
+from collections import deque
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Load model and preprocessing objects
-try:
-    model_data = joblib.load('app/ml/model.pkl')
-    model = model_data['model']
-    scaler = model_data['scaler']
-    label_encoders = model_data['label_encoders']
-    numerical_features = model_data['numerical_features']
-    categorical_features = model_data['categorical_features']
-    
-    logger.info("Model loaded successfully")
-    logger.debug(f"Feature names: {numerical_features + categorical_features}")
-    logger.debug(f"Label encoders: {list(label_encoders.keys())}")
-except Exception as e:
-    logger.error(f"Error loading model: {str(e)}")
-    raise
+MODEL_PATH = os.environ.get('SMARTFIT_MODEL_PATH', os.path.join(os.path.dirname(__file__), 'model.pkl'))
+
+# numpy, joblib and sklearn (through the pickle) are imported by load_model() on the first
+# prediction, so importing this module at app startup stays cheap
+np = None
+model_data = None
+model = None
+scaler = None
+label_encoders = None
+numerical_features = None
+categorical_features = None
+_load_lock = threading.Lock()
+
+def load_model():
+    """
+    Зарежда модела и препроцесорите при първо извикване и ги кешира за процеса.
+    :return: Речник с данните на модела
+    """
+    global np, model_data, model, scaler, label_encoders, numerical_features, categorical_features
+    if model is not None:
+        return model_data
+    with _load_lock:
+        if model is None:
+            import numpy
+            import joblib
+            try:
+                data = joblib.load(MODEL_PATH)
+                np = numpy
+                model_data = data
+                scaler = data['scaler']
+                label_encoders = data['label_encoders']
+                numerical_features = data['numerical_features']
+                categorical_features = data['categorical_features']
+                model = data['model']
+                
+                logger.info("Model loaded successfully")
+                logger.debug(f"Feature names: {numerical_features + categorical_features}")
+                logger.debug(f"Label encoders: {list(label_encoders.keys())}")
+            except Exception as e:
+                logger.error(f"Error loading model: {str(e)}")
+                raise
+    return model_data
+
+FIELD_MAPPING = {
+    'clothing_width': 'garment_width',
+    'clothing_type': 'garment_type'
+}
 
 EN_TO_BG = {
     "height": "височина",
@@ -46,47 +77,221 @@ def translate_to_bg(data):
     """
     return {EN_TO_BG.get(k, k): v for k, v in data.items()}
 
+def _prepare_features(normalized_data, scaler, label_encoders, numerical_features, categorical_features):
+    """
+    Подготвя входа за модела: скалирани числови признаци и кодирани категориални признаци.
+    :param normalized_data: Речник с нормализирани имена на полетата
+    :return: Матрица с един ред
+    """
+    # Prepare numerical features
+    numerical_data = np.array([[float(normalized_data[feature]) for feature in numerical_features]])
+    numerical_data = scaler.transform(numerical_data)
+    
+    # Prepare categorical features
+    categorical_data = []
+    for feature in categorical_features:
+        value = normalized_data[feature]
+        if feature in label_encoders:
+            try:
+                encoded_value = label_encoders[feature].transform([value])[0]
+                categorical_data.append(encoded_value)
+            except ValueError as e:
+                logger.error(f"Unseen value '{value}' for feature {feature}")
+                logger.error(f"Available categories: {label_encoders[feature].classes_}")
+                raise ValueError(f"Unseen value '{value}' for feature {feature}. Available categories: {label_encoders[feature].classes_}")
+        else:
+            logger.error(f"No label encoder found for feature {feature}")
+            raise ValueError(f"No label encoder found for feature {feature}")
+    
+    # Combine features
+    categorical_data = np.array([categorical_data])
+    return np.column_stack([numerical_data, categorical_data])
+
+class ShadowEvaluator:
+    """
+    Оценява модел-кандидат върху реални заявки, без да влияе на отговорите. Част от входовете
+    се поставят в ограничена опашка и се обработват от фонова нишка; при пълна опашка или докато
+    нишката още зарежда кандидата заявката за сравнение се изхвърля (и се брои), така че
+    кандидатът никога не добавя забавяне към /predict.
+    """
+
+    def __init__(self, candidate_path, sample_rate=0.1, queue_size=100, window=1000):
+        self.candidate_path = candidate_path
+        self.sample_rate = sample_rate
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.candidate = None
+        self.ready = threading.Event()
+        self.load_error = None
+        self.thread = None
+        self.sampled = 0
+        self.dropped = 0
+        self.not_ready = 0
+        self.compared = 0
+        self.agreed = 0
+        self.errors = 0
+        self.confidence_delta_sum = 0.0
+        self.abs_confidence_delta_sum = 0.0
+        self.primary_latencies = deque(maxlen=window)
+        self.shadow_latencies = deque(maxlen=window)
+
+    def start(self):
+        """
+        Стартира фоновата нишка, която зарежда кандидата и след това обработва опашката. Заявката,
+        която стартира оценителя, не чака зареждането.
+        """
+        self.thread = threading.Thread(target=self._run, name='ml-shadow', daemon=True)
+        self.thread.start()
+
+    def _load_candidate(self):
+        import joblib
+        try:
+            self.candidate = joblib.load(self.candidate_path)
+        except Exception as e:
+            self.load_error = str(e)
+            logger.error(f"Error loading shadow model {self.candidate_path}: {str(e)}")
+            return False
+        self.ready.set()
+        logger.info(f"Shadow evaluation started for {self.candidate_path} (sample rate {self.sample_rate})")
+        return True
+
+    def submit(self, normalized_data, prediction, confidence, latency):
+        """
+        Добавя вход за сравнение, ако попадне в извадката. Никога не блокира.
+        :param latency: Латентност на основния модел в секунди или None за първото (загряващо) извикване
+        """
+        if random.random() >= self.sample_rate:
+            return
+        if not self.ready.is_set():
+            # Queueing while the candidate loads would fill the queue with stale samples
+            with self.lock:
+                self.not_ready += 1
+            return
+        try:
+            self.queue.put_nowait((normalized_data, prediction, confidence, latency))
+            with self.lock:
+                self.sampled += 1
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+
+    def _run(self):
+        if not self._load_candidate():
+            return
+        warmed_up = False
+        while True:
+            normalized_data, prediction, confidence, latency = self.queue.get()
+            try:
+                start = time.perf_counter()
+                X = _prepare_features(normalized_data, self.candidate['scaler'], self.candidate['label_encoders'],
+                                      self.candidate['numerical_features'], self.candidate['categorical_features'])
+                probabilities = self.candidate['model'].predict_proba(X)[0]
+                shadow_latency = time.perf_counter() - start
+                shadow_prediction = self.candidate['model'].classes_[np.argmax(probabilities)]
+                shadow_confidence = probabilities.max()
+                with self.lock:
+                    self.compared += 1
+                    self.agreed += int(shadow_prediction == prediction)
+                    self.confidence_delta_sum += shadow_confidence - confidence
+                    self.abs_confidence_delta_sum += abs(shadow_confidence - confidence)
+                    # The first call of each model warms it up and is left out of the latency comparison
+                    if warmed_up and latency is not None:
+                        self.primary_latencies.append(latency)
+                        self.shadow_latencies.append(shadow_latency)
+                    compared = self.compared
+                if compared % 100 == 0:
+                    logger.info(f"Shadow evaluation: {self.stats()}")
+            except Exception as e:
+                with self.lock:
+                    self.errors += 1
+                logger.debug(f"Shadow prediction failed: {str(e)}")
+            warmed_up = True
+
+    def stats(self):
+        """
+        Връща обобщение: съгласие между моделите, разлика в доверието и латентност на двата модела.
+        """
+        with self.lock:
+            compared = self.compared
+            primary = sorted(self.primary_latencies)
+            shadow = sorted(self.shadow_latencies)
+            result = {
+                'candidate': self.candidate_path,
+                'ready': self.ready.is_set(),
+                'load_error': self.load_error,
+                'sample_rate': self.sample_rate,
+                'sampled': self.sampled,
+                'dropped': self.dropped,
+                'not_ready': self.not_ready,
+                'compared': compared,
+                'errors': self.errors,
+                'agreement_rate': self.agreed / compared if compared else None,
+                'mean_confidence_delta': self.confidence_delta_sum / compared if compared else None,
+                'mean_abs_confidence_delta': self.abs_confidence_delta_sum / compared if compared else None
+            }
+        for name, latencies in (('primary', primary), ('shadow', shadow)):
+            result[f'{name}_latency_ms'] = {
+                'mean': 1000 * sum(latencies) / len(latencies),
+                'p95': 1000 * latencies[int(0.95 * (len(latencies) - 1))]
+            } if latencies else None
+        return result
+
+_shadow = None
+_shadow_pid = None
+_primary_warmed_up = False
+_shadow_lock = threading.Lock()
+
+def get_shadow_evaluator():
+    """
+    Връща shadow оценителя за текущия процес или None, ако SMARTFIT_SHADOW_MODEL не е зададен.
+    Нишката, която зарежда кандидата, се стартира при първа заявка, а не при import, за да работи и
+    след fork на процеса.
+    """
+    global _shadow, _shadow_pid
+    candidate_path = os.environ.get('SMARTFIT_SHADOW_MODEL')
+    if not candidate_path:
+        return None
+    if _shadow is None or _shadow_pid != os.getpid():
+        with _shadow_lock:
+            if _shadow is None or _shadow_pid != os.getpid():
+                _shadow = ShadowEvaluator(
+                    candidate_path,
+                    sample_rate=float(os.environ.get('SMARTFIT_SHADOW_SAMPLE_RATE', 0.1)),
+                    queue_size=int(os.environ.get('SMARTFIT_SHADOW_QUEUE_SIZE', 100))
+                )
+                _shadow.start()
+                _shadow_pid = os.getpid()
+    return _shadow
+
+def get_shadow_stats():
+    """
+    Връща статистиката от shadow оценката или None, ако не е включена.
+    """
+    shadow = get_shadow_evaluator()
+    return shadow.stats() if shadow else None
+
 def predict_size(data):
+    global _primary_warmed_up
     try:
-        # Normalize field names
-        field_mapping = {
-            'clothing_width': 'garment_width',
-            'clothing_type': 'garment_type'
-        }
+        # Loading the model is not part of the prediction latency compared with the candidate
+        load_model()
+        shadow = get_shadow_evaluator()
+        start = time.perf_counter()
         
+        # Normalize field names
         normalized_data = {}
         for key, value in data.items():
-            normalized_key = field_mapping.get(key, key)
+            normalized_key = FIELD_MAPPING.get(key, key)
             normalized_data[normalized_key] = value
             
-        # Prepare numerical features
-        numerical_data = np.array([[float(normalized_data[feature]) for feature in numerical_features]])
-        numerical_data = scaler.transform(numerical_data)
-        
-        # Prepare categorical features
-        categorical_data = []
-        for feature in categorical_features:
-            value = normalized_data[feature]
-            if feature in label_encoders:
-                try:
-                    encoded_value = label_encoders[feature].transform([value])[0]
-                    categorical_data.append(encoded_value)
-                except ValueError as e:
-                    logger.error(f"Unseen value '{value}' for feature {feature}")
-                    logger.error(f"Available categories: {label_encoders[feature].classes_}")
-                    raise ValueError(f"Unseen value '{value}' for feature {feature}. Available categories: {label_encoders[feature].classes_}")
-            else:
-                logger.error(f"No label encoder found for feature {feature}")
-                raise ValueError(f"No label encoder found for feature {feature}")
-        
-        # Combine features
-        categorical_data = np.array([categorical_data])
-        X = np.column_stack([numerical_data, categorical_data])
+        X = _prepare_features(normalized_data, scaler, label_encoders, numerical_features, categorical_features)
         
         # Make prediction with calibrated probabilities
         prediction = model.predict(X)[0]
         probabilities = model.predict_proba(X)[0]
         confidence = probabilities.max()
+        latency = time.perf_counter() - start if _primary_warmed_up else None
+        _primary_warmed_up = True
         
         # Get alternative size if confidence is below threshold
         alternative_size = None
@@ -101,6 +306,10 @@ def predict_size(data):
         logger.debug(f"Prediction: {prediction}, Confidence: {confidence}")
         logger.debug(f"Alternative size: {alternative_size}, Confidence: {alternative_confidence}")
         
+        # Compare with the candidate model off the response path
+        if shadow:
+            shadow.submit(normalized_data, prediction, confidence, latency)
+        
         return prediction, confidence, alternative_size, alternative_confidence
         
     except Exception as e:
@@ -108,8 +317,75 @@ def predict_size(data):
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise
 
+def predict_batch(frame):
+    """
+    Векторизирано предсказване за много редове наведнъж (напр. част от CSV файл).
+    Редовете с липсващи или непознати стойности не спират обработката, а получават грешка.
+    :param frame: pandas DataFrame с входните полета (имената се нормализират като в predict_size)
+    :return: Речник с масиви size, confidence, alternative_size, alternative_confidence и error
+    """
+    load_model()
+    frame = frame.rename(columns=FIELD_MAPPING)
+    n_rows = len(frame)
+    errors = np.full(n_rows, None, dtype=object)
+
+    missing = [feature for feature in numerical_features + categorical_features if feature not in frame.columns]
+    if missing:
+        errors[:] = f"Missing required fields: {', '.join(missing)}"
+        empty = np.full(n_rows, None, dtype=object)
+        return {'size': empty, 'confidence': empty, 'alternative_size': empty,
+                'alternative_confidence': empty, 'error': errors}
+
+    valid = np.ones(n_rows, dtype=bool)
+    numerical = np.empty((n_rows, len(numerical_features)))
+    for i, feature in enumerate(numerical_features):
+        values = np.array([_to_float_or_nan(v) for v in frame[feature]], dtype=float)
+        invalid = np.isnan(values)
+        errors[invalid & valid] = f"Invalid value for {feature}"
+        valid &= ~invalid
+        numerical[:, i] = np.where(invalid, 0.0, values)
+
+    categorical = np.empty((n_rows, len(categorical_features)))
+    for i, feature in enumerate(categorical_features):
+        values = frame[feature].astype(str).to_numpy()
+        known = np.isin(values, label_encoders[feature].classes_)
+        errors[~known & valid] = f"Unseen value for feature {feature}"
+        valid &= known
+        codes = np.zeros(n_rows)
+        if known.any():
+            codes[known] = label_encoders[feature].transform(values[known])
+        categorical[:, i] = codes
+
+    sizes = np.full(n_rows, None, dtype=object)
+    confidences = np.full(n_rows, None, dtype=object)
+    alternative_sizes = np.full(n_rows, None, dtype=object)
+    alternative_confidences = np.full(n_rows, None, dtype=object)
+    if valid.any():
+        X = np.column_stack([scaler.transform(numerical[valid]), categorical[valid]])
+        probabilities = model.predict_proba(X)
+        order = np.argsort(probabilities, axis=1)[:, ::-1]
+        rows = np.arange(len(X))
+        best = probabilities[rows, order[:, 0]]
+        second = probabilities[rows, order[:, 1]] if probabilities.shape[1] > 1 else np.zeros(len(X))
+        # Same 80% confidence threshold for an alternative size as predict_size
+        low_confidence = best < 0.8
+        sizes[valid] = model.classes_[order[:, 0]]
+        confidences[valid] = best
+        if probabilities.shape[1] > 1:
+            alternative_sizes[valid] = np.where(low_confidence, model.classes_[order[:, 1]], None)
+            alternative_confidences[valid] = np.where(low_confidence, second, None)
+    return {'size': sizes, 'confidence': confidences, 'alternative_size': alternative_sizes,
+            'alternative_confidence': alternative_confidences, 'error': errors}
+
+def _to_float_or_nan(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
 def predict_size_with_confidence(measurements: dict):
     try:
+        load_model()
         logging.debug("Received measurements for prediction: %s", measurements)
         measurements = translate_to_bg(measurements)
         logging.debug("Translated measurements for prediction: %s", measurements)
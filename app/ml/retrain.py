@@ -0,0 +1,385 @@
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from datetime import datetime, timezone
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.model_selection import train_test_split
+from sklearn.utils.class_weight import compute_class_weight
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from app.ml.feature_store import load_feature_set, train_test_indices
+from app.ml.streaming import MergedForestClassifier, is_holdout
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'model.pkl')
+
+# Same mappings as the frontend applies before calling /api/predict
+GARMENT_TYPE_MAP = {
+    'shirt': 't-shirt',
+    'jacket': 't-shirt',
+    'sweater': 't-shirt',
+    'skirt': 'pants',
+    'dress': 't-shirt'
+}
+MATERIAL_MAP = {
+    'semi-elastic': 'elastic',
+    'stretchy': 'elastic',
+    'rigid': 'non-elastic'
+}
+BODY_TYPE_MAP = {
+    'medium': 'average'
+}
+
+# Share of the time budget that reading feedback may use, the rest is left for training and publishing
+FEEDBACK_BUDGET_SHARE = 0.5
+
+
+class RetrainTimeout(RuntimeError):
+    """
+    Дообучаването не се вмести в time_budget; новата версия не се публикува.
+    """
+
+
+def _check_deadline(deadline, stage):
+    if deadline is not None and time.monotonic() >= deadline:
+        raise RetrainTimeout(f"Time budget exceeded before {stage}")
+
+
+def fetch_feedback_batches(since_id, batch_size=1000, min_rating=4, time_budget=None, max_rows=None):
+    """
+    Чете новите оценки (Comment.rating) след since_id на партиди по първичния ключ (keyset) и за
+    всяка партида зарежда съответните препоръки, мерки и дрехи с по една IN заявка.
+    Оценка поне min_rating означава, че препоръчаният размер е бил подходящ, и последната
+    препоръка на потребителя за дрехата става пример за обучение. Водещи са оценките, а не
+    препоръките, защото оценката идва след препоръката. Препоръките, които вече са архивирани,
+    се търсят в архива.
+    :param since_id: Последното ID на коментар, включено в предишната версия на модела
+    :param batch_size: Брой редове в партида
+    :param min_rating: Минимален рейтинг, при който препоръката се счита за успешна
+    :param time_budget: Лимит в секунди за четенето (по избор)
+    :param max_rows: Максимален брой прочетени коментари (по избор)
+    :return: Генератор от (списък с примери, последно прочетено ID)
+    """
+    from app.models import RecommendationHistory, BodyMeasurements, Clothing, Comment
+    from app.archive import archived_item_recommendations
+
+    start_time = time.monotonic()
+    last_id = since_id
+    rows_read = 0
+    while True:
+        if time_budget is not None and time.monotonic() - start_time >= time_budget:
+            logger.info(f"Retraining time budget reached after {rows_read} feedback rows")
+            break
+        limit = batch_size if max_rows is None else min(batch_size, max_rows - rows_read)
+        if limit <= 0:
+            break
+        batch = (Comment.query
+                 .filter(Comment.id > last_id)
+                 .order_by(Comment.id)
+                 .limit(limit)
+                 .all())
+        if not batch:
+            break
+        last_id = batch[-1].id
+        rows_read += len(batch)
+
+        rated = [c for c in batch if c.rating is not None and c.rating >= min_rating]
+        if not rated:
+            yield [], last_id
+            continue
+        user_ids = {c.user_id for c in rated}
+        clothing_ids = {c.clothing_id for c in rated}
+        measurements = {m.user_id: m for m in
+                        BodyMeasurements.query.filter(BodyMeasurements.user_id.in_(user_ids)).all()}
+        clothes = {c.id: c for c in Clothing.query.filter(Clothing.id.in_(clothing_ids)).all()}
+        recommendations = {}
+        for rec in (RecommendationHistory.query
+                    .filter(RecommendationHistory.user_id.in_(user_ids),
+                            RecommendationHistory.item_identifier.in_([str(i) for i in clothing_ids]))
+                    .order_by(RecommendationHistory.date)
+                    .all()):
+            # Ordered by date, so the latest recommendation per (user, item) wins
+            recommendations[(rec.user_id, rec.item_identifier)] = rec
+        # Ratings of items recommended before the archive cutoff
+        missing = {(c.user_id, str(c.clothing_id)) for c in rated} - recommendations.keys()
+        if missing:
+            for key, archived in archived_item_recommendations(missing).items():
+                recommendations[key] = archived[0]
+
+        examples = []
+        for comment in rated:
+            rec = recommendations.get((comment.user_id, str(comment.clothing_id)))
+            clothing = clothes.get(comment.clothing_id)
+            body = measurements.get(comment.user_id)
+            if rec is None or clothing is None or body is None:
+                continue
+            values = [rec.height_cm, rec.weight_kg, rec.waist_cm, rec.chest_cm]
+            if any(v is None for v in values):
+                continue
+            body_type = rec.body_type or body.body_type
+            examples.append({
+                'height': values[0],
+                'weight': values[1],
+                'waist': values[2],
+                'chest': values[3],
+                'gender': body.gender,
+                'body_type': BODY_TYPE_MAP.get(body_type, body_type),
+                'material': MATERIAL_MAP.get(clothing.material, clothing.material),
+                'garment_type': GARMENT_TYPE_MAP.get(clothing.type, clothing.type),
+                'size': rec.recommended_size
+            })
+        yield examples, last_id
+
+
+def encode_examples(examples, model_data):
+    """
+    Кодира примерите със скалера и енкодерите на текущия модел. Примери с категории,
+    които моделът не познава, се пропускат.
+    :return: (X, y)
+    """
+    numerical_features = model_data['numerical_features']
+    categorical_features = model_data['categorical_features']
+    label_encoders = model_data['label_encoders']
+    known = {feature: set(label_encoders[feature].classes_) for feature in categorical_features}
+    known_sizes = set(model_data['model'].classes_)
+
+    rows = [e for e in examples
+            if all(e[feature] in known[feature] for feature in categorical_features) and e['size'] in known_sizes]
+    if len(rows) < len(examples):
+        logger.info(f"Skipped {len(examples) - len(rows)} feedback rows with unknown categories or sizes")
+    if not rows:
+        return np.empty((0, len(numerical_features) + len(categorical_features))), np.empty(0, dtype=object)
+
+    numerical = model_data['scaler'].transform(np.array([[e[f] for f in numerical_features] for e in rows]))
+    categorical = np.column_stack([
+        label_encoders[feature].transform([e[feature] for e in rows]) for feature in categorical_features
+    ])
+    return np.column_stack([numerical, categorical]), np.array([e['size'] for e in rows], dtype=object)
+
+
+def _training_indices(model_data, y):
+    """
+    Индексите на редовете, върху които моделът е обучен, според записаното в model_data разделяне.
+    Модели отпреди записа на разделянето са от train_model (или streaming с всеки 5-ти ред).
+    """
+    default = ({'method': 'every_nth', 'test_every': 5} if model_data.get('training_mode') == 'streaming'
+               else {'method': 'stratified'})
+    split = model_data.get('split', default)
+    if split['method'] in ('every_nth', 'hashed'):
+        return np.flatnonzero(~is_holdout(np.arange(len(y)), split['test_every'], split.get('random_state')))
+    options = {key: split[key] for key in ('test_size', 'random_state') if key in split}
+    train_idx, _ = train_test_indices(y, **options)
+    return train_idx
+
+
+def _replay_sample(model_data, size, random_state):
+    """
+    Взема стратифицирана извадка от тренировъчната част на оригиналните данни, за да видят новите
+    дървета всички размери, а не само тези от обратната връзка. Тестовите редове не се използват,
+    така че измерената върху тях точност остава честна.
+    """
+    feature_set = load_feature_set()
+    y = feature_set.target_labels()
+    train_idx = _training_indices(model_data, y)
+    if size < len(train_idx):
+        train_idx, _ = train_test_split(train_idx, train_size=size, stratify=y[train_idx],
+                                        random_state=random_state)
+    X = feature_set.encoded_matrix(model_data['scaler'], model_data['label_encoders'])
+    return X[train_idx], y[train_idx]
+
+
+def extend_forest(forest, X, y, n_new_trees):
+    """
+    Добавя n_new_trees нови дървета към обучена гора (warm start), без да преобучава старите.
+    При class_weight 'balanced' или 'balanced_subsample' новите дървета получават явни тегла,
+    изчислени като 'balanced' от y (обратната връзка и стратифицираната извадка от оригиналните
+    данни), както препоръчва sklearn за warm start; след това пресетът на гората се възстановява.
+    """
+    class_weight = forest.class_weight
+    params = {'warm_start': True, 'n_estimators': len(forest.estimators_) + n_new_trees}
+    if class_weight in ('balanced', 'balanced_subsample'):
+        classes = np.unique(y)
+        params['class_weight'] = dict(zip(classes, compute_class_weight('balanced', classes=classes, y=y)))
+    forest.set_params(**params)
+    forest.fit(X, y)
+    forest.set_params(warm_start=False, class_weight=class_weight)
+    return forest
+
+
+def refit_calibrators(model, X, y):
+    """
+    Обучава наново калибраторите на всеки фолд на CalibratedClassifierCV върху вероятностите на
+    вече разширената гора, за да съответстват калибрираните вероятности на новите дървета.
+    X и y трябва да не са използвани за обучението на дърветата.
+    """
+    for calibrated in model.calibrated_classifiers_:
+        if calibrated.method not in ('isotonic', 'sigmoid'):
+            raise TypeError(f"Cannot refit {calibrated.method} calibration")
+        proba = calibrated.estimator.predict_proba(X)
+        labels = calibrated.estimator.classes_
+        if len(calibrated.classes) == 2:
+            # Binary calibration has a single calibrator for the positive class
+            proba, labels = proba[:, 1:], labels[1:]
+        for column, label, calibrator in zip(proba.T, labels, calibrated.calibrators):
+            calibrator.fit(column, (y == label).astype(float))
+
+
+def _calibration_split(X, y, calibration_size, random_state):
+    counts = np.unique(y, return_counts=True)[1]
+    stratify = y if counts.min() >= 2 else None
+    return train_test_split(X, y, test_size=calibration_size, stratify=stratify, random_state=random_state)
+
+
+def extend_model(model, X, y, n_new_trees, random_state=42, calibration_size=0.25, deadline=None):
+    """
+    Разширява модела с нови дървета според типа му: калибриран модел, обединени гори или една гора.
+    При CalibratedClassifierCV новите дървета се добавят към гората във всеки фолд върху част от
+    данните, а калибраторите се обучават наново върху отделената calibration_size част.
+    :param deadline: time.monotonic() стойност, след която се спира между фолдовете (по избор)
+    :raises RetrainTimeout: ако deadline мине преди края; моделът тогава е частично разширен
+    """
+    if isinstance(model, CalibratedClassifierCV):
+        X_fit, X_calibration, y_fit, y_calibration = _calibration_split(X, y, calibration_size, random_state)
+        for calibrated in model.calibrated_classifiers_:
+            _check_deadline(deadline, 'extending the next fold')
+            extend_forest(calibrated.estimator, X_fit, y_fit, n_new_trees)
+        _check_deadline(deadline, 'refitting the calibrators')
+        refit_calibrators(model, X_calibration, y_calibration)
+    elif isinstance(model, MergedForestClassifier):
+        params = model.forests[-1].get_params(deep=False)
+        params.update(n_estimators=n_new_trees, random_state=random_state, warm_start=False)
+        forest = RandomForestClassifier(**params)
+        forest.fit(X, y)
+        model.add_forest(forest)
+    elif isinstance(model, RandomForestClassifier):
+        extend_forest(model, X, y, n_new_trees)
+    else:
+        raise TypeError(f"Cannot extend model of type {type(model).__name__}")
+    return model
+
+
+def publish_model(model_data, model_path=MODEL_PATH, versions_dir=None):
+    """
+    Записва нова версия на модела в models/model-v<N>.pkl и атомарно подменя model.pkl.
+    :return: Път до записаната версия
+    """
+    if versions_dir is None:
+        versions_dir = os.path.join(os.path.dirname(os.path.abspath(model_path)), 'models')
+    os.makedirs(versions_dir, exist_ok=True)
+    version_path = os.path.join(versions_dir, f"model-v{model_data['version']}.pkl")
+    joblib.dump(model_data, version_path)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(model_path), suffix='.tmp')
+    os.close(fd)
+    shutil.copyfile(version_path, tmp_path)
+    os.replace(tmp_path, model_path)
+    logger.info(f"Published model version {model_data['version']} to {model_path}")
+    return version_path
+
+
+def retrain_from_feedback(model_path=MODEL_PATH, batch_size=1000, min_rating=4, min_examples=20,
+                          n_new_trees=50, replay_size=500, time_budget=300, max_rows=None,
+                          random_state=42):
+    """
+    Дообучава модела с обратната връзка от потребителите, събрана след последната версия,
+    като добавя нови дървета към съществуващата гора вместо пълно обучение с търсене на параметри.
+    Изисква активен Flask app context.
+    :param model_path: Път до текущия model.pkl
+    :param batch_size: Брой редове в партида от базата
+    :param min_rating: Минимален рейтинг за успешна препоръка
+    :param min_examples: Минимален брой нови примери, за да се публикува нова версия
+    :param n_new_trees: Брой нови дървета
+    :param replay_size: Брой оригинални примери, смесени с новите
+    :param time_budget: Лимит в секунди за цялото дообучаване. Четенето на обратната връзка използва
+        най-много FEEDBACK_BUDGET_SHARE от него; ако обучението не завърши до края на лимита,
+        новата версия не се публикува и същата обратна връзка се чете отново при следващото пускане.
+        Започнатото разширяване на фолд, калибрирането и записът на версията не се прекъсват, така
+        че лимитът може да се надхвърли с времето на един от тези етапи.
+    :param max_rows: Максимален брой прочетени коментари
+    :param random_state: Seed за възпроизводимост
+    :return: Речник с резултата от изпълнението
+    """
+    start_time = time.monotonic()
+    deadline = start_time + time_budget if time_budget is not None else None
+    feedback_budget = time_budget * FEEDBACK_BUDGET_SHARE if time_budget is not None else None
+    model_data = joblib.load(model_path)
+    since_id = model_data.get('last_feedback_id', 0)
+    version = model_data.get('version', 1)
+    logger.info(f"Retraining model version {version} with feedback after comment ID {since_id}")
+
+    examples = []
+    last_id = since_id
+    for batch_examples, last_id in fetch_feedback_batches(since_id, batch_size, min_rating, feedback_budget, max_rows):
+        examples.extend(batch_examples)
+
+    X_new, y_new = encode_examples(examples, model_data)
+    result = {'version': version, 'feedback_until': last_id, 'new_examples': len(y_new), 'published': False}
+    if len(y_new) < min_examples:
+        logger.info(f"Only {len(y_new)} new feedback examples (minimum {min_examples}), keeping version {version}")
+        return result
+
+    try:
+        _check_deadline(deadline, 'loading the replay sample')
+        X_replay, y_replay = _replay_sample(model_data, replay_size, random_state)
+        X = np.vstack([X_new, X_replay])
+        y = np.concatenate([y_new, y_replay])
+        _check_deadline(deadline, 'training')
+        extend_model(model_data['model'], X, y, n_new_trees, random_state, deadline=deadline)
+        _check_deadline(deadline, 'publishing')
+    except RetrainTimeout as e:
+        logger.warning(f"{e} after {time.monotonic() - start_time:.1f}s, keeping version {version}")
+        result['timed_out'] = True
+        return result
+
+    model_data.update({
+        'version': version + 1,
+        'parent_version': version,
+        'last_feedback_id': last_id,
+        'trained_at': datetime.now(timezone.utc).isoformat(),
+        'feedback_examples': model_data.get('feedback_examples', 0) + len(y_new)
+    })
+    result['version_path'] = publish_model(model_data, model_path)
+    result.update({'version': version + 1, 'published': True})
+    logger.info(f"Retraining finished in {time.monotonic() - start_time:.1f}s: {result}")
+    return result
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Retrain the size model from recommendation feedback')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--min-rating', type=int, default=4)
+    parser.add_argument('--min-examples', type=int, default=20)
+    parser.add_argument('--new-trees', type=int, default=50)
+    parser.add_argument('--replay-size', type=int, default=500)
+    parser.add_argument('--time-budget', type=float, default=300,
+                        help='Seconds allowed for one run; reading feedback gets at most half, '
+                             'and a run that does not finish in time publishes nothing')
+    parser.add_argument('--max-rows', type=int, default=None)
+    parser.add_argument('--interval', type=float, default=None,
+                        help='Run repeatedly every N seconds instead of once')
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app()
+    while True:
+        with app.app_context():
+            try:
+                retrain_from_feedback(batch_size=args.batch_size, min_rating=args.min_rating,
+                                      min_examples=args.min_examples, n_new_trees=args.new_trees,
+                                      replay_size=args.replay_size, time_budget=args.time_budget,
+                                      max_rows=args.max_rows)
+            except Exception as e:
+                logger.error(f"Retraining failed: {e}", exc_info=True)
+                if args.interval is None:
+                    raise
+        if args.interval is None:
+            break
+        time.sleep(args.interval)
@@ -0,0 +1,197 @@
+import math
+import time
+import logging
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import ParameterGrid, StratifiedKFold, train_test_split
+from app.ml.fold_cache import data_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def _fit_and_score(params, X, y, train_idx, test_idx, random_state):
+    """
+    Обучава една гора върху train частта на фолда и връща точността върху test частта.
+    :param params: Хиперпараметри на RandomForestClassifier
+    :param X: Матрица с признаци
+    :param y: Целеви стойности
+    :param train_idx: Индекси за обучение
+    :param test_idx: Индекси за валидация
+    :param random_state: Seed за възпроизводимост
+    :return: Точност (accuracy) върху фолда
+    """
+    model = RandomForestClassifier(random_state=random_state, **params)
+    model.fit(X[train_idx], y[train_idx])
+    return model.score(X[test_idx], y[test_idx])
+
+
+def _cross_validate(candidates, X, y, cv, n_jobs, random_state, cache=None):
+    """
+    Изчислява средната cross-validation точност за всеки кандидат паралелно по (кандидат, фолд).
+    Ако е подаден кеш, вече изчислените фолдове се вземат от него, а новите се записват веднага
+    след като приключат, така че прекъснато търсене може да продължи.
+    :param candidates: Списък с речници от хиперпараметри
+    :param cache: FoldCache (по избор)
+    :return: Масив със средните точности в реда на кандидатите
+    """
+    folds = list(StratifiedKFold(n_splits=cv).split(X, y))
+    fingerprint = data_fingerprint(X, y) if cache is not None else None
+    scores = np.empty((len(candidates), cv))
+    pending = []
+    for i, params in enumerate(candidates):
+        for fold, (train_idx, test_idx) in enumerate(folds):
+            key = None
+            if cache is not None:
+                key = cache.make_key('fold_score', params, fold, cv, fingerprint, random_state)
+                cached = cache.get(key)
+                if cached is not None:
+                    scores[i, fold] = cached
+                    continue
+            pending.append((i, fold, key, params, train_idx, test_idx))
+
+    if pending:
+        results = Parallel(n_jobs=n_jobs, return_as='generator')(
+            delayed(_fit_and_score)(params, X, y, train_idx, test_idx, random_state)
+            for _, _, _, params, train_idx, test_idx in pending
+        )
+        for (i, fold, key, *_), score in zip(pending, results):
+            scores[i, fold] = score
+            if cache is not None:
+                cache.put(key, score)
+    return scores.mean(axis=1)
+
+
+def _scaled_params(params, fraction, min_estimators):
+    """
+    Намалява броя дървета на кандидата пропорционално на ресурса за текущото ниво.
+    """
+    scaled = dict(params)
+    scaled['n_estimators'] = max(min_estimators, int(round(params['n_estimators'] * fraction)))
+    return scaled
+
+
+def successive_halving_search(X, y, param_grid, factor=3, cv=5, min_samples=None,
+                              min_estimators=25, time_budget=None, batch_size=8,
+                              n_jobs=-1, random_state=42, cache=None):
+    """
+    Търси хиперпараметри чрез successive halving: на всяко ниво всички оцелели кандидати се
+    оценяват с част от данните и част от дърветата, а само най-добрите 1/factor продължават.
+    Ресурсът (брой примери и брой дървета) расте с factor на всяко ниво, като последното ниво
+    използва всички данни и пълния n_estimators на кандидата.
+    :param X: Матрица с признаци
+    :param y: Целеви стойности
+    :param param_grid: Речник с възможни стойности, както за GridSearchCV
+    :param factor: Колко пъти намалява броят кандидати между нивата
+    :param cv: Брой фолдове за cross-validation
+    :param min_samples: Минимален брой примери на първото ниво
+    :param min_estimators: Минимален брой дървета на кандидат
+    :param time_budget: Лимит в секунди; при изчерпване търсенето спира с най-добрия досега кандидат
+    :param batch_size: Брой кандидати, оценявани между две проверки на бюджета
+    :param n_jobs: Брой паралелни процеси
+    :param random_state: Seed за възпроизводимост
+    :param cache: FoldCache за преизползване на вече обучени фолдове (по избор)
+    :return: Речник с best_params, best_score, history и pruned
+    """
+    X = np.asarray(X)
+    y = np.asarray(y)
+    n_samples = len(y)
+    n_classes = len(np.unique(y))
+    if min_samples is None:
+        min_samples = max(2 * cv * n_classes, 50)
+
+    candidates = list(ParameterGrid(param_grid))
+    rungs_for_candidates = max(1, math.ceil(math.log(len(candidates), factor)) + 1)
+    rungs_for_samples = max(1, int(math.log(max(n_samples / min_samples, 1), factor)) + 1)
+    n_rungs = min(rungs_for_candidates, rungs_for_samples)
+
+    start_time = time.monotonic()
+    history = []
+    pruned = []
+    best_params, best_score = None, -np.inf
+    budget_exhausted = False
+
+    logger.info(f"Successive halving: {len(candidates)} candidates, {n_rungs} rungs, factor {factor}")
+
+    for rung in range(n_rungs):
+        fraction = factor ** -(n_rungs - 1 - rung)
+        rung_samples = n_samples if rung == n_rungs - 1 else max(min_samples, int(n_samples * fraction))
+        if rung_samples < n_samples:
+            sample_idx, _ = train_test_split(np.arange(n_samples), train_size=rung_samples,
+                                             stratify=y, random_state=random_state + rung)
+        else:
+            sample_idx = np.arange(n_samples)
+        X_rung, y_rung = X[sample_idx], y[sample_idx]
+
+        evaluated, scores = [], []
+        for start in range(0, len(candidates), batch_size):
+            if time_budget is not None and time.monotonic() - start_time >= time_budget:
+                budget_exhausted = True
+                break
+            batch = candidates[start:start + batch_size]
+            scaled = [_scaled_params(params, fraction, min_estimators) for params in batch]
+            scores.extend(_cross_validate(scaled, X_rung, y_rung, cv, n_jobs, random_state, cache))
+            evaluated.extend(batch)
+
+        for params in candidates[len(evaluated):]:
+            pruned.append({'rung': rung, 'params': params, 'score': None, 'reason': 'time budget'})
+
+        if not evaluated:
+            break
+
+        order = np.argsort(scores)[::-1]
+        for i in order:
+            history.append({'rung': rung, 'n_samples': int(rung_samples), 'resource_fraction': fraction,
+                            'params': evaluated[i], 'score': float(scores[i])})
+        best_params, best_score = evaluated[order[0]], float(scores[order[0]])
+        logger.info(f"Rung {rung}: {len(evaluated)} candidates on {rung_samples} samples, "
+                    f"best score {best_score:.4f}, elapsed {time.monotonic() - start_time:.1f}s")
+
+        if budget_exhausted or rung == n_rungs - 1:
+            break
+
+        n_keep = max(1, math.ceil(len(evaluated) / factor))
+        for i in order[n_keep:]:
+            pruned.append({'rung': rung, 'params': evaluated[i], 'score': float(scores[i]),
+                           'reason': 'eliminated'})
+            logger.debug(f"Pruned at rung {rung} (score {scores[i]:.4f}): {evaluated[i]}")
+        candidates = [evaluated[i] for i in order[:n_keep]]
+
+    if budget_exhausted:
+        logger.warning(f"Time budget of {time_budget}s exhausted, using best candidate so far")
+    logger.info(f"Pruned {len(pruned)} configurations in {time.monotonic() - start_time:.1f}s")
+
+    return {
+        'best_params': best_params,
+        'best_score': best_score,
+        'history': history,
+        'pruned': pruned,
+        'budget_exhausted': budget_exhausted
+    }
+
+
+def grid_search(X, y, param_grid, cv=5, n_jobs=-1, random_state=42, cache=None):
+    """
+    Пълно търсене по мрежата от параметри (като GridSearchCV), но с оценка по фолдове,
+    която може да се кешира и продължи след прекъсване.
+    :param X: Матрица с признаци
+    :param y: Целеви стойности
+    :param param_grid: Речник с възможни стойности
+    :param cv: Брой фолдове
+    :param n_jobs: Брой паралелни процеси
+    :param random_state: Seed за възпроизводимост
+    :param cache: FoldCache (по избор)
+    :return: Речник с best_params, best_score и history
+    """
+    X = np.asarray(X)
+    y = np.asarray(y)
+    candidates = list(ParameterGrid(param_grid))
+    logger.info(f"Grid search: {len(candidates)} candidates x {cv} folds")
+    scores = _cross_validate(candidates, X, y, cv, n_jobs, random_state, cache)
+    order = np.argsort(scores)[::-1]
+    history = [{'params': candidates[i], 'score': float(scores[i])} for i in order]
+    return {
+        'best_params': candidates[order[0]],
+        'best_score': float(scores[order[0]]),
+        'history': history
+    }
@@ -0,0 +1,251 @@
+import os
+import time
+import logging
+import tempfile
+from contextlib import ExitStack
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from app.ml.feature_store import NUMERICAL_FEATURES, CATEGORICAL_FEATURES, TARGET, DEFAULT_DATASET
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FOREST_PARAMS = {
+    'max_depth': 20,
+    'min_samples_split': 4,
+    'min_samples_leaf': 1,
+    'max_features': 'log2',
+    'class_weight': 'balanced_subsample',
+    'criterion': 'gini',
+    'bootstrap': True
+}
+
+# Bucket files written at the same time; more buckets take more passes over the data
+MAX_OPEN_BUCKETS = 128
+
+
+class MergedForestClassifier:
+    """
+    Ансамбъл от гори, обучени върху отделни части от данните. Вероятностите на всяка гора
+    се подравняват към общия списък класове (част от данните може да няма всички размери)
+    и се усредняват с тежест броя дървета, както ако всички дървета бяха в една гора.
+    """
+
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes, dtype=object)
+        self.forests = []
+
+    @property
+    def n_estimators(self):
+        return sum(len(forest.estimators_) for forest in self.forests)
+
+    @property
+    def feature_importances_(self):
+        weights = np.array([len(forest.estimators_) for forest in self.forests], dtype=float)
+        importances = np.array([forest.feature_importances_ for forest in self.forests])
+        return np.average(importances, axis=0, weights=weights)
+
+    def add_forest(self, forest):
+        """
+        Добавя обучена гора към ансамбъла.
+        """
+        unknown = set(forest.classes_) - set(self.classes_)
+        if unknown:
+            raise ValueError(f"Forest was trained on unknown classes: {sorted(unknown)}")
+        self.forests.append(forest)
+
+    def predict_proba(self, X):
+        proba = np.zeros((len(X), len(self.classes_)))
+        class_index = {label: i for i, label in enumerate(self.classes_)}
+        for forest in self.forests:
+            columns = [class_index[label] for label in forest.classes_]
+            proba[:, columns] += forest.predict_proba(X) * len(forest.estimators_)
+        return proba / self.n_estimators
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def score(self, X, y):
+        return float(np.mean(self.predict(X) == np.asarray(y)))
+
+
+def _read_chunks(csv_path, chunk_size):
+    return pd.read_csv(csv_path, chunksize=chunk_size,
+                       dtype={feature: np.float32 for feature in NUMERICAL_FEATURES})
+
+
+def _row_hash(row_index, salt):
+    """
+    Разбърква номерата на редовете (splitmix64): резултатът зависи само от номера и salt, а не от
+    реда на четене или от chunk_size, така че разделянето може да се повтори и без данните в паметта.
+    """
+    z = np.asarray(row_index, dtype=np.uint64) + np.uint64(salt * 0x9E3779B97F4A7C15 % 2 ** 64)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def is_holdout(row_index, test_every, random_state=None):
+    """
+    Детерминистично отделя средно всеки test_every-ти ред за тестване, без да държи данните в паметта.
+    Редовете се избират случайно по random_state, защото наборът може да е подреден (напр. по размер);
+    без random_state се взема буквално всеки test_every-ти ред, както при моделите отпреди това.
+    """
+    if random_state is None:
+        return (row_index % test_every) == 0
+    return (_row_hash(row_index, 2 * random_state) % np.uint64(test_every)) == 0
+
+
+def _row_buckets(row_index, n_buckets, random_state):
+    return (_row_hash(row_index, 2 * random_state + 1) % np.uint64(n_buckets)).astype(np.int64)
+
+
+def fit_streaming_preprocessing(csv_path, chunk_size):
+    """
+    Първо минаване през данните: инкрементално обучава скалера и събира категориите и класовете.
+    :param csv_path: Път до CSV файла
+    :param chunk_size: Брой редове в една част
+    :return: (scaler, label_encoders, classes, rows)
+    """
+    scaler = StandardScaler()
+    categories = {feature: set() for feature in CATEGORICAL_FEATURES}
+    classes = set()
+    rows = 0
+    for chunk in _read_chunks(csv_path, chunk_size):
+        scaler.partial_fit(chunk[NUMERICAL_FEATURES].to_numpy())
+        for feature in CATEGORICAL_FEATURES:
+            categories[feature].update(chunk[feature].astype(str).unique())
+        classes.update(chunk[TARGET].astype(str).unique())
+        rows += len(chunk)
+
+    label_encoders = {}
+    for feature in CATEGORICAL_FEATURES:
+        encoder = LabelEncoder()
+        encoder.classes_ = np.array(sorted(categories[feature]), dtype=object)
+        label_encoders[feature] = encoder
+    return scaler, label_encoders, sorted(classes), rows
+
+
+def encode_chunk(chunk, scaler, label_encoders):
+    """
+    Кодира една част от данните в матрицата, която моделът очаква.
+    """
+    numerical = scaler.transform(chunk[NUMERICAL_FEATURES].to_numpy())
+    categorical = np.column_stack([
+        label_encoders[feature].transform(chunk[feature].astype(str)) for feature in CATEGORICAL_FEATURES
+    ])
+    return np.column_stack([numerical, categorical])
+
+
+def write_buckets(csv_path, chunk_size, n_buckets, test_every, random_state, directory):
+    """
+    Разпределя тренировъчните редове случайно в n_buckets временни CSV файла, а тестовите - в
+    отделен файл. Така всяка гора се обучава върху случайна извадка от целия набор, дори ако той е
+    подреден. Ако частите са повече от MAX_OPEN_BUCKETS, данните се четат по веднъж за всяка група части.
+    :param csv_path: Път до CSV файла
+    :param chunk_size: Брой редове в една част при четене
+    :param n_buckets: Брой части за обучение
+    :param test_every: Средно всеки n-ти ред се използва за тестване
+    :param random_state: Seed на разпределението
+    :param directory: Директория за временните файлове
+    :return: (пътища на частите, път на тестовия файл)
+    """
+    paths = [os.path.join(directory, f'bucket_{bucket}.csv') for bucket in range(n_buckets)]
+    test_path = os.path.join(directory, 'test.csv')
+    for first in range(0, n_buckets, MAX_OPEN_BUCKETS):
+        with ExitStack() as stack:
+            files = {bucket: stack.enter_context(open(paths[bucket], 'w', newline=''))
+                     for bucket in range(first, min(first + MAX_OPEN_BUCKETS, n_buckets))}
+            test_file = stack.enter_context(open(test_path, 'w', newline='')) if first == 0 else None
+            offset = 0
+            for chunk in _read_chunks(csv_path, chunk_size):
+                row_index = np.arange(offset, offset + len(chunk))
+                offset += len(chunk)
+                holdout = is_holdout(row_index, test_every, random_state)
+                if test_file is not None and holdout.any():
+                    chunk[holdout].to_csv(test_file, header=test_file.tell() == 0, index=False)
+                buckets = _row_buckets(row_index[~holdout], n_buckets, random_state)
+                for bucket, part in chunk[~holdout].groupby(buckets):
+                    if bucket in files:
+                        part.to_csv(files[bucket], header=files[bucket].tell() == 0, index=False)
+    return paths, test_path
+
+
+def train_model_streaming(csv_path=DEFAULT_DATASET, chunk_size=100000, trees_per_chunk=50,
+                          forest_params=None, test_every=5, n_jobs=-1, random_state=42,
+                          model_path=None):
+    """
+    Обучава модела, без да зарежда целия набор в паметта. Първото четене обучава скалера и
+    енкодерите, второто разпределя редовете случайно в тестов файл и временни части от около
+    chunk_size реда (write_buckets), след което върху всяка част се обучава гора, а ансамбълът се
+    оценява върху тестовия файл. Пиковата памет зависи от chunk_size, а не от размера на набора, и
+    понеже частите са случайни, редът на редовете в CSV файла не влияе на точността.
+    :param csv_path: Път до CSV файла
+    :param chunk_size: Брой редове в една част
+    :param trees_per_chunk: Брой дървета, обучавани върху всяка част
+    :param forest_params: Параметри на RandomForestClassifier (по избор)
+    :param test_every: Средно всеки n-ти ред се използва за тестване
+    :param n_jobs: Брой паралелни процеси за всяка гора
+    :param random_state: Seed за възпроизводимост
+    :param model_path: Къде да се запише моделът (по подразбиране app/ml/model.pkl)
+    :return: Речник с данните на модела
+    """
+    start_time = time.monotonic()
+    params = dict(DEFAULT_FOREST_PARAMS, **(forest_params or {}))
+
+    scaler, label_encoders, classes, rows = fit_streaming_preprocessing(csv_path, chunk_size)
+    logger.info(f"Streaming preprocessing fitted on {rows} rows, classes: {classes}")
+
+    model = MergedForestClassifier(classes)
+    correct = total = 0
+    with tempfile.TemporaryDirectory(prefix='streaming_') as directory:
+        n_buckets = max(1, -(-rows // chunk_size))
+        bucket_paths, test_path = write_buckets(csv_path, chunk_size, n_buckets, test_every, random_state, directory)
+        for bucket, path in enumerate(bucket_paths):
+            if os.path.getsize(path) == 0:
+                continue
+            train_chunk = pd.read_csv(path, dtype={feature: np.float32 for feature in NUMERICAL_FEATURES})
+            y = train_chunk[TARGET].astype(str).to_numpy()
+            if len(np.unique(y)) < 2:
+                raise ValueError(f"Chunk {bucket} has {len(y)} rows of a single size; increase chunk_size")
+            forest = RandomForestClassifier(n_estimators=trees_per_chunk, n_jobs=n_jobs,
+                                            random_state=random_state + bucket, **params)
+            forest.fit(encode_chunk(train_chunk, scaler, label_encoders), y)
+            model.add_forest(forest)
+            if len(forest.classes_) < len(classes):
+                logger.warning(f"Chunk {bucket} contains only sizes {list(forest.classes_)}; "
+                               f"a larger chunk_size gives every forest all sizes")
+            logger.info(f"Chunk {bucket}: trained {trees_per_chunk} trees on {len(train_chunk)} rows")
+
+        if os.path.getsize(test_path) > 0:
+            for test_chunk in _read_chunks(test_path, chunk_size):
+                predictions = model.predict(encode_chunk(test_chunk, scaler, label_encoders))
+                correct += int(np.sum(predictions == test_chunk[TARGET].astype(str).to_numpy()))
+                total += len(test_chunk)
+    test_accuracy = correct / total if total else float('nan')
+    logger.info(f"Streaming model: {model.n_estimators} trees, testing accuracy {test_accuracy:.4f}, "
+                f"elapsed {time.monotonic() - start_time:.1f}s")
+
+    feature_importance = pd.DataFrame({
+        'feature': NUMERICAL_FEATURES + CATEGORICAL_FEATURES,
+        'importance': model.feature_importances_
+    }).sort_values('importance', ascending=False)
+
+    model_data = {
+        'model': model,
+        'scaler': scaler,
+        'label_encoders': label_encoders,
+        'numerical_features': NUMERICAL_FEATURES,
+        'categorical_features': CATEGORICAL_FEATURES,
+        'feature_importance': feature_importance,
+        'training_mode': 'streaming',
+        'split': {'method': 'hashed', 'test_every': test_every, 'random_state': random_state},
+        'test_accuracy': test_accuracy
+    }
+    if model_path is None:
+        model_path = os.path.join(os.path.dirname(__file__), 'model.pkl')
+    joblib.dump(model_data, model_path)
+    logger.info(f"Model and preprocessing objects saved to {model_path}")
+    return model_data
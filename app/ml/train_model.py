@@ -1,55 +1,70 @@
 import os
+import sys
+import json
+import argparse
 import logging
 import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
+from sklearn.model_selection import cross_val_score
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler, LabelEncoder
+from sklearn.preprocessing import StandardScaler
 from sklearn.calibration import CalibratedClassifierCV
 import joblib
 import traceback
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from app.ml.search import successive_halving_search, grid_search
+from app.ml.fold_cache import FoldCache, DEFAULT_CACHE_DIR, data_fingerprint
+from app.ml.feature_store import (load_feature_set, train_test_indices, DEFAULT_DATASET, DEFAULT_STORE_DIR,
+                                  TEST_SIZE, SPLIT_RANDOM_STATE)
+from app.ml.streaming import train_model_streaming
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def train_model():
+def train_model(search='halving', time_budget=None, factor=3, cache_dir=DEFAULT_CACHE_DIR,
+                dataset_path=DEFAULT_DATASET, store_dir=DEFAULT_STORE_DIR):
     """
     Обучава ML модел за препоръка на размер на дреха, използвайки тренировъчни данни.
     Записва модела и скалерите във файл.
+    :param search: 'halving' за successive halving търсене или 'grid' за пълен GridSearchCV
+    :param time_budget: Лимит в секунди за halving търсенето (по избор)
+    :param factor: Колко пъти намалява броят кандидати между нивата при halving
+    :param cache_dir: Директория за кеша на фолдовете и калибраторите; None изключва кеша
+    :param dataset_path: Път до CSV файла с тренировъчни данни
+    :param store_dir: Директория на feature store
     """
     try:
-        # Load the dataset
-        dataset_path = os.path.join(os.path.dirname(__file__), 'training_data.csv')
-        df = pd.read_csv(dataset_path)
-        logger.info(f"Loaded dataset from {dataset_path}")
+        # Load the encoded dataset from the feature store
+        feature_set = load_feature_set(dataset_path, store_dir)
+        logger.info(f"Loaded dataset from {dataset_path} (feature store: {feature_set.path})")
         
         # Log dataset info
-        logger.info(f"Dataset shape: {df.shape}")
-        logger.info(f"Features: {df.columns.tolist()}")
-        logger.info(f"Size distribution:\n{df['size'].value_counts()}")
+        y = feature_set.target_labels()
+        logger.info(f"Dataset rows: {len(feature_set)}")
+        logger.info(f"Features: {feature_set.feature_names}")
+        logger.info(f"Size distribution:\n{pd.Series(y).value_counts()}")
         
         # Prepare features
-        numerical_features = ['height', 'weight', 'waist', 'chest']
-        categorical_features = ['gender', 'body_type', 'material', 'garment_type']
+        numerical_features = feature_set.numerical_features
+        categorical_features = feature_set.categorical_features
         
-        # Encode categorical features
-        label_encoders = {}
+        # Categorical features are already encoded in the feature store
+        label_encoders = feature_set.label_encoders()
         for feature in categorical_features:
-            label_encoders[feature] = LabelEncoder()
-            df[feature] = label_encoders[feature].fit_transform(df[feature])
             logger.info(f"{feature} categories: {label_encoders[feature].classes_}")
         
         # Scale numerical features
         scaler = StandardScaler()
-        df[numerical_features] = scaler.fit_transform(df[numerical_features])
+        scaler.fit(feature_set.numerical)
         
-        # Prepare X and y
-        X = df[numerical_features + categorical_features]
-        y = df['size']
+        # Prepare X
+        X = feature_set.encoded_matrix(scaler)
         
         # Split the data
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+        train_idx, test_idx = train_test_indices(y)
+        X_train, X_test, y_train, y_test = X[train_idx], X[test_idx], y[train_idx], y[test_idx]
         
         # Define parameter grid for GridSearchCV with focus on probability calibration
         param_grid = {
@@ -63,35 +78,64 @@ def train_model():
             'criterion': ['gini', 'entropy']
         }
         
-        # Initialize base model
-        base_model = RandomForestClassifier(random_state=42)
-        
-        # Perform GridSearchCV
-        grid_search = GridSearchCV(
-            estimator=base_model,
-            param_grid=param_grid,
-            cv=5,
-            n_jobs=-1,
-            scoring='accuracy',
-            verbose=2
-        )
-        
-        # Fit the grid search
-        grid_search.fit(X_train, y_train)
-        
-        # Get best model
-        best_model = grid_search.best_estimator_
-        
-        # Calibrate the model's probabilities
-        calibrated_model = CalibratedClassifierCV(
-            best_model,
-            cv=5,
-            method='isotonic'
-        )
-        calibrated_model.fit(X_train, y_train)
+        # Cache of fold scores and calibrators, so interrupted or extended searches reuse work
+        cache = FoldCache(cache_dir) if cache_dir else None
+        
+        if search == 'grid':
+            search_result = grid_search(
+                X_train, y_train, param_grid,
+                cv=5,
+                random_state=42,
+                cache=cache
+            )
+        elif search == 'halving':
+            search_result = successive_halving_search(
+                X_train, y_train, param_grid,
+                factor=factor,
+                cv=5,
+                time_budget=time_budget,
+                random_state=42,
+                cache=cache
+            )
+        else:
+            raise ValueError(f"Unknown search mode: {search}")
+        
+        best_params = search_result['best_params']
+        if best_params is None:
+            raise RuntimeError(f"No configuration was evaluated within the time budget of {time_budget}s")
+        
+        # Save the search log with the pruned configurations
+        search_log_path = os.path.join(os.path.dirname(__file__), 'search_log.json')
+        with open(search_log_path, 'w') as f:
+            json.dump(search_result, f, indent=2, default=str)
+        logger.info(f"Search log saved to {search_log_path}")
+        
+        # Refit the best configuration and calibrate its probabilities, reusing cached fits
+        fingerprint = data_fingerprint(X_train, y_train)
+        fitted = None
+        if cache is not None:
+            fitted_key = cache.make_key('calibrated_model', best_params, 'isotonic', 5, fingerprint)
+            fitted = cache.get(fitted_key)
+        if fitted is not None:
+            best_model, calibrated_model = fitted
+        else:
+            best_model = RandomForestClassifier(random_state=42, **best_params)
+            best_model.fit(X_train, y_train)
+            
+            calibrated_model = CalibratedClassifierCV(
+                best_model,
+                cv=5,
+                method='isotonic'
+            )
+            calibrated_model.fit(X_train, y_train)
+            if cache is not None:
+                cache.put(fitted_key, (best_model, calibrated_model))
+        
+        if cache is not None:
+            logger.info(f"Training cache: {cache.summary()}")
         
         # Log best parameters
-        logger.info(f"Best parameters: {grid_search.best_params_}")
+        logger.info(f"Best parameters: {best_params}")
         
         # Evaluate the model
         train_accuracy = calibrated_model.score(X_train, y_train)
@@ -141,7 +185,9 @@ def train_model():
             'label_encoders': label_encoders,
             'numerical_features': numerical_features,
             'categorical_features': categorical_features,
-            'feature_importance': feature_importance
+            'feature_importance': feature_importance,
+            # How the test rows were held out, so retraining does not replay them
+            'split': {'method': 'stratified', 'test_size': TEST_SIZE, 'random_state': SPLIT_RANDOM_STATE}
         }
         
         model_path = os.path.join(os.path.dirname(__file__), 'model.pkl')
@@ -154,4 +200,28 @@ def train_model():
         raise
 
 if __name__ == '__main__':
-    train_model() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Train the SmartFit size recommendation model')
+    parser.add_argument('--search', choices=['halving', 'grid'], default='halving',
+                        help='Hyperparameter search mode (default: halving)')
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help='Wall-clock budget in seconds for the halving search')
+    parser.add_argument('--factor', type=int, default=3,
+                        help='Elimination factor between halving rungs')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help='Directory for cached fold results and calibrators')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Do not read or write the training cache')
+    parser.add_argument('--dataset', default=DEFAULT_DATASET,
+                        help='Path to the training CSV')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Train out-of-core on chunks of the CSV instead of loading it into memory')
+    parser.add_argument('--chunk-size', type=int, default=100000,
+                        help='Rows per chunk in streaming mode')
+    parser.add_argument('--trees-per-chunk', type=int, default=50,
+                        help='Trees trained on each chunk in streaming mode')
+    args = parser.parse_args()
+    if args.streaming:
+        train_model_streaming(args.dataset, chunk_size=args.chunk_size, trees_per_chunk=args.trees_per_chunk)
+    else:
+        train_model(search=args.search, time_budget=args.time_budget, factor=args.factor,
+                    cache_dir=None if args.no_cache else args.cache_dir, dataset_path=args.dataset)
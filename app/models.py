@@ -5,7 +5,48 @@ from wtforms.validators import DataRequired
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from . import db
+import math
 from datetime import datetime
+from sqlalchemy import case
+from sqlalchemy.ext.hybrid import hybrid_property
+
+# Body types stored as a small integer in RecommendationHistory.body_type_code
+# ('average' is what the recommendation page sends for 'medium')
+BODY_TYPE_CODES = {'slim': 1, 'medium': 2, 'average': 3, 'large': 4}
+BODY_TYPES_BY_CODE = {code: body_type for body_type, code in BODY_TYPE_CODES.items()}
+
+
+class InvalidMeasurements(ValueError):
+    """
+    Мярка, която не е число, или непознат тип тяло в препоръката.
+    """
+
+
+def parse_measurement(value):
+    """
+    Преобразува мярка от заявката (число или низ) във float.
+    :param value: Стойността от заявката
+    :return: float или None, ако мярката липсва или е празна
+    :raises InvalidMeasurements: ако стойността не е крайно число
+    """
+    if value is None or value == '':
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise InvalidMeasurements(f'Invalid measurement: {value!r}')
+    if not math.isfinite(number):
+        raise InvalidMeasurements(f'Invalid measurement: {value!r}')
+    return number
+
+
+def format_measurement(value):
+    """
+    Форматира мярка като низ както в API-то преди числовите колони: 170.0 -> '170', 72.5 -> '72.5'.
+    """
+    if value is None:
+        return None
+    return str(int(value)) if value.is_integer() else repr(value)
 
 class BodyMeasurements(db.Model):
     """
@@ -41,11 +82,16 @@ class User(UserMixin, db.Model):
     """
     Модел за потребител. Съдържа данни за вход, роля и връзки към други обекти.
     """
+    __table_args__ = (
+        # New users per day for the daily statistics rollup
+        db.Index('ix_user_created_at', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128))
     role = db.Column(db.String(20), default='user')  # 'user', 'seller', or 'admin'
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     recommendations = db.relationship('RecommendationHistory', backref='user', lazy=True)
     body_measurements = db.relationship('BodyMeasurements', backref='user', uselist=False, lazy=True)
     clothes = db.relationship('Clothing', backref='seller', lazy=True)
@@ -80,6 +126,10 @@ class Clothing(db.Model):
     """
     Модел за дреха. Съдържа информация за име, тип, материя, размер, мерки, цена, описание и продавач.
     """
+    __table_args__ = (
+        db.Index('ix_clothing_seller_id', 'seller_id'),
+        db.Index('ix_clothing_created_at', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     type = db.Column(db.String(50), nullable=False)  # 'shirt', 'pants', 'dress', 'jacket', 'skirt', 'sweater'
@@ -124,6 +174,12 @@ class Comment(db.Model):
     """
     Модел за коментар към дреха. Съдържа съдържание, рейтинг, потребител, дреха и дати.
     """
+    __table_args__ = (
+        # Comments of a clothing item, newest first
+        db.Index('ix_comment_clothing_id_created_at', 'clothing_id', 'created_at'),
+        db.Index('ix_comment_user_id_clothing_id', 'user_id', 'clothing_id'),
+        db.Index('ix_comment_created_at', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     rating = db.Column(db.Integer)  # 1-5 stars, optional
@@ -152,21 +208,60 @@ class RecommendationHistory(db.Model):
     """
     Модел за история на препоръките. Съдържа данни за препоръчан размер, мерки и връзка към потребител.
     """
+    __table_args__ = (
+        # A user's history, newest first
+        db.Index('ix_recommendation_history_user_id_date', 'user_id', 'date'),
+        # Related recommendations for the same item and the comment permission check
+        db.Index('ix_recommendation_history_user_id_item_identifier_date', 'user_id', 'item_identifier', 'date'),
+        # Keyset pagination of the admin list by (date, id)
+        db.Index('ix_recommendation_history_date', 'date'),
+        # Archiving deletes the newest rows of a user too, and without AUTOINCREMENT SQLite would
+        # hand their ids out again to new rows, while the archived copies keep them
+        {'sqlite_autoincrement': True},
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     clothing_type = db.Column(db.String(50), nullable=False)
     recommended_size = db.Column(db.String(10), nullable=False)
-    height = db.Column(db.String(10))
-    weight = db.Column(db.String(10))
-    chest = db.Column(db.String(10))
-    waist = db.Column(db.String(10))
-    body_type = db.Column(db.String(20))
+    height_cm = db.Column(db.Float)
+    weight_kg = db.Column(db.Float)
+    chest_cm = db.Column(db.Float)
+    waist_cm = db.Column(db.Float)
+    body_type_code = db.Column(db.SmallInteger)  # See BODY_TYPE_CODES
     item_identifier = db.Column(db.String(100))  # To group related recommendations
+
+    @hybrid_property
+    def body_type(self):
+        return BODY_TYPES_BY_CODE.get(self.body_type_code)
+
+    @body_type.setter
+    def body_type(self, value):
+        # An unknown name is rejected rather than stored as NULL, which would look like a missing value
+        if value is not None and value not in BODY_TYPE_CODES:
+            raise InvalidMeasurements(f'Unknown body type: {value!r}')
+        self.body_type_code = BODY_TYPE_CODES.get(value)
+
+    @body_type.expression
+    def body_type(cls):
+        return case(BODY_TYPES_BY_CODE, value=cls.body_type_code)
+
+    def measurements_dict(self):
+        """
+        Връща мерките във формата на API-то: числата като низове, типът тяло като име.
+        """
+        return {
+            'height': format_measurement(self.height_cm),
+            'weight': format_measurement(self.weight_kg),
+            'chest': format_measurement(self.chest_cm),
+            'waist': format_measurement(self.waist_cm),
+            'bodyType': self.body_type
+        }
     
     def to_dict(self):
         """
-        Връща речник с всички данни за препоръката и свързаните препоръки.
+        Връща речник с всички данни за препоръката и свързаните препоръки от основната таблица
+        (serialize_recommendations в app/serializers.py включва и архивираните).
         """
         related = []
         if self.item_identifier:
@@ -174,20 +269,14 @@ class RecommendationHistory(db.Model):
                 RecommendationHistory.item_identifier == self.item_identifier,
                 RecommendationHistory.id != self.id,
                 RecommendationHistory.user_id == self.user_id
-            ).order_by(RecommendationHistory.date.desc()).all()
+            ).order_by(RecommendationHistory.date.desc(), RecommendationHistory.id.desc()).all()
 
         return {
             'id': self.id,
             'date': self.date.isoformat(),
             'clothingType': self.clothing_type,
             'recommendedSize': self.recommended_size,
-            'measurements': {
-                'height': self.height,
-                'weight': self.weight,
-                'chest': self.chest,
-                'waist': self.waist,
-                'bodyType': self.body_type
-            },
+            'measurements': self.measurements_dict(),
             'relatedRecommendations': [r.to_dict_without_related() for r in related]
         }
     
@@ -200,11 +289,53 @@ class RecommendationHistory(db.Model):
             'date': self.date.isoformat(),
             'clothingType': self.clothing_type,
             'recommendedSize': self.recommended_size,
-            'measurements': {
-                'height': self.height,
-                'weight': self.weight,
-                'chest': self.chest,
-                'waist': self.waist,
-                'bodyType': self.body_type
-            }
-        }
\ No newline at end of file
+            'measurements': self.measurements_dict()
+        }
+
+class RecommendationArchive(db.Model):
+    """
+    Архивирани (стари) препоръки на един потребител за един месец: редовете на RecommendationHistory
+    като zlib компресиран JSON списък. Попълва се от archive_recommendations в app/archive.py.
+    """
+    __table_args__ = (
+        # A user's archive, newest chunk first, when paging past the hot rows
+        db.Index('ix_recommendation_archive_user_id_last_date', 'user_id', 'last_date'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    month = db.Column(db.Date, nullable=False)  # First day of the month
+    first_date = db.Column(db.DateTime, nullable=False)
+    last_date = db.Column(db.DateTime, nullable=False)
+    row_count = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+
+class RecommendationArchiveItem(db.Model):
+    """
+    Индекс на архива по дреха: месеците, в които потребителят има архивирани препоръки за дрехата.
+    Свързаните препоръки и проверката за коментар разархивират само записите за тези месеци
+    вместо целия архив на потребителя. Попълва се заедно с RecommendationArchive.
+    """
+    # The primary key (user_id, item_identifier, month) is also the lookup index
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    item_identifier = db.Column(db.String(100), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)  # RecommendationArchive.month
+
+class EntityCounter(db.Model):
+    """
+    Брояч на редовете в една таблица (users, clothes, comments, recommendations). Поддържа се в същата
+    транзакция като записите (виж app/counters.py), така че таблото не прави COUNT(*) върху таблиците.
+    """
+    name = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class DailyStat(db.Model):
+    """
+    Дневен агрегат за статистиките в админ панела: брой препоръки по тип дреха и размер, брой
+    коментари и нови потребители за ден (UTC). Попълва се от rollup_daily_stats в app/stats.py.
+    За comments и users clothing_type и recommended_size са празни низове.
+    """
+    day = db.Column(db.Date, primary_key=True)
+    metric = db.Column(db.String(20), primary_key=True)  # 'recommendations', 'comments' or 'users'
+    clothing_type = db.Column(db.String(50), primary_key=True, default='')
+    recommended_size = db.Column(db.String(10), primary_key=True, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,92 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+from flask import current_app, request, jsonify
+from sqlalchemy import tuple_
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+class InvalidPageRequest(ValueError):
+    """
+    Невалиден курсор или размер на страница в заявката.
+    """
+
+
+def encode_cursor(values):
+    """
+    Кодира стойностите на ключа на последния ред в непрозрачен курсор (base64 от JSON).
+    """
+    payload = [{'dt': value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """
+    Декодира курсор, създаден от encode_cursor.
+    :param cursor: Курсорът от заявката
+    :param size: Очакван брой стойности в ключа
+    :return: Списък със стойности
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        values = [datetime.fromisoformat(value['dt']) if isinstance(value, dict) else value for value in payload]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidPageRequest('Invalid cursor')
+    if len(values) != size:
+        raise InvalidPageRequest('Invalid cursor')
+    return values
+
+
+def page_size():
+    """
+    Размер на страницата от параметъра limit или PAGE_SIZE_DEFAULT, ограничен до PAGE_SIZE_MAX.
+    """
+    limit = request.args.get('limit', current_app.config['PAGE_SIZE_DEFAULT'])
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise InvalidPageRequest('limit must be an integer')
+    if limit < 1:
+        raise InvalidPageRequest('limit must be at least 1')
+    return min(limit, current_app.config['PAGE_SIZE_MAX'])
+
+
+def keyset_paginate(query, order_columns, descending=True, key=None):
+    """
+    Keyset страниране: подрежда по order_columns (последната колона трябва да е уникална, напр. id)
+    и продължава след ключа от курсора с WHERE (колони) < (стойности), вместо с OFFSET. Така всяка
+    страница е търсене по индекс и времето не расте с номера на страницата.
+    Курсорът и размерът се четат от параметрите cursor и limit на заявката.
+    :param query: SQLAlchemy заявка
+    :param order_columns: Колони или изрази на ключа
+    :param descending: Посока на подреждане
+    :param key: Функция ред -> стойности на ключа (по подразбиране атрибутите с имената на колоните)
+    :return: (редове, курсор за следващата страница или None)
+    """
+    limit = page_size()
+    cursor = request.args.get('cursor')
+    if cursor:
+        values = tuple(decode_cursor(cursor, len(order_columns)))
+        ordering_key = tuple_(*order_columns)
+        query = query.filter(ordering_key < values if descending else ordering_key > values)
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in order_columns])
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    if key is None:
+        key = lambda row: [getattr(row, column.key) for column in order_columns]
+    return rows, encode_cursor(key(rows[-1]))
+
+
+def list_response(data, next_cursor):
+    """
+    JSON отговор със списъка; курсорът за следващата страница е в хедъра X-Next-Cursor,
+    така че тялото остава списък както преди страницирането.
+    """
+    response = jsonify(data)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
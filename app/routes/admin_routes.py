@@ -1,8 +1,17 @@
 from flask import Blueprint, jsonify, request
-from app.models import User, db, RecommendationHistory, BodyMeasurements, Clothing, Comment
+from app.models import User, db, RecommendationHistory, RecommendationArchive, BodyMeasurements, Clothing, Comment
 from flask_login import login_required, current_user
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 from app.decorators import admin_required
 from app.logging_config import log_user_action, log_error
+from app.pagination import keyset_paginate, list_response, InvalidPageRequest
+from app.serializers import UserSerializer, ClothingSerializer, CommentSerializer, RecommendationSerializer
+from app.counters import get_counts, adjust_counter
+from app.archive import delete_user_archive, archived_export_rows
+from app.stats import daily_stats, stats_date_range, InvalidStatsRequest
+from app.exports import (export_format, date_range, stream_export, recommendations_export_query,
+                         comments_export_query, InvalidExportRequest)
 import logging
 
 admin_bp = Blueprint('admin_bp', __name__)
@@ -11,17 +20,69 @@ Blueprint за всички админ маршрути: управление н
 """
 logger = logging.getLogger('admin_bp')
 
+def _user_stats_query():
+    """
+    Една заявка за потребителите с броя на препоръките, коментарите и дрехите им: агрегатите се
+    изчисляват веднъж в групирани подзаявки и се свързват с LEFT OUTER JOIN, а мерките се зареждат
+    в същата заявка. Броят на препоръките включва архивираните (сумата на row_count в архива).
+    :return: (заявка, речник колона за сортиране -> (SQL израз, стойност от ред))
+    """
+    recommendation_counts = (db.session.query(RecommendationHistory.user_id.label('user_id'),
+                                              func.count().label('count'))
+                             .group_by(RecommendationHistory.user_id).subquery())
+    comment_counts = (db.session.query(Comment.user_id.label('user_id'), func.count().label('count'))
+                      .group_by(Comment.user_id).subquery())
+    clothing_counts = (db.session.query(Clothing.seller_id.label('user_id'), func.count().label('count'))
+                       .group_by(Clothing.seller_id).subquery())
+    archived_counts = (db.session.query(RecommendationArchive.user_id.label('user_id'),
+                                        func.sum(RecommendationArchive.row_count).label('count'))
+                       .group_by(RecommendationArchive.user_id).subquery())
+    recommendation_count = (func.coalesce(recommendation_counts.c.count, 0)
+                            + func.coalesce(archived_counts.c.count, 0))
+    comment_count = func.coalesce(comment_counts.c.count, 0)
+    clothing_count = func.coalesce(clothing_counts.c.count, 0)
+    query = (db.session.query(User, recommendation_count, comment_count, clothing_count)
+             .outerjoin(recommendation_counts, recommendation_counts.c.user_id == User.id)
+             .outerjoin(archived_counts, archived_counts.c.user_id == User.id)
+             .outerjoin(comment_counts, comment_counts.c.user_id == User.id)
+             .outerjoin(clothing_counts, clothing_counts.c.user_id == User.id)
+             .options(joinedload(User.body_measurements)))
+    # Sort expression and how to read its value from a result row (for the pagination cursor)
+    sort_columns = {
+        'id': (User.id, lambda row: row[0].id),
+        'username': (User.username, lambda row: row[0].username),
+        'role': (User.role, lambda row: row[0].role),
+        'recommendation_count': (recommendation_count, lambda row: row[1]),
+        'comment_count': (comment_count, lambda row: row[2]),
+        'clothing_count': (clothing_count, lambda row: row[3])
+    }
+    return query, sort_columns
+
 @admin_bp.route('/admin/users')
 @login_required
 @admin_required
 def get_all_users():
+    """
+    Връща всички потребители със статистика (препоръки, коментари, дрехи).
+    Метод: GET
+    Параметри (по избор): sort (id, username, role, recommendation_count, comment_count, clothing_count),
+    order (asc/desc), limit и cursor (курсорът за следващата страница е в хедъра X-Next-Cursor).
+    Изход: JSON списък с потребители
+    """
     try:
-        users = User.query.all()
+        query, sort_columns = _user_stats_query()
+        sort = request.args.get('sort', 'id')
+        order = request.args.get('order', 'asc')
+        if sort not in sort_columns or order not in ('asc', 'desc'):
+            return jsonify({'error': f"Invalid sort; use one of {sorted(sort_columns)} with order asc or desc"}), 400
+        sort_column, sort_value = sort_columns[sort]
+        order_columns = [User.id] if sort == 'id' else [sort_column, User.id]
+        rows, next_cursor = keyset_paginate(
+            query, order_columns, descending=order == 'desc',
+            key=lambda row: [row[0].id] if sort == 'id' else [sort_value(row), row[0].id])
+
         users_with_stats = []
-        for user in users:
-            recommendation_count = RecommendationHistory.query.filter_by(user_id=user.id).count()
-            comment_count = Comment.query.filter_by(user_id=user.id).count()
-            clothing_count = Clothing.query.filter_by(seller_id=user.id).count()
+        for user, recommendation_count, comment_count, clothing_count in rows:
             user_data = user.to_dict()
             user_data.update({
                 'recommendation_count': recommendation_count,
@@ -29,8 +90,10 @@ def get_all_users():
                 'clothing_count': clothing_count
             })
             users_with_stats.append(user_data)
-        log_user_action("admin_get_users", current_user.id, f"Count: {len(users)}")
-        return jsonify(users_with_stats), 200
+        log_user_action("admin_get_users", current_user.id, f"Count: {len(users_with_stats)}")
+        return list_response(users_with_stats, next_cursor), 200
+    except InvalidPageRequest as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         log_error(e, "Admin get users error")
         return jsonify({'error': str(e)}), 500
@@ -40,14 +103,17 @@ def get_all_users():
 @admin_required
 def get_all_clothes():
     """
-    Връща списък с всички дрехи.
+    Връща списък с дрехите, най-новите първо, на страници.
     Метод: GET
-    Изход: JSON с всички дрехи
+    Параметри (по избор): limit и cursor (курсорът за следващата страница е в хедъра X-Next-Cursor)
+    Изход: JSON с дрехите
     """
     try:
-        clothes = Clothing.query.all()
+        clothes, next_cursor = keyset_paginate(ClothingSerializer.query(), [Clothing.created_at, Clothing.id])
         log_user_action("admin_get_clothes", current_user.id, f"Count: {len(clothes)}")
-        return jsonify([clothing.to_dict() for clothing in clothes]), 200
+        return list_response(ClothingSerializer.dump_many(clothes), next_cursor), 200
+    except InvalidPageRequest as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         log_error(e, "Admin get clothes error")
         return jsonify({'error': str(e)}), 500
@@ -57,9 +123,11 @@ def get_all_clothes():
 @admin_required
 def get_all_comments():
     try:
-        comments = Comment.query.all()
+        comments, next_cursor = keyset_paginate(CommentSerializer.query(), [Comment.created_at, Comment.id])
         log_user_action("admin_get_comments", current_user.id, f"Count: {len(comments)}")
-        return jsonify([comment.to_dict() for comment in comments]), 200
+        return list_response(CommentSerializer.dump_many(comments), next_cursor), 200
+    except InvalidPageRequest as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         log_error(e, "Admin get comments error")
         return jsonify({'error': str(e)}), 500
@@ -68,37 +136,96 @@ def get_all_comments():
 @login_required
 @admin_required
 def get_all_recommendations():
+    """
+    Връща препоръките на всички потребители, най-новите първи.
+    Списъкът е само от основната таблица, т.е. без препоръките, архивирани след
+    RECOMMENDATION_ARCHIVE_DAYS дни: архивът е на записи по потребител и месец и не може да се
+    страницира по дата за всички потребители без да се разархивира целият месец. Архивираните
+    препоръки са в броячите, в историята на всеки потребител и в експорта.
+    Метод: GET
+    Параметри (по избор): limit и cursor (курсорът за следващата страница е в хедъра X-Next-Cursor)
+    Изход: JSON списък с препоръки
+    """
     try:
-        recommendations = RecommendationHistory.query.all()
+        recommendations, next_cursor = keyset_paginate(RecommendationSerializer.query(),
+                                                       [RecommendationHistory.date, RecommendationHistory.id])
         log_user_action("admin_get_recommendations", current_user.id, f"Count: {len(recommendations)}")
-        return jsonify([rec.to_dict() for rec in recommendations]), 200
+        return list_response(RecommendationSerializer.dump_many(recommendations), next_cursor), 200
+    except InvalidPageRequest as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         log_error(e, "Admin get recommendations error")
         return jsonify({'error': str(e)}), 500
 
+@admin_bp.route('/admin/export/recommendations')
+@login_required
+@admin_required
+def export_recommendations():
+    """
+    Експортира всички препоръки (без свързаните), включително архивираните, подредени по дата, като поток.
+    Метод: GET
+    Параметри (по избор): format (ndjson или csv), from и to (ISO дата или дата и час)
+    Изход: NDJSON (по един JSON обект на ред) или CSV файл
+    """
+    try:
+        fmt = export_format()
+        start, end = date_range()
+        log_user_action("admin_export_recommendations", current_user.id, f"Format: {fmt}, from: {start}, to: {end}")
+        return stream_export(recommendations_export_query(start, end), fmt, 'recommendations',
+                             leading_rows=archived_export_rows(start, end))
+    except InvalidExportRequest as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        log_error(e, "Admin export recommendations error")
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/admin/export/comments')
+@login_required
+@admin_required
+def export_comments():
+    """
+    Експортира всички коментари, подредени по дата на създаване, като поток.
+    Метод: GET
+    Параметри (по избор): format (ndjson или csv), from и to (ISO дата или дата и час)
+    Изход: NDJSON (по един JSON обект на ред) или CSV файл
+    """
+    try:
+        fmt = export_format()
+        start, end = date_range()
+        log_user_action("admin_export_comments", current_user.id, f"Format: {fmt}, from: {start}, to: {end}")
+        return stream_export(comments_export_query(start, end), fmt, 'comments')
+    except InvalidExportRequest as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        log_error(e, "Admin export comments error")
+        return jsonify({'error': str(e)}), 500
+
 @admin_bp.route('/admin/dashboard')
 @login_required
 @admin_required
 def admin_dashboard():
+    """
+    Връща броя на записите по таблица (от броячите, без COUNT(*)), броя потребители по роля,
+    броя търговци с поне една дреха и последните потребители, дрехи и коментари.
+    Списъците в админ панела са на страници, затова общите числа идват оттук.
+    Метод: GET
+    Изход: JSON с броячите и последните записи
+    """
     try:
-        user_count = User.query.count()
-        clothes_count = Clothing.query.count()
-        comments_count = Comment.query.count()
-        recommendations_count = RecommendationHistory.query.count()
-        recent_users = User.query.order_by(User.id.desc()).limit(5).all()
-        recent_clothes = Clothing.query.order_by(Clothing.created_at.desc()).limit(5).all()
-        recent_comments = Comment.query.order_by(Comment.created_at.desc()).limit(5).all()
+        counts = get_counts()
+        roles = dict(db.session.query(User.role, func.count()).group_by(User.role).all())
+        sellers_with_clothes = db.session.query(func.count(func.distinct(Clothing.seller_id))).scalar()
+        recent_users = UserSerializer.query().order_by(User.id.desc()).limit(5).all()
+        recent_clothes = ClothingSerializer.query().order_by(Clothing.created_at.desc()).limit(5).all()
+        recent_comments = CommentSerializer.query().order_by(Comment.created_at.desc()).limit(5).all()
         dashboard_data = {
-            'counts': {
-                'users': user_count,
-                'clothes': clothes_count,
-                'comments': comments_count,
-                'recommendations': recommendations_count
-            },
+            'counts': counts,
+            'roles': roles,
+            'sellers_with_clothes': sellers_with_clothes,
             'recent': {
-                'users': [user.to_dict() for user in recent_users],
-                'clothes': [clothing.to_dict() for clothing in recent_clothes],
-                'comments': [comment.to_dict() for comment in recent_comments]
+                'users': UserSerializer.dump_many(recent_users),
+                'clothes': ClothingSerializer.dump_many(recent_clothes),
+                'comments': CommentSerializer.dump_many(recent_comments)
             }
         }
         log_user_action("admin_dashboard_access", current_user.id)
@@ -107,6 +234,43 @@ def admin_dashboard():
         log_error(e, "Admin dashboard error")
         return jsonify({'error': str(e)}), 500
 
+@admin_bp.route('/admin/stats/daily')
+@login_required
+@admin_required
+def get_daily_stats():
+    """
+    Връща дневната статистика (препоръки по размер и тип дреха, коментари, нови потребители)
+    от предварително агрегираните данни (rollup-stats).
+    Метод: GET
+    Параметри (по избор): from и to (ISO дати, включително; по подразбиране последните 30 дни)
+    Изход: JSON с периода и по един запис за ден
+    """
+    try:
+        start, end = stats_date_range()
+        days = daily_stats(start, end)
+        log_user_action("admin_get_daily_stats", current_user.id, f"From: {start}, to: {end}")
+        return jsonify({'from': start.isoformat(), 'to': end.isoformat(), 'days': days}), 200
+    except InvalidStatsRequest as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        log_error(e, "Admin daily stats error")
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/admin/shadow-stats')
+@login_required
+@admin_required
+def shadow_stats():
+    """
+    Връща статистиката от shadow оценката на модела-кандидат за текущия процес.
+    Метод: GET
+    Изход: JSON със съгласие, разлика в доверието и латентност на двата модела
+    """
+    from app.ml.ml_model import get_shadow_stats
+    stats = get_shadow_stats()
+    if stats is None:
+        return jsonify({'error': 'Shadow evaluation is not enabled'}), 404
+    return jsonify(stats), 200
+
 @admin_bp.route('/admin/users/<int:user_id>', methods=['DELETE'])
 @login_required
 @admin_required
@@ -118,9 +282,12 @@ def delete_user(user_id):
         if user.role == 'admin':
             return jsonify({'error': 'Cannot delete admin user'}), 400
         BodyMeasurements.query.filter_by(user_id=user_id).delete()
-        RecommendationHistory.query.filter_by(user_id=user_id).delete()
-        Comment.query.filter_by(user_id=user_id).delete()
-        Clothing.query.filter_by(seller_id=user_id).delete()
+        # Bulk deletes skip the after_delete events, so the counters are adjusted here
+        connection = db.session.connection()
+        adjust_counter(connection, RecommendationHistory,
+                       -RecommendationHistory.query.filter_by(user_id=user_id).delete() - delete_user_archive(user_id))
+        adjust_counter(connection, Comment, -Comment.query.filter_by(user_id=user_id).delete())
+        adjust_counter(connection, Clothing, -Clothing.query.filter_by(seller_id=user_id).delete())
         db.session.delete(user)
         db.session.commit()
         log_user_action("admin_delete_user", current_user.id, f"Deleted user: {user_id}")
@@ -144,7 +311,8 @@ def delete_clothing(clothing_id):
         clothing = Clothing.query.get(clothing_id)
         if not clothing:
             return jsonify({'error': 'Clothing not found'}), 404
-        Comment.query.filter_by(clothing_id=clothing_id).delete()
+        # Bulk deletes skip the after_delete events, so the counter is adjusted here
+        adjust_counter(db.session.connection(), Comment, -Comment.query.filter_by(clothing_id=clothing_id).delete())
         db.session.delete(clothing)
         db.session.commit()
         log_user_action("admin_delete_clothing", current_user.id, f"Deleted clothing: {clothing_id}")
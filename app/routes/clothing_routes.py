@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify, request
-from app.models import db, RecommendationHistory, Clothing
+from app.models import db, RecommendationHistory, Clothing, parse_measurement, InvalidMeasurements
 from flask_login import login_required, current_user
+from app.serializers import serialize_recommendations
 from app.ml.ml_model import predict_size
 from app.logging_config import log_user_action, log_error, log_ai_recommendation, log_performance
 import logging
@@ -34,10 +35,10 @@ def save_recommendation():
             user_id=current_user.id,
             clothing_type=data.get('clothingType', 'general'),
             recommended_size=recommended_size,
-            height=str(measurements.get('height')),
-            weight=str(measurements.get('weight')),
-            chest=str(measurements.get('chest')),
-            waist=str(measurements.get('waist')),
+            height_cm=parse_measurement(measurements.get('height')),
+            weight_kg=parse_measurement(measurements.get('weight')),
+            chest_cm=parse_measurement(measurements.get('chest')),
+            waist_cm=parse_measurement(measurements.get('waist')),
             body_type=measurements.get('body_type'),
             item_identifier=item_identifier
         )
@@ -53,8 +54,11 @@ def save_recommendation():
         logger.info(f"Successfully saved recommendation for user {current_user.id}")
         return jsonify({
             'message': 'Recommendation saved successfully',
-            'recommendation': recommendation.to_dict()
+            'recommendation': serialize_recommendations([recommendation])[0]
         }), 201
+    except InvalidMeasurements as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         log_error(e, "Save recommendation error")
         db.session.rollback()
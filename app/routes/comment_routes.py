@@ -1,6 +1,11 @@
 from flask import Blueprint, jsonify, request
-from app.models import db, Comment, RecommendationHistory
+from app.models import db, Comment, Clothing, RecommendationHistory
 from flask_login import login_required, current_user
+from app.pagination import keyset_paginate, list_response, InvalidPageRequest
+from app.serializers import CommentSerializer
+from app.archive import has_archived_recommendation
+from app.conditional import make_etag, not_modified, with_validators
+from sqlalchemy import func, select
 import logging
 
 comment_bp = Blueprint('comment_bp', __name__)
@@ -9,10 +14,33 @@ Blueprint за всички маршрути, свързани с комента
 """
 logger = logging.getLogger('comment_bp')
 
+def comments_version(clothing_id):
+    """
+    Маркер за версията на коментарите към дрехата с една заявка: брой, max(id) и max(updated_at)
+    на коментарите и updated_at на дрехата (името ѝ е в отговора).
+    :return: (маркер, последна промяна или None)
+    """
+    clothing_updated = select(Clothing.updated_at).where(Clothing.id == clothing_id).scalar_subquery()
+    version = db.session.execute(
+        select(func.count(Comment.id), func.max(Comment.id), func.max(Comment.updated_at), clothing_updated)
+        .where(Comment.clothing_id == clothing_id)).one()
+    last_modified = max((value for value in version[2:] if value is not None), default=None)
+    return tuple(version), last_modified
+
 @comment_bp.route('/clothing/<int:clothing_id>/comments', methods=['GET'])
 def get_clothing_comments(clothing_id):
-    comments = Comment.query.filter_by(clothing_id=clothing_id).order_by(Comment.created_at.desc()).all()
-    return jsonify([c.to_dict() for c in comments]), 200
+    version, last_modified = comments_version(clothing_id)
+    etag = make_etag(version)
+    response = not_modified(etag, last_modified)
+    if response:
+        return response
+    try:
+        comments, next_cursor = keyset_paginate(CommentSerializer.query().filter_by(clothing_id=clothing_id),
+                                                [Comment.created_at, Comment.id])
+    except InvalidPageRequest as e:
+        return jsonify({'error': str(e)}), 400
+    response = list_response(CommentSerializer.dump_many(comments), next_cursor)
+    return with_validators(response, etag, last_modified), 200
 
 @comment_bp.route('/clothing/<int:clothing_id>/comments', methods=['POST'])
 @login_required
@@ -25,7 +53,9 @@ def add_clothing_comment(clothing_id):
         logger.warning('Empty comment content')
         return jsonify({'error': 'Коментарът не може да е празен.'}), 400
     rec = RecommendationHistory.query.filter_by(user_id=current_user.id, item_identifier=str(clothing_id)).first()
-    logger.info(f'Recommendation found: {rec is not None}')
+    if not rec:
+        rec = has_archived_recommendation(current_user.id, str(clothing_id))
+    logger.info(f'Recommendation found: {bool(rec)}')
     if not rec:
         logger.warning('No recommendation found for this clothing')
         return jsonify({'error': 'Може да коментирате само ако имате препоръка за тази дреха.'}), 403
@@ -2,6 +2,10 @@ from flask import Blueprint, jsonify, request
 from app.models import User, db, BodyMeasurements, RecommendationHistory
 from flask_login import login_required, current_user
 from app.logging_config import log_user_action, log_error
+from app.pagination import list_response, InvalidPageRequest
+from app.archive import paginate_user_recommendations, recommendations_version
+from app.conditional import make_etag, not_modified, with_validators
+from app.serializers import RecommendationSerializer
 import logging
 
 user_bp = Blueprint('user_bp', __name__)
@@ -15,7 +19,14 @@ logger = logging.getLogger('user_bp')
 def get_user():
     try:
         log_user_action("get_user_profile", current_user.id)
-        return jsonify(current_user.to_dict()), 200
+        measurements = current_user.body_measurements
+        last_modified = measurements.updated_at if measurements else None
+        etag = make_etag(current_user.id, current_user.username, current_user.email, current_user.role,
+                         measurements.id if measurements else None, last_modified)
+        response = not_modified(etag, last_modified)
+        if response:
+            return response
+        return with_validators(jsonify(current_user.to_dict()), etag, last_modified), 200
     except Exception as e:
         log_error(e, "Get user data error")
         return jsonify({'error': str(e)}), 500
@@ -24,9 +35,19 @@ def get_user():
 @login_required
 def get_user_recommendations():
     try:
-        recommendations = RecommendationHistory.query.filter_by(user_id=current_user.id).order_by(RecommendationHistory.date.desc()).all()
+        version, last_modified = recommendations_version(current_user.id)
+        etag = make_etag(current_user.id, version)
+        response = not_modified(etag, last_modified)
+        if response:
+            return response
+        # Continues into the archive once the recent rows run out
+        recommendations, next_cursor = paginate_user_recommendations(
+            RecommendationSerializer.query().filter_by(user_id=current_user.id), current_user.id)
         log_user_action("get_recommendation_history", current_user.id, f"Count: {len(recommendations)}")
-        return jsonify([rec.to_dict() for rec in recommendations]), 200
+        response = list_response(RecommendationSerializer.dump_many(recommendations), next_cursor)
+        return with_validators(response, etag, last_modified), 200
+    except InvalidPageRequest as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         log_error(e, "Get user recommendations error")
         return jsonify({'error': str(e)}), 500
@@ -35,12 +56,17 @@ def get_user_recommendations():
 @login_required
 def get_measurements():
     try:
-        measurements = BodyMeasurements.query.filter_by(user_id=current_user.id).first()
+        # Loaded together with the user (see app/user_cache.py)
+        measurements = current_user.body_measurements
         if not measurements:
             logger.info(f"No measurements found for user: {current_user.id}")
             return jsonify({'error': 'No measurements found'}), 404
         log_user_action("get_measurements", current_user.id)
-        return jsonify(measurements.to_dict())
+        etag = make_etag(current_user.id, measurements.id, measurements.updated_at)
+        response = not_modified(etag, measurements.updated_at)
+        if response:
+            return response
+        return with_validators(jsonify(measurements.to_dict()), etag, measurements.updated_at)
     except Exception as e:
         log_error(e, "Get measurements error")
         return jsonify({'error': str(e)}), 500
@@ -1,195 +1,226 @@
 from .models import db, User, Clothing, Comment
+from .counters import adjust_counter
 from werkzeug.security import generate_password_hash
-from datetime import datetime
+from sqlalchemy import insert
 
-def seed_database():
+ADMIN = {
+    'username': 'FHPopova21',
+    'email': 'fhpopova21@codingburgas.bg',
+    'password': 'Vuk80492',
+    'role': 'admin'
+}
+
+SELLERS = [
+    {
+        'username': 'fashion_store_bg',
+        'email': 'fashion@store.bg',
+        'password': 'password123',
+        'role': 'seller'
+    },
+    {
+        'username': 'sport_world',
+        'email': 'info@sportworld.bg',
+        'password': 'password123',
+        'role': 'seller'
+    },
+    {
+        'username': 'elegant_lady',
+        'email': 'contact@elegantlady.bg',
+        'password': 'password123',
+        'role': 'seller'
+    }
+]
+
+CLOTHES = [
+    {
+        'name': 'Класическа бизнес риза',
+        'type': 'shirt',
+        'material': 'non-elastic',
+        'size': 'M',
+        'width': 52,
+        'length': 75,
+        'sleeves': 65,
+        'price': 89,
+        'description': 'Елегантна бяла риза за официални случаи',
+        'seller_username': 'fashion_store_bg'
+    },
+    {
+        'name': 'Спортна тениска',
+        'type': 'shirt',
+        'material': 'elastic',
+        'size': 'L',
+        'width': 55,
+        'length': 70,
+        'sleeves': 25,
+        'price': 45,
+        'description': 'Комфортна тениска за тренировки',
+        'seller_username': 'sport_world'
+    },
+    {
+        'name': 'Дамска рокля',
+        'type': 'dress',
+        'material': 'semi-elastic',
+        'size': 'S',
+        'width': 46,
+        'length': 95,
+        'sleeves': 60,
+        'price': 120,
+        'description': 'Стилна рокля за специални поводи',
+        'seller_username': 'elegant_lady'
+    },
+    {
+        'name': 'Джинсов панталон',
+        'type': 'pants',
+        'material': 'non-elastic',
+        'size': 'M',
+        'width': 42,
+        'length': 100,
+        'price': 95,
+        'description': 'Класически дънки с перфектен крой',
+        'seller_username': 'fashion_store_bg'
+    },
+    {
+        'name': 'Зимно яке',
+        'type': 'jacket',
+        'material': 'non-elastic',
+        'size': 'L',
+        'width': 58,
+        'length': 68,
+        'sleeves': 68,
+        'price': 180,
+        'description': 'Топло яке за студените дни',
+        'seller_username': 'fashion_store_bg'
+    }
+]
+
+COMMENTS = [
+    {
+        'content': 'Отлична риза, перфектен размер!',
+        'rating': 5,
+        'user_username': 'FHPopova21',
+        'clothing_name': 'Класическа бизнес риза'
+    },
+    {
+        'content': 'Много удобна тениска за тренировки',
+        'rating': 4,
+        'user_username': 'FHPopova21',
+        'clothing_name': 'Спортна тениска'
+    },
+    {
+        'content': 'Красива рокля, препоръчвам!',
+        'rating': 5,
+        'user_username': 'FHPopova21',
+        'clothing_name': 'Дамска рокля'
+    }
+]
+
+
+def _insert_in_batches(model, rows, batch_size):
     """
-    Зарежда начални данни в базата: админ, продавачи, дрехи и коментари.
+    Вмъква редовете с една executemany заявка на партида.
     """
-    
-    # Check if admin already exists
-    admin = User.query.filter_by(username='FHPopova21').first()
-    if not admin:
-        # Create default admin user
-        admin = User(
-            username='FHPopova21',
-            email='fhpopova21@codingburgas.bg',
-            role='admin'
-        )
-        admin.set_password('Vuk80492')
-        db.session.add(admin)
-        print("Created admin user: FHPopova21")
-    
-    # Create some sample sellers if they don't exist
-    sellers_data = [
-        {
-            'username': 'fashion_store_bg',
-            'email': 'fashion@store.bg',
-            'password': 'password123',
-            'role': 'seller'
-        },
-        {
-            'username': 'sport_world',
-            'email': 'info@sportworld.bg',
-            'password': 'password123',
-            'role': 'seller'
-        },
-        {
-            'username': 'elegant_lady',
-            'email': 'contact@elegantlady.bg',
-            'password': 'password123',
-            'role': 'seller'
-        }
-    ]
-    
-    for seller_data in sellers_data:
-        seller = User.query.filter_by(username=seller_data['username']).first()
-        if not seller:
-            seller = User(
-                username=seller_data['username'],
-                email=seller_data['email'],
-                role=seller_data['role']
-            )
-            seller.set_password(seller_data['password'])
-            db.session.add(seller)
-            print(f"Created seller: {seller_data['username']}")
-    
-    # Create some sample clothes if they don't exist
-    clothes_data = [
-        {
-            'name': 'Класическа бизнес риза',
-            'type': 'shirt',
-            'material': 'non-elastic',
-            'size': 'M',
-            'width': 52,
-            'length': 75,
-            'sleeves': 65,
-            'price': 89,
-            'description': 'Елегантна бяла риза за официални случаи',
-            'seller_username': 'fashion_store_bg'
-        },
-        {
-            'name': 'Спортна тениска',
-            'type': 'shirt',
-            'material': 'elastic',
-            'size': 'L',
-            'width': 55,
-            'length': 70,
-            'sleeves': 25,
-            'price': 45,
-            'description': 'Комфортна тениска за тренировки',
-            'seller_username': 'sport_world'
-        },
-        {
-            'name': 'Дамска рокля',
-            'type': 'dress',
-            'material': 'semi-elastic',
-            'size': 'S',
-            'width': 46,
-            'length': 95,
-            'sleeves': 60,
-            'price': 120,
-            'description': 'Стилна рокля за специални поводи',
-            'seller_username': 'elegant_lady'
-        },
-        {
-            'name': 'Джинсов панталон',
-            'type': 'pants',
-            'material': 'non-elastic',
-            'size': 'M',
-            'width': 42,
-            'length': 100,
-            'price': 95,
-            'description': 'Класически дънки с перфектен крой',
-            'seller_username': 'fashion_store_bg'
-        },
-        {
-            'name': 'Зимно яке',
-            'type': 'jacket',
-            'material': 'non-elastic',
-            'size': 'L',
-            'width': 58,
-            'length': 68,
-            'sleeves': 68,
-            'price': 180,
-            'description': 'Топло яке за студените дни',
-            'seller_username': 'fashion_store_bg'
-        }
-    ]
-    
-    for clothing_data in clothes_data:
-        # Check if clothing already exists
-        existing_clothing = Clothing.query.filter_by(
-            name=clothing_data['name'],
-            seller_id=User.query.filter_by(username=clothing_data['seller_username']).first().id
-        ).first()
-        
-        if not existing_clothing:
-            seller = User.query.filter_by(username=clothing_data['seller_username']).first()
-            if seller:
-                clothing = Clothing(
-                    name=clothing_data['name'],
-                    type=clothing_data['type'],
-                    material=clothing_data['material'],
-                    size=clothing_data['size'],
-                    width=clothing_data['width'],
-                    length=clothing_data['length'],
-                    sleeves=clothing_data.get('sleeves'),
-                    price=clothing_data['price'],
-                    description=clothing_data['description'],
-                    seller_id=seller.id
-                )
-                db.session.add(clothing)
-                print(f"Created clothing: {clothing_data['name']}")
-    
-    # Create some sample comments if they don't exist
-    comments_data = [
-        {
-            'content': 'Отлична риза, перфектен размер!',
-            'rating': 5,
-            'user_username': 'FHPopova21',
-            'clothing_name': 'Класическа бизнес риза'
-        },
-        {
-            'content': 'Много удобна тениска за тренировки',
-            'rating': 4,
-            'user_username': 'FHPopova21',
-            'clothing_name': 'Спортна тениска'
-        },
-        {
-            'content': 'Красива рокля, препоръчвам!',
-            'rating': 5,
-            'user_username': 'FHPopova21',
-            'clothing_name': 'Дамска рокля'
-        }
-    ]
-    
-    for comment_data in comments_data:
-        # Check if comment already exists
-        user = User.query.filter_by(username=comment_data['user_username']).first()
-        clothing = Clothing.query.filter_by(name=comment_data['clothing_name']).first()
-        
-        if user and clothing:
-            existing_comment = Comment.query.filter_by(
-                user_id=user.id,
-                clothing_id=clothing.id,
-                content=comment_data['content']
-            ).first()
-            
-            if not existing_comment:
-                comment = Comment(
-                    content=comment_data['content'],
-                    rating=comment_data['rating'],
-                    user_id=user.id,
-                    clothing_id=clothing.id
-                )
-                db.session.add(comment)
-                print(f"Created comment for {comment_data['clothing_name']}")
-    
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(insert(model), rows[start:start + batch_size])
+    # Bulk inserts skip the after_insert events
+    adjust_counter(db.session.connection(), model, len(rows))
+
+
+def _user_ids(usernames):
+    return dict(db.session.query(User.username, User.id).filter(User.username.in_(usernames)).all())
+
+
+def seed_database(batch_size=500):
+    """
+    Зарежда начални данни в базата: админ, продавачи, дрехи и коментари. Може да се изпълнява
+    многократно: съществуващите записи се откриват с по една IN заявка на таблица, липсващите
+    се вмъкват на партиди, а всяка различна парола се хешира само веднъж.
+    :param batch_size: Брой редове в една INSERT партида
+    :return: Речник с броя създадени записи по таблица
+    """
+    created = {'users': 0, 'clothes': 0, 'comments': 0}
+
+    # Users (admin and sellers)
+    users_data = [ADMIN] + SELLERS
+    user_ids = _user_ids([u['username'] for u in users_data])
+    password_hashes = {}
+    new_users = []
+    for user_data in users_data:
+        if user_data['username'] in user_ids:
+            continue
+        password = user_data['password']
+        if password not in password_hashes:
+            password_hashes[password] = generate_password_hash(password)
+        new_users.append({
+            'username': user_data['username'],
+            'email': user_data['email'],
+            'role': user_data['role'],
+            'password_hash': password_hashes[password]
+        })
+        print(f"Created {user_data['role']}: {user_data['username']}")
+    if new_users:
+        _insert_in_batches(User, new_users, batch_size)
+        created['users'] = len(new_users)
+        user_ids = _user_ids([u['username'] for u in users_data])
+
+    # Clothes, unique by (name, seller)
+    seller_ids = {user_ids[c['seller_username']] for c in CLOTHES if c['seller_username'] in user_ids}
+    existing_clothes = set(db.session.query(Clothing.name, Clothing.seller_id)
+                           .filter(Clothing.seller_id.in_(seller_ids)).all())
+    new_clothes = []
+    for clothing_data in CLOTHES:
+        seller_id = user_ids.get(clothing_data['seller_username'])
+        if seller_id is None or (clothing_data['name'], seller_id) in existing_clothes:
+            continue
+        new_clothes.append({
+            'name': clothing_data['name'],
+            'type': clothing_data['type'],
+            'material': clothing_data['material'],
+            'size': clothing_data['size'],
+            'width': clothing_data['width'],
+            'length': clothing_data['length'],
+            'sleeves': clothing_data.get('sleeves'),
+            'price': clothing_data['price'],
+            'description': clothing_data['description'],
+            'seller_id': seller_id
+        })
+        existing_clothes.add((clothing_data['name'], seller_id))
+        print(f"Created clothing: {clothing_data['name']}")
+    if new_clothes:
+        _insert_in_batches(Clothing, new_clothes, batch_size)
+        created['clothes'] = len(new_clothes)
+
+    # Comments, unique by (user, clothing, content)
+    clothing_ids = dict(db.session.query(Clothing.name, Clothing.id)
+                        .filter(Clothing.name.in_([c['clothing_name'] for c in COMMENTS]))
+                        .order_by(Clothing.id.desc()).all())
+    existing_comments = set(db.session.query(Comment.user_id, Comment.clothing_id, Comment.content)
+                            .filter(Comment.clothing_id.in_(clothing_ids.values())).all())
+    new_comments = []
+    for comment_data in COMMENTS:
+        user_id = user_ids.get(comment_data['user_username'])
+        clothing_id = clothing_ids.get(comment_data['clothing_name'])
+        if user_id is None or clothing_id is None:
+            continue
+        key = (user_id, clothing_id, comment_data['content'])
+        if key in existing_comments:
+            continue
+        new_comments.append({
+            'content': comment_data['content'],
+            'rating': comment_data['rating'],
+            'user_id': user_id,
+            'clothing_id': clothing_id
+        })
+        existing_comments.add(key)
+        print(f"Created comment for {comment_data['clothing_name']}")
+    if new_comments:
+        _insert_in_batches(Comment, new_comments, batch_size)
+        created['comments'] = len(new_comments)
+
     try:
         db.session.commit()
         print("Database seeded successfully!")
     except Exception as e:
         db.session.rollback()
         print(f"Error seeding database: {e}")
-        raise 
\ No newline at end of file
+        raise
+    return created
@@ -0,0 +1,104 @@
+from collections import defaultdict
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+from app.models import User, Clothing, Comment, RecommendationHistory
+from app.archive import archived_item_recommendations
+
+# Keeps the number of bound parameters per query well below SQLite's limit
+IN_BATCH_SIZE = 500
+
+
+def serialize_recommendations(recommendations):
+    """
+    Сериализира списък с препоръки както RecommendationHistory.to_dict(), но свързаните препоръки
+    за всички редове се зареждат с една заявка по (user_id, item_identifier) вместо с отделна
+    заявка за всеки ред, а всяка група се сериализира само веднъж. Свързаните препоръки включват
+    архивираните, а редовете могат да са и от архива (paginate_user_recommendations).
+    :param recommendations: Списък с RecommendationHistory обекти
+    :return: Списък с речници
+    """
+    keys = sorted({(rec.user_id, rec.item_identifier) for rec in recommendations if rec.item_identifier})
+    groups = defaultdict(list)
+    for start in range(0, len(keys), IN_BATCH_SIZE):
+        batch = keys[start:start + IN_BATCH_SIZE]
+        # OR от двойки вместо (user_id, item_identifier) IN (...): SQLite не търси по индекса за
+        # IN с редове-стойности и сканира цялата таблица, а всяка двойка в OR е търсене по индекса
+        pairs = [and_(RecommendationHistory.user_id == user_id, RecommendationHistory.item_identifier == item)
+                 for user_id, item in batch]
+        related = (RecommendationHistory.query
+                   .filter(or_(*pairs))
+                   .order_by(RecommendationHistory.date.desc(), RecommendationHistory.id.desc())
+                   .all())
+        for rec in related:
+            groups[(rec.user_id, rec.item_identifier)].append((rec.id, rec.to_dict_without_related()))
+    if keys:
+        # Archived rows are older than the hot ones, so they go after them
+        for key, archived in archived_item_recommendations(set(keys)).items():
+            groups[key].extend((rec.id, rec.to_dict_without_related()) for rec in archived)
+
+    result = []
+    for rec in recommendations:
+        data = rec.to_dict_without_related()
+        group = groups.get((rec.user_id, rec.item_identifier), []) if rec.item_identifier else []
+        data['relatedRecommendations'] = [related for related_id, related in group if related_id != rec.id]
+        result.append(data)
+    return result
+
+
+class Serializer:
+    """
+    Базов сериализатор за списъци. Всеки наследник декларира връзките, които to_dict() на модела
+    използва, и query() ги зарежда в същата заявка, така че сериализацията не прави заявка за всеки ред.
+    """
+    model = None
+
+    @classmethod
+    def load_options(cls):
+        return []
+
+    @classmethod
+    def query(cls):
+        """
+        Връща заявка за модела с eager loading на нужните връзки; може да се допълва с filter/order_by.
+        """
+        return cls.model.query.options(*cls.load_options())
+
+    @classmethod
+    def dump(cls, obj):
+        return obj.to_dict()
+
+    @classmethod
+    def dump_many(cls, objects):
+        return [cls.dump(obj) for obj in objects]
+
+
+class UserSerializer(Serializer):
+    model = User
+
+    @classmethod
+    def load_options(cls):
+        return [joinedload(User.body_measurements)]
+
+
+class ClothingSerializer(Serializer):
+    model = Clothing
+
+    @classmethod
+    def load_options(cls):
+        return [joinedload(Clothing.seller)]
+
+
+class CommentSerializer(Serializer):
+    model = Comment
+
+    @classmethod
+    def load_options(cls):
+        return [joinedload(Comment.user), joinedload(Comment.clothing)]
+
+
+class RecommendationSerializer(Serializer):
+    model = RecommendationHistory
+
+    @classmethod
+    def dump_many(cls, objects):
+        return serialize_recommendations(objects)
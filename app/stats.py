@@ -0,0 +1,130 @@
+from datetime import datetime, date, time, timedelta
+from flask import request
+from sqlalchemy import func, select, delete, insert, literal
+from app.models import db, User, Comment, RecommendationHistory, RecommendationArchive, DailyStat
+
+# Longest range the daily statistics endpoint returns
+MAX_STATS_DAYS = 366
+DEFAULT_STATS_DAYS = 30
+METRICS = ('recommendations', 'comments', 'users')
+
+
+class InvalidStatsRequest(ValueError):
+    """
+    Невалиден период в заявката за статистики.
+    """
+
+
+def _daily_counts(day, metric, condition, clothing_type=None, recommended_size=None):
+    """
+    SELECT (ден, метрика, тип дреха, размер, брой), групиран по ден (UTC) и по типа и размера, ако са дадени.
+    """
+    group_columns = [column for column in (clothing_type, recommended_size) if column is not None]
+    return (select(day, literal(metric),
+                   clothing_type if clothing_type is not None else literal(''),
+                   recommended_size if recommended_size is not None else literal(''),
+                   func.count())
+            .where(condition)
+            .group_by(day, *group_columns))
+
+
+def _rollup_selects(starts):
+    """
+    Агрегиращите заявки за трите метрики; за всяка се четат редовете от starts[метрика] нататък
+    (всички, ако е None).
+    """
+    sources = [
+        ('recommendations', RecommendationHistory.date,
+         (RecommendationHistory.clothing_type, RecommendationHistory.recommended_size)),
+        ('comments', Comment.created_at, ()),
+        ('users', User.created_at, ())
+    ]
+    return [_daily_counts(func.date(column), metric,
+                          column.isnot(None) if starts[metric] is None else column >= starts[metric],
+                          *group_columns)
+            for metric, column, group_columns in sources]
+
+
+def rollup_daily_stats(full=False):
+    """
+    Обновява дневните агрегати. Обработват се само дните след последния агрегиран ден, а самият
+    той се преизчислява, защото при предишното пускане може да е бил текущият (незавършен) ден.
+    Всяка заявка чете само новите редове по индексите по дата.
+    Агрегатите на препоръките за дните, които вече са в архива (app/archive.py), се запазват,
+    защото редовете им не са в RecommendationHistory.
+    :param full: Преизчислява всички дни (напр. след импорт на данни с минали дати)
+    :return: (първи преизчислен ден или None при пълно преизчисляване, брой записани агрегати)
+    """
+    table = DailyStat.__table__
+    first_day = None if full else db.session.query(func.max(DailyStat.day)).scalar()
+    # Archiving moves whole days, so the day of the newest archived row is fully archived
+    archived_until = db.session.query(func.max(RecommendationArchive.last_date)).scalar()
+    starts = {}
+    for metric in METRICS:
+        start_day = first_day
+        if metric == 'recommendations' and archived_until is not None:
+            if start_day is None or start_day <= archived_until.date():
+                start_day = archived_until.date() + timedelta(days=1)
+        condition = table.c.metric == metric
+        if start_day is not None:
+            condition = condition & (table.c.day >= start_day)
+        db.session.execute(delete(table).where(condition))
+        starts[metric] = datetime.combine(start_day, time.min) if start_day is not None else None
+    columns = [table.c.day, table.c.metric, table.c.clothing_type, table.c.recommended_size, table.c.count]
+    written = 0
+    for statement in _rollup_selects(starts):
+        written += db.session.execute(insert(table).from_select(columns, statement)).rowcount
+    db.session.commit()
+    return first_day, written
+
+
+def stats_date_range():
+    """
+    Периодът от параметрите from и to (ISO дати, включително). По подразбиране последните 30 дни.
+    :return: (начален ден, краен ден)
+    """
+    try:
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else datetime.utcnow().date()
+        start = (date.fromisoformat(request.args['from']) if request.args.get('from')
+                 else end - timedelta(days=DEFAULT_STATS_DAYS - 1))
+    except ValueError:
+        raise InvalidStatsRequest('from and to must be ISO dates (YYYY-MM-DD)')
+    if start > end:
+        raise InvalidStatsRequest('from must not be after to')
+    if (end - start).days + 1 > MAX_STATS_DAYS:
+        raise InvalidStatsRequest(f'The range must not exceed {MAX_STATS_DAYS} days')
+    return start, end
+
+
+def daily_stats(start, end):
+    """
+    Дневната статистика за периода, прочетена само от агрегатите. Дните без активност са с нули.
+    :param start: Начален ден (включително)
+    :param end: Краен ден (включително)
+    :return: Списък с по един речник за ден
+    """
+    days = {}
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        days[day] = {
+            'date': day.isoformat(),
+            'recommendations': 0,
+            'recommendationsBySize': {},
+            'recommendationsByType': {},
+            'comments': 0,
+            'newUsers': 0
+        }
+    stats = DailyStat.query.filter(DailyStat.day >= start, DailyStat.day <= end).all()
+    for stat in stats:
+        entry = days[stat.day]
+        if stat.metric == 'recommendations':
+            entry['recommendations'] += stat.count
+            by_size = entry['recommendationsBySize']
+            by_size[stat.recommended_size] = by_size.get(stat.recommended_size, 0) + stat.count
+            by_type = entry['recommendationsByType']
+            by_type[stat.clothing_type] = by_type.get(stat.clothing_type, 0) + stat.count
+        elif stat.metric == 'comments':
+            entry['comments'] += stat.count
+        elif stat.metric == 'users':
+            entry['newUsers'] += stat.count
+    return list(days.values())
@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, joinedload, make_transient_to_detached, object_session
+from sqlalchemy.orm.attributes import set_committed_value
+from app.models import db, User, BodyMeasurements
+
+# Session.info key with the user ids changed in the current transaction
+_CHANGED_USERS = 'user_cache_changed'
+
+
+def _column_values(instance):
+    return {attr.key: getattr(instance, attr.key) for attr in inspect(instance).mapper.column_attrs}
+
+
+def _detached_copy(user):
+    """
+    Копие на потребителя и мерките му извън сесията, с всички колони заредени. Кешира се копие,
+    защото оригиналът изтича при commit и се откача от сесията в края на заявката.
+    """
+    copy = User(**_column_values(user))
+    make_transient_to_detached(copy)
+    measurements = None
+    if user.body_measurements is not None:
+        measurements = BodyMeasurements(**_column_values(user.body_measurements))
+        make_transient_to_detached(measurements)
+        set_committed_value(measurements, 'user', copy)
+    set_committed_value(copy, 'body_measurements', measurements)
+    return copy
+
+
+class UserCache:
+    """
+    Ограничен in-process кеш на потребителите за login_manager.user_loader. Пази копия извън
+    сесията за ttl секунди и най-много max_size потребители (най-отдавна използваните се изхвърлят).
+    Записите се инвалидират при промяна или изтриване на потребителя или мерките му в този процес;
+    другите процеси виждат промяната най-късно след ttl.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return user
+
+    def put(self, user):
+        entry = (time.monotonic() + self.ttl, _detached_copy(user))
+        with self._lock:
+            self._entries[user.id] = entry
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def init_user_cache(app):
+    """
+    Създава кеша на потребителите на приложението (app.extensions['user_cache']).
+    USER_CACHE_TTL = 0 го изключва.
+    """
+    if app.config['USER_CACHE_TTL'] > 0:
+        app.extensions['user_cache'] = UserCache(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+
+
+def load_cached_user(user_id):
+    """
+    Връща потребителя с мерките му в текущата сесия. При попадение в кеша копието се добавя в
+    сесията с merge(load=False), без заявка към базата; иначе потребителят се зарежда с мерките
+    в една заявка и се кешира.
+    :param user_id: ID на потребителя
+    :return: User или None, ако не съществува
+    """
+    cache = current_app.extensions.get('user_cache')
+    if cache is not None:
+        cached = cache.get(user_id)
+        if cached is not None:
+            return db.session.merge(cached, load=False)
+    user = db.session.get(User, user_id, options=[joinedload(User.body_measurements)])
+    if user is not None and cache is not None:
+        cache.put(user)
+    return user
+
+
+def _invalidate(user_ids):
+    cache = current_app.extensions.get('user_cache') if has_app_context() else None
+    if cache is not None:
+        for user_id in user_ids:
+            cache.invalidate(user_id)
+
+
+def _user_changed(mapper, connection, target):
+    user_id = target.id if isinstance(target, User) else target.user_id
+    _invalidate([user_id])
+    # Invalidated again on commit, in case another request cached the old row in the meantime
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_CHANGED_USERS, set()).add(user_id)
+
+
+for _model, _events in ((User, ('after_update', 'after_delete')),
+                        (BodyMeasurements, ('after_insert', 'after_update', 'after_delete'))):
+    for _event in _events:
+        event.listen(_model, _event, _user_changed)
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    _invalidate(session.info.pop(_CHANGED_USERS, ()))
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _after_rollback(session, previous_transaction):
+    session.info.pop(_CHANGED_USERS, None)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Сравнява времето за подготовка на тренировъчните данни: парсване на CSV с кодиране от нулата
+срещу memory-mapped зареждане от feature store.
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from app.ml.feature_store import (load_feature_set, DEFAULT_DATASET, NUMERICAL_FEATURES,
+                                  CATEGORICAL_FEATURES)
+
+
+def encode_from_csv(csv_path):
+    """
+    Подготвя матрицата по стария начин: read_csv, LabelEncoder и StandardScaler.
+    """
+    df = pd.read_csv(csv_path)
+    for feature in CATEGORICAL_FEATURES:
+        df[feature] = LabelEncoder().fit_transform(df[feature])
+    df[NUMERICAL_FEATURES] = StandardScaler().fit_transform(df[NUMERICAL_FEATURES])
+    return df[NUMERICAL_FEATURES + CATEGORICAL_FEATURES].to_numpy()
+
+
+def encode_from_store(csv_path):
+    """
+    Подготвя матрицата от feature store.
+    """
+    feature_set = load_feature_set(csv_path)
+    scaler = StandardScaler().fit(feature_set.numerical)
+    return feature_set.encoded_matrix(scaler)
+
+
+def best_of(func, csv_path, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(csv_path)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark CSV parsing vs the feature store')
+    parser.add_argument('--dataset', default=DEFAULT_DATASET)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    # Първото зареждане изгражда хранилището, ако още го няма
+    encode_from_store(args.dataset)
+    assert np.allclose(encode_from_csv(args.dataset), encode_from_store(args.dataset), atol=1e-5)
+
+    csv_time = best_of(encode_from_csv, args.dataset, args.repeats)
+    store_time = best_of(encode_from_store, args.dataset, args.repeats)
+    print(f"CSV + encoding:      {csv_time * 1000:.1f} ms")
+    print(f"Feature store (mmap): {store_time * 1000:.1f} ms")
+    print(f"Speedup: {csv_time / store_time:.1f}x")
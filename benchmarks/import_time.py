@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Измерва времето за import при стартиране на приложението чрез `python -X importtime` и
+излиза с грешка, ако то надхвърли бюджета или ако при стартиране се зареждат тежки ML библиотеки.
+"""
+
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+DEFAULT_STATEMENT = 'from app import create_app; create_app()'
+# Loaded by app.ml.ml_model on the first prediction, never at startup
+FORBIDDEN_MODULES = ['numpy', 'sklearn', 'pandas', 'joblib', 'scipy']
+
+LINE_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def measure(statement):
+    """
+    Изпълнява statement в нов процес с -X importtime.
+    :param statement: Python код, който стартира приложението
+    :return: (общо време в ms, речник модул -> собствено време в ms, речник модул -> кумулативно време в ms)
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Statement failed:\n{result.stderr}")
+    self_times = {}
+    cumulative_times = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        self_times[module] = int(self_us) / 1000
+        cumulative_times[module] = int(cumulative_us) / 1000
+        # Top-level imports (one space of indentation) add up to the whole startup
+        if len(indent) == 1:
+            total_us += int(cumulative_us)
+    return total_us / 1000, self_times, cumulative_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup import-time budget check')
+    parser.add_argument('--statement', default=DEFAULT_STATEMENT, help='Code that starts the app')
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('SMARTFIT_IMPORT_BUDGET_MS', 800)),
+                        help='Maximum allowed import time in milliseconds')
+    parser.add_argument('--repeats', type=int, default=5, help='Runs; the fastest one is compared to the budget')
+    parser.add_argument('--top', type=int, default=15, help='Slowest modules to print')
+    args = parser.parse_args()
+
+    runs = [measure(args.statement) for _ in range(args.repeats)]
+    total_ms, self_times, cumulative_times = min(runs, key=lambda run: run[0])
+
+    print(f"Statement: {args.statement}")
+    print(f"Import time: {total_ms:.1f} ms (best of {args.repeats}), budget {args.budget_ms:.0f} ms")
+    print(f"\nSlowest modules (cumulative):")
+    for module, cumulative in sorted(cumulative_times.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {cumulative:8.1f} ms  {self_times[module]:8.1f} ms self  {module}")
+
+    failures = []
+    heavy = sorted({module.split('.')[0] for module in cumulative_times} & set(FORBIDDEN_MODULES))
+    if heavy:
+        failures.append(f"heavy modules imported at startup: {', '.join(heavy)}")
+    if total_ms > args.budget_ms:
+        failures.append(f"import time {total_ms:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✅ Startup import time within budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Показва плановете (EXPLAIN QUERY PLAN) и времената на най-честите заявки към SQLite базата
+без и с индексите от миграция 0002. Работи върху временно копие, така че базата не се променя.
+За смислени резултати базата трябва да е попълнена, напр. с `python app.py gen-fixtures`.
+"""
+
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import statistics
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateIndex
+from app.models import db
+
+DEFAULT_DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'instance', 'SmartFit.db')
+
+# The same filters and ordering as the ORM queries in app/routes and app/models
+QUERIES = [
+    ('get_user_recommendations',
+     "SELECT * FROM recommendation_history WHERE user_id = :user_id ORDER BY date DESC"),
+    ('RecommendationHistory.to_dict related',
+     "SELECT * FROM recommendation_history WHERE item_identifier = :item AND id != :rec_id "
+     "AND user_id = :user_id ORDER BY date DESC"),
+    ('get_clothing_comments',
+     "SELECT * FROM comment WHERE clothing_id = :clothing_id ORDER BY created_at DESC"),
+    ('add_clothing_comment recommendation check',
+     "SELECT * FROM recommendation_history WHERE user_id = :user_id AND item_identifier = :item LIMIT 1"),
+    ('admin users: recommendation count',
+     "SELECT count(*) FROM recommendation_history WHERE user_id = :user_id"),
+    ('admin users: comment count',
+     "SELECT count(*) FROM comment WHERE user_id = :user_id"),
+    ('admin users: clothing count',
+     "SELECT count(*) FROM clothing WHERE seller_id = :seller_id"),
+    ('dashboard: recent clothes',
+     "SELECT * FROM clothing ORDER BY created_at DESC LIMIT 5"),
+    ('dashboard: recent comments',
+     "SELECT * FROM comment ORDER BY created_at DESC LIMIT 5"),
+]
+
+
+def model_indexes():
+    return [index for table in db.metadata.sorted_tables for index in table.indexes]
+
+
+def sample_parameters(conn):
+    """
+    Взема реални стойности за параметрите: най-активния потребител, негова дреха и продавач.
+    """
+    row = conn.execute("SELECT user_id, count(*) AS n FROM recommendation_history "
+                       "GROUP BY user_id ORDER BY n DESC LIMIT 1").fetchone()
+    if row is None:
+        raise SystemExit("The database has no recommendations; populate it with `python app.py gen-fixtures`")
+    user_id = row[0]
+    rec_id, item = conn.execute("SELECT id, item_identifier FROM recommendation_history WHERE user_id = ? "
+                                "ORDER BY id LIMIT 1", (user_id,)).fetchone()
+    seller_id = conn.execute("SELECT seller_id FROM clothing LIMIT 1").fetchone()
+    clothing_id = conn.execute("SELECT clothing_id, count(*) AS n FROM comment "
+                               "GROUP BY clothing_id ORDER BY n DESC LIMIT 1").fetchone()
+    return {
+        'user_id': user_id,
+        'rec_id': rec_id,
+        'item': item,
+        'seller_id': seller_id[0] if seller_id else 0,
+        'clothing_id': clothing_id[0] if clothing_id else 0
+    }
+
+
+def measure(conn, repeats, params):
+    """
+    :return: Речник заявка -> (план, медианно време в ms)
+    """
+    results = {}
+    for name, sql in QUERIES:
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = (plan, statistics.median(timings))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query plans before and after the index migration')
+    parser.add_argument('--database', default=DEFAULT_DATABASE, help='SQLite database file')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'copy.db')
+        shutil.copyfile(args.database, path)
+        conn = sqlite3.connect(path)
+        params = sample_parameters(conn)
+        print(f"Database: {os.path.abspath(args.database)}")
+        print(f"Parameters: {params}\n")
+
+        indexes = model_indexes()
+        for index in indexes:
+            conn.execute(f"DROP INDEX IF EXISTS {index.name}")
+        conn.execute("ANALYZE")
+        before = measure(conn, args.repeats, params)
+
+        for index in indexes:
+            conn.execute(str(CreateIndex(index).compile(dialect=sqlite.dialect())))
+        conn.execute("ANALYZE")
+        after = measure(conn, args.repeats, params)
+        conn.close()
+
+    for name, _ in QUERIES:
+        plan_before, ms_before = before[name]
+        plan_after, ms_after = after[name]
+        speedup = ms_before / ms_after if ms_after > 0 else float('inf')
+        print(f"== {name}: {ms_before:.2f} ms -> {ms_after:.2f} ms ({speedup:.1f}x)")
+        print(f"   before: {' | '.join(plan_before)}")
+        print(f"   after:  {' | '.join(plan_after)}")
+
+
+if __name__ == '__main__':
+    main()
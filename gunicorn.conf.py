@@ -0,0 +1,43 @@
+import os
+import multiprocessing
+
+# Gunicorn settings for wsgi:app, all overridable through the environment:
+#   gunicorn -c gunicorn.conf.py wsgi:app
+# Graceful reload: `kill -HUP <master pid>` starts new workers and stops the old ones after their
+# in-flight requests. With preload_app the code and model are loaded in the master, so HUP re-forks
+# them as they are; to pick up new code or a new model.pkl on HUP, set SMARTFIT_PRELOAD=false
+# (each worker then loads the app itself), or restart the master.
+
+bind = os.environ.get('SMARTFIT_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('SMARTFIT_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('SMARTFIT_THREADS', 2))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Load the app and the model once in the master before forking the workers
+preload_app = os.environ.get('SMARTFIT_PRELOAD', 'true').lower() in ['true', '1', 'yes']
+
+# Recycle each worker after N requests (jitter keeps workers from restarting at the same time)
+max_requests = int(os.environ.get('SMARTFIT_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('SMARTFIT_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.environ.get('SMARTFIT_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('SMARTFIT_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('SMARTFIT_KEEPALIVE', 5))
+
+accesslog = os.environ.get('SMARTFIT_ACCESS_LOG', '-')
+errorlog = os.environ.get('SMARTFIT_ERROR_LOG', '-')
+loglevel = os.environ.get('SMARTFIT_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    """
+    Database connections opened in the master (e.g. while preloading) must not be shared by the
+    workers, so each worker starts with an empty connection pool.
+    """
+    if not preload_app:
+        return
+    from wsgi import app
+    from app import db
+    with app.app_context():
+        db.engine.dispose(close=False)
+    server.log.info(f"Worker {worker.pid} started")
@@ -0,0 +1,112 @@
+"""numeric recommendation measurements
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 18:40:12.281734
+
+"""
+import logging
+from collections import Counter
+from alembic import op
+import sqlalchemy as sa
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+# Rows converted per transaction, so the backfill never holds the write lock for long
+BATCH_SIZE = 5000
+
+# As app.models.BODY_TYPE_CODES at the time of this migration
+BODY_TYPE_CODES = {'slim': 1, 'medium': 2, 'average': 3, 'large': 4}
+
+recommendation_history = sa.table(
+    'recommendation_history',
+    sa.column('id', sa.Integer),
+    sa.column('height', sa.String),
+    sa.column('weight', sa.String),
+    sa.column('chest', sa.String),
+    sa.column('waist', sa.String),
+    sa.column('body_type', sa.String),
+    sa.column('height_cm', sa.Float),
+    sa.column('weight_kg', sa.Float),
+    sa.column('chest_cm', sa.Float),
+    sa.column('waist_cm', sa.Float),
+    sa.column('body_type_code', sa.SmallInteger)
+)
+
+
+def _to_float(value):
+    # The old columns hold the text the client sent; a missing measurement was stored as 'None'
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _backfill():
+    """
+    Попълва числовите колони от старите текстови на партиди по id. Всяка партида е отделна кратка
+    транзакция в собствен connection, така че четенето и записът в таблицата не се блокират дълго.
+    """
+    engine = op.get_bind().engine
+    table = recommendation_history
+    update = (table.update()
+              .where(table.c.id == sa.bindparam('row_id'))
+              .values(height_cm=sa.bindparam('height_cm'), weight_kg=sa.bindparam('weight_kg'),
+                      chest_cm=sa.bindparam('chest_cm'), waist_cm=sa.bindparam('waist_cm'),
+                      body_type_code=sa.bindparam('body_type_code')))
+    unknown_body_types = Counter()
+    last_id = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                sa.select(table.c.id, table.c.height, table.c.weight, table.c.chest, table.c.waist,
+                          table.c.body_type)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            unknown_body_types.update(row.body_type for row in rows
+                                      if row.body_type is not None and row.body_type not in BODY_TYPE_CODES)
+            connection.execute(update, [{
+                'row_id': row.id,
+                'height_cm': _to_float(row.height),
+                'weight_kg': _to_float(row.weight),
+                'chest_cm': _to_float(row.chest),
+                'waist_cm': _to_float(row.waist),
+                'body_type_code': BODY_TYPE_CODES.get(row.body_type)
+            } for row in rows])
+        last_id = rows[-1].id
+    if unknown_body_types:
+        logger.warning('Unknown body types left without body_type_code (value: rows): %s',
+                       dict(unknown_body_types))
+
+
+def upgrade():
+    with op.batch_alter_table('recommendation_history', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('height_cm', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('weight_kg', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('chest_cm', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('waist_cm', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('body_type_code', sa.SmallInteger(), nullable=True))
+
+    # Commit the new columns and convert the existing rows outside the migration transaction
+    with op.get_context().autocommit_block():
+        _backfill()
+
+
+def downgrade():
+    with op.batch_alter_table('recommendation_history', schema=None) as batch_op:
+        batch_op.drop_column('body_type_code')
+        batch_op.drop_column('waist_cm')
+        batch_op.drop_column('chest_cm')
+        batch_op.drop_column('weight_kg')
+        batch_op.drop_column('height_cm')
@@ -0,0 +1,97 @@
+"""drop legacy recommendation measurements
+
+SQLite cannot drop columns in place, so batch_alter_table copies the whole recommendation_history
+table into a new one and holds the write lock for the whole copy. Writes to the database wait until
+the copy finishes (about 6 s for 1M rows); in WAL mode reads keep working. Run this upgrade while the
+app is stopped or in a quiet period. PostgreSQL drops the columns without rewriting the table.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 18:41:03.502119
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+# Rows converted per transaction when restoring the text columns
+BATCH_SIZE = 5000
+
+BODY_TYPES_BY_CODE = {1: 'slim', 2: 'medium', 3: 'average', 4: 'large'}
+
+recommendation_history = sa.table(
+    'recommendation_history',
+    sa.column('id', sa.Integer),
+    sa.column('height', sa.String),
+    sa.column('weight', sa.String),
+    sa.column('chest', sa.String),
+    sa.column('waist', sa.String),
+    sa.column('body_type', sa.String),
+    sa.column('height_cm', sa.Float),
+    sa.column('weight_kg', sa.Float),
+    sa.column('chest_cm', sa.Float),
+    sa.column('waist_cm', sa.Float),
+    sa.column('body_type_code', sa.SmallInteger)
+)
+
+
+def _to_text(value):
+    # The old format: str() of the value sent by the frontend
+    if value is None:
+        return 'None'
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def upgrade():
+    # The measurements are read from the numeric columns filled by 0006
+    with op.batch_alter_table('recommendation_history', schema=None) as batch_op:
+        batch_op.drop_column('body_type')
+        batch_op.drop_column('waist')
+        batch_op.drop_column('chest')
+        batch_op.drop_column('weight')
+        batch_op.drop_column('height')
+
+
+def downgrade():
+    with op.batch_alter_table('recommendation_history', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('height', sa.String(length=10), nullable=True))
+        batch_op.add_column(sa.Column('weight', sa.String(length=10), nullable=True))
+        batch_op.add_column(sa.Column('chest', sa.String(length=10), nullable=True))
+        batch_op.add_column(sa.Column('waist', sa.String(length=10), nullable=True))
+        batch_op.add_column(sa.Column('body_type', sa.String(length=20), nullable=True))
+
+    with op.get_context().autocommit_block():
+        engine = op.get_bind().engine
+        table = recommendation_history
+        update = (table.update()
+                  .where(table.c.id == sa.bindparam('row_id'))
+                  .values(height=sa.bindparam('height'), weight=sa.bindparam('weight'),
+                          chest=sa.bindparam('chest'), waist=sa.bindparam('waist'),
+                          body_type=sa.bindparam('body_type')))
+        last_id = 0
+        while True:
+            with engine.begin() as connection:
+                rows = connection.execute(
+                    sa.select(table.c.id, table.c.height_cm, table.c.weight_kg, table.c.chest_cm,
+                              table.c.waist_cm, table.c.body_type_code)
+                    .where(table.c.id > last_id)
+                    .order_by(table.c.id)
+                    .limit(BATCH_SIZE)
+                ).all()
+                if not rows:
+                    break
+                connection.execute(update, [{
+                    'row_id': row.id,
+                    'height': _to_text(row.height_cm),
+                    'weight': _to_text(row.weight_kg),
+                    'chest': _to_text(row.chest_cm),
+                    'waist': _to_text(row.waist_cm),
+                    'body_type': BODY_TYPES_BY_CODE.get(row.body_type_code)
+                } for row in rows])
+            last_id = rows[-1].id
@@ -0,0 +1,66 @@
+"""user created_at not null
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-20 09:12:40.118302
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+# Users updated per executemany
+BATCH_SIZE = 5000
+
+user = sa.table('user', sa.column('id', sa.Integer), sa.column('created_at', sa.DateTime))
+
+# Earliest activity per user: (table, user column, date column)
+ACTIVITY = [
+    ('recommendation_history', 'user_id', 'date'),
+    ('recommendation_archive', 'user_id', 'first_date'),
+    ('comment', 'user_id', 'created_at'),
+    ('clothing', 'seller_id', 'created_at'),
+]
+
+
+def _backfill():
+    """
+    Попълва created_at на потребителите, добавени преди 0005, с датата на най-ранната им
+    активност (препоръка, включително архивирана, коментар или дреха), а на потребителите без
+    активност - с момента на миграцията.
+    """
+    connection = op.get_bind()
+    missing = connection.execute(sa.select(user.c.id).where(user.c.created_at.is_(None))).scalars().all()
+    if not missing:
+        return
+    earliest = {}
+    for table_name, user_column, date_column in ACTIVITY:
+        table = sa.table(table_name, sa.column(user_column, sa.Integer), sa.column(date_column, sa.DateTime))
+        for user_id, first in connection.execute(
+                sa.select(table.c[user_column], sa.func.min(table.c[date_column]))
+                .group_by(table.c[user_column])):
+            if first is not None and (user_id not in earliest or first < earliest[user_id]):
+                earliest[user_id] = first
+    now = datetime.utcnow()
+    update = user.update().where(user.c.id == sa.bindparam('user_id')).values(created_at=sa.bindparam('created'))
+    for start in range(0, len(missing), BATCH_SIZE):
+        connection.execute(update, [{'user_id': user_id, 'created': earliest.get(user_id, now)}
+                                    for user_id in missing[start:start + BATCH_SIZE]])
+
+
+def upgrade():
+    _backfill()
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
@@ -0,0 +1,77 @@
+"""recommendation history autoincrement
+
+Without AUTOINCREMENT SQLite gives a new row max(rowid) + 1, so after archive-recommendations deletes
+the newest ids they are handed out again while the archived rows keep them. This rebuilds the table
+with AUTOINCREMENT, gives rows that already reuse an archived id a new one and starts sqlite_sequence
+after the highest id in the table or the archive. Like 0007, the rebuild copies the whole table while
+holding the write lock (about 9 s for 500k rows plus reading the archive). PostgreSQL sequences never
+reuse ids, so nothing changes there.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-20 10:03:27.540916
+
+"""
+import json
+import zlib
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+# Archive chunks read per query
+BATCH_SIZE = 1000
+
+recommendation_history = sa.table('recommendation_history', sa.column('id', sa.Integer))
+recommendation_archive = sa.table('recommendation_archive', sa.column('id', sa.Integer),
+                                  sa.column('data', sa.LargeBinary))
+
+
+def _archived_ids(connection):
+    ids = set()
+    last_id = 0
+    while True:
+        chunks = connection.execute(
+            sa.select(recommendation_archive.c.id, recommendation_archive.c.data)
+            .where(recommendation_archive.c.id > last_id)
+            .order_by(recommendation_archive.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not chunks:
+            return ids
+        for chunk in chunks:
+            ids.update(row['id'] for row in json.loads(zlib.decompress(chunk.data)))
+        last_id = chunks[-1].id
+
+
+def upgrade():
+    connection = op.get_bind()
+    if connection.dialect.name != 'sqlite':
+        return
+    table = recommendation_history
+    archived_ids = _archived_ids(connection)
+    highest = max([connection.execute(sa.select(sa.func.max(table.c.id))).scalar() or 0, *archived_ids])
+    reused = [row_id for row_id in connection.execute(sa.select(table.c.id)).scalars() if row_id in archived_ids]
+    for row_id in reused:
+        highest += 1
+        connection.execute(table.update().where(table.c.id == row_id).values(id=highest))
+
+    with op.batch_alter_table('recommendation_history', recreate='always',
+                              table_kwargs={'sqlite_autoincrement': True}):
+        pass
+    connection.execute(sa.text("DELETE FROM sqlite_sequence WHERE name = 'recommendation_history'"))
+    connection.execute(sa.text("INSERT INTO sqlite_sequence (name, seq) VALUES ('recommendation_history', :seq)"),
+                       {'seq': highest})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('recommendation_history', recreate='always',
+                              table_kwargs={'sqlite_autoincrement': False}):
+        pass
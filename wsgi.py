@@ -0,0 +1,11 @@
+import os
+from app import create_app
+
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+app = create_app()
+
+# Load the size model at import, so with preload_app it is loaded once in the gunicorn master
+# and shared copy-on-write by the forked workers instead of on each worker's first prediction
+if os.environ.get('SMARTFIT_PRELOAD_MODEL', 'true').lower() in ['true', '1', 'yes']:
+    from app.ml.ml_model import load_model
+    load_model()